@@ -1,24 +1,63 @@
 from flask import Flask, request, jsonify, render_template, redirect, url_for, session, flash
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
 from backend.api.routes import api_bp
 from backend.utils.config import Config
-from backend.utils.translations import get_text
-from backend.utils.supabase import register_user, login_user, get_user_profile, update_language_preference
+from backend.utils.uploads import SpooledUploadRequest
+from backend.utils.translations import get_text, get_bundle, check_templates
+from backend.utils.page_cache import init_page_cache, render_cached
+from backend.utils.compression import init_compression
+from backend.utils.static_assets import init_static_assets
+from backend.utils.metrics import init_metrics
+from backend.utils.profiling import init_profiling
+from backend.utils.sessions import init_sessions
+from backend.utils.auth import login_required, store_tokens, tokens_from_auth_session
+from backend.utils.supabase import register_user, login_user, get_user_profile, queue_language_preference
+from backend.models.registry import registry
 
 
 app = Flask(__name__, 
             static_folder='backend/static',
             template_folder='backend/templates')
+app.request_class = SpooledUploadRequest
+# Take the client IP (used for rate limits) from X-Forwarded-For behind a proxy
+if Config.TRUSTED_PROXY_COUNT:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=Config.TRUSTED_PROXY_COUNT,
+                            x_proto=Config.TRUSTED_PROXY_COUNT)
 
 app.config.from_object(Config)
 # Set secret key for session management
 app.secret_key = Config.SECRET_KEY
+# Keep session data server-side when SESSION_BACKEND is 'memory' or 'sqlite'
+init_sessions(app)
 CORS(app)
 
+# Time every request and serve the counters on /metrics
+init_metrics(app)
+
+# Sampled request profiling, switched on at runtime via /admin/profiling or a signal
+init_profiling(app)
+
 # Register blueprints
 app.register_blueprint(api_bp, url_prefix='/api')
 
+# Cache rendered language-only pages; dropped when templates or catalogs change
+init_page_cache(app)
+
+# Compress HTML/JSON responses and serve content-hashed static URLs
+init_compression(app)
+init_static_assets(app)
+
+# Report template strings missing from their translation bundle at startup
+for template, key in check_templates(app.template_folder):
+    print(f"Template {template} uses '{key}', which its translation bundle lacks")
+
+# Load models up front; with gunicorn --preload this happens once in the
+# master and the weights are shared copy-on-write by the workers
+if Config.MODEL_PRELOAD:
+    registry.preload(['disease', 'soil'])
+
 @app.route('/')
 def index():
     """Redirect to language selection or dashboard based on session"""
@@ -34,15 +73,9 @@ def index():
 def language_select():
     """Show language selection page"""
     # Default to English for the language selection page
-    translations = {
-        'language_select_title': get_text('language_select_title', 'en'),
-        'language_select_subtitle': get_text('language_select_subtitle', 'en'),
-        'english': get_text('english', 'en'),
-        'hindi': get_text('hindi', 'en'),
-        'continue': get_text('continue', 'en')
-    }
+    translations = get_bundle('language_select', 'en')
     
-    return render_template('language_select.html', translations=translations)
+    return render_cached('language_select.html', ('en',), translations=translations)
 
 @app.route('/set-language', methods=['POST'])
 def set_language():
@@ -52,7 +85,7 @@ def set_language():
     
     if 'user_id' in session:
         # Update user's preference in database if logged in
-        update_language_preference(session['user_id'], language)
+        queue_language_preference(session['user_id'], language)
     
     return redirect(url_for('login_page'))
 
@@ -61,27 +94,20 @@ def login_page():
     """Show login page"""
     language = session.get('language', 'en')
     
-    translations = {
-        'login_title': get_text('login_title', language),
-        'register_title': get_text('register_title', language),
-        'email': get_text('email', language),
-        'password': get_text('password', language),
-        'username': get_text('username', language),
-        'login_button': get_text('login_button', language),
-        'register_button': get_text('register_button', language),
-        'no_account': get_text('no_account', language),
-        'have_account': get_text('have_account', language),
-        'register_link': get_text('register_link', language),
-        'login_link': get_text('login_link', language),
-        'language_select_title': get_text('language_select_title', language)
-    }
-    
-    error = session.pop('error', None)
-    register_error = session.pop('register_error', None)
-    
-    return render_template('login.html', translations=translations, 
-                          language=language, error=error, 
-                          register_error=register_error)
+    translations = get_bundle('login', language)
+    
+    # Only touch the session when there is a message, so the cookie isn't re-sent
+    error = session.pop('error', None) if 'error' in session else None
+    register_error = session.pop('register_error', None) if 'register_error' in session else None
+    
+    if error or register_error:
+        return render_template('login.html', translations=translations, 
+                              language=language, error=error, 
+                              register_error=register_error)
+    
+    # Without a message the page only depends on the language
+    return render_cached('login.html', (language,), translations=translations,
+                         language=language, error=None, register_error=None)
 
 @app.route('/login', methods=['POST'])
 def login():
@@ -94,8 +120,9 @@ def login():
         response = login_user(email, password)
         
         if response.user:
-            # Store user info in session
+            # Store user info in session, with the tokens that prove it
             session['user_id'] = response.user.id
+            store_tokens(tokens_from_auth_session(response.session))
             
             # Get user profile for additional info
             profile = get_user_profile(response.user.id)
@@ -127,9 +154,11 @@ def register():
         response = register_user(email, password, username, language_preference=language)
         
         if response.user:
-            # Automatically log the user in
+            # Automatically log the user in (there is no session yet if
+            # the email address has to be confirmed first)
             session['user_id'] = response.user.id
             session['username'] = username
+            store_tokens(tokens_from_auth_session(response.session))
             
             return redirect(url_for('dashboard'))
         else:
@@ -140,29 +169,14 @@ def register():
         return redirect(url_for('login_page'))
 
 @app.route('/dashboard')
+@login_required
 def dashboard():
     """Show dashboard page"""
-    # Check if user is logged in
-    if 'user_id' not in session:
-        return redirect(url_for('login_page'))
-    
     language = session.get('language', 'en')
     username = session.get('username', 'User')
     
     # Get translations for dashboard
-    translations = {
-        'app_title': get_text('app_title', language),
-        'welcome': get_text('welcome', language),
-        'detect_disease': get_text('detect_disease', language),
-        'detect_disease_desc': get_text('detect_disease_desc', language),
-        'analyze_soil': get_text('analyze_soil', language),
-        'analyze_soil_desc': get_text('analyze_soil_desc', language),
-        'weather': get_text('weather', language),
-        'weather_desc': get_text('weather_desc', language),
-        'logout': get_text('logout', language),
-        'english': get_text('english', language),
-        'hindi': get_text('hindi', language)
-    }
+    translations = get_bundle('dashboard', language)
     
     return render_template('dashboard.html', translations=translations, 
                           language=language, username=username)
@@ -175,7 +189,7 @@ def change_language():
     
     if 'user_id' in session:
         # Update user's preference in database
-        update_language_preference(session['user_id'], language)
+        queue_language_preference(session['user_id'], language)
     
     return redirect(url_for('dashboard'))
 
@@ -195,23 +209,20 @@ def logout():
 
 # Additional routes for the features
 @app.route('/detect-disease')
+@login_required
 def detect_disease_page():
-    if 'user_id' not in session:
-        return redirect(url_for('login_page'))
     # Implementation for disease detection page would go here
     return "Disease Detection Page (To be implemented)"
 
 @app.route('/analyze-soil')
+@login_required
 def analyze_soil_page():
-    if 'user_id' not in session:
-        return redirect(url_for('login_page'))
     # Implementation for soil analysis page would go here
     return "Soil Analysis Page (To be implemented)"
 
 @app.route('/weather')
+@login_required
 def weather_page():
-    if 'user_id' not in session:
-        return redirect(url_for('login_page'))
     # Implementation for weather page would go here
     return "Weather Page (To be implemented)"
 
@@ -1,25 +1,104 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, Response, request, jsonify, session
 import os
 import json
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from backend.utils.helpers import (
-    save_uploaded_file, 
-    preprocess_image, 
-    get_weather_data,
+    read_uploaded_file,
+    read_uploaded_images,
+    get_cached_weather_data,
+    weather_cache,
+    weather_breaker,
     generate_weather_recommendations
 )
-from backend.models.disease_detection import predict_disease
-from backend.models.soil_analysis import analyze_soil
+from backend.models.disease_detection import disease_result, summarize_diseases, disease_batcher
+from backend.models.soil_analysis import soil_result, summarize_soil
+from backend.models.executor import analysis_executor, analysis_stages, AnalysisBusyError
+from backend.models.registry import registry
+from backend.models.result_cache import result_key, lookup_result, store_result
 from backend.utils.config import Config
+from backend.utils.cache import cache_stats
+from backend.utils.supabase import preference_writer
+from backend.utils.metrics import metrics
+from backend.utils.health import readiness, upstream_monitor, weather_monitor
+from backend.utils.auth import authentication_required_response, current_user_id
+from backend.utils.rate_limit import rate_limited
+from backend.utils.uploads import per_file_upload_errors
 
 # Create a Blueprint for the API routes
 api_bp = Blueprint('api', __name__)
 
+# Component counters, exported on /metrics
+metrics.register_collector('cache', cache_stats, label='cache')
+metrics.register_collector('preference_writer', preference_writer.stats)
+metrics.register_collector('disease_batcher', disease_batcher.stats)
+metrics.register_collector('analysis_executor', analysis_executor.stats)
+metrics.register_collector('model', registry.stats, label='model')
+metrics.register_collector('weather_cache', weather_cache.stats)
+metrics.register_collector('weather_breaker', lambda: dict(weather_breaker.stats(),
+                                                           open=weather_breaker.state != 'closed'))
+metrics.register_collector('upstream_up', lambda: {
+    name: result["ok"]
+    for monitor in (upstream_monitor, weather_monitor) if monitor is not None
+    for name, result in monitor.results.items()
+})
+
+BUSY_MESSAGE = "Server is busy, please try again shortly"
+
+# Endpoints that stay open when Config.API_REQUIRE_AUTH is on
+PUBLIC_ENDPOINTS = {'api.health_check', 'api.liveness_check', 'api.readiness_check'}
+
+@api_bp.before_request
+def require_login():
+    """With API_REQUIRE_AUTH, answer 401 unless the session or bearer token is valid"""
+    if Config.API_REQUIRE_AUTH and request.endpoint not in PUBLIC_ENDPOINTS and current_user_id() is None:
+        return authentication_required_response()
+
+@api_bp.errorhandler(RequestEntityTooLarge)
+@api_bp.errorhandler(UnsupportedMediaType)
+def rejected_upload(e):
+    """Answer uploads rejected while they arrive; the rest of the body is never read"""
+    return jsonify({"error": e.description}), e.code, {'Connection': 'close'}
+
+def _classify_upload(kind, image_data):
+    """
+    Return the language-independent analysis of an uploaded image.
+    
+    Re-uploads of the same photo are served from the result cache.
+    
+    Returns:
+        dict: The classification, or None if the image can't be processed
+        
+    Raises:
+        AnalysisBusyError: If too many analyses are already in progress
+    """
+    cache_key = result_key(kind, image_data)
+    classification = lookup_result(cache_key)
+    if classification is None:
+        # Preprocess the image and run the model
+        classification = analysis_executor.analyze(kind, image_data)
+        if classification is not None:
+            store_result(cache_key, classification)
+    return classification
+
 @api_bp.route('/health', methods=['GET'])
 def health_check():
     """API health check endpoint"""
     return jsonify({"status": "ok", "message": "ShetkarAI API is running"}), 200
 
+@api_bp.route('/health/live', methods=['GET'])
+def liveness_check():
+    """Liveness probe: the worker is up and serving requests"""
+    return jsonify({"status": "ok"}), 200
+
+@api_bp.route('/health/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: 503 while a critical dependency check fails"""
+    ready, report = readiness()
+    return jsonify(report), 200 if ready else 503
+
 @api_bp.route('/detect-disease', methods=['POST'])
+@rate_limited('detect_disease', Config.RATE_LIMIT_DETECT_DISEASE, Config.CONCURRENCY_LIMIT_ANALYSIS)
 def detect_disease():
     """Endpoint for plant disease detection"""
     if 'image' not in request.files:
@@ -29,24 +108,27 @@ def detect_disease():
     # Get language from form or session
     language = request.form.get('language', session.get('language', 'en'))
     
-    # Save the uploaded file
-    image_path = save_uploaded_file(file)
-    if not image_path:
+    # Read the uploaded file
+    with analysis_stages.labels('disease', 'upload').time():
+        image_data = read_uploaded_file(file)
+    if not image_data:
         return jsonify({"error": "Invalid file format"}), 400
     
-    # Preprocess the image
-    processed_image = preprocess_image(image_path)
-    if processed_image is None:
-        return jsonify({"error": "Failed to process image"}), 500
-    
-    # Get the prediction
     try:
-        result = predict_disease(processed_image, language)
-        return jsonify(result), 200
+        classification = _classify_upload('disease', image_data)
+    except AnalysisBusyError:
+        return jsonify({"error": BUSY_MESSAGE}), 503, {'Retry-After': '1'}
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return jsonify({"error": f"Error predicting disease: {e}"}), 500
+    if classification is None:
+        return jsonify({"error": "Failed to process image"}), 500
+    
+    with analysis_stages.labels('disease', 'recommendations').time():
+        result = disease_result(classification, language)
+    return jsonify(result), 200
 
 @api_bp.route('/analyze-soil', methods=['POST'])
+@rate_limited('analyze_soil', Config.RATE_LIMIT_ANALYZE_SOIL, Config.CONCURRENCY_LIMIT_ANALYSIS)
 def soil_analysis():
     """Endpoint for soil analysis"""
     if 'image' not in request.files:
@@ -56,24 +138,110 @@ def soil_analysis():
     # Get language from form or session
     language = request.form.get('language', session.get('language', 'en'))
     
-    # Save the uploaded file
-    image_path = save_uploaded_file(file)
-    if not image_path:
+    # Read the uploaded file
+    with analysis_stages.labels('soil', 'upload').time():
+        image_data = read_uploaded_file(file)
+    if not image_data:
         return jsonify({"error": "Invalid file format"}), 400
     
-    # Preprocess the image
-    processed_image = preprocess_image(image_path)
-    if processed_image is None:
+    try:
+        classification = _classify_upload('soil', image_data)
+    except AnalysisBusyError:
+        return jsonify({"error": BUSY_MESSAGE}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        return jsonify({"error": f"Error analyzing soil: {e}"}), 500
+    if classification is None:
         return jsonify({"error": "Failed to process image"}), 500
     
-    # Get the soil analysis
+    with analysis_stages.labels('soil', 'recommendations').time():
+        result = soil_result(classification, language)
+    return jsonify(result), 200
+
+# Rendering, summary and error prefix for each kind of batch analysis
+BATCH_ANALYSES = {
+    'disease': (disease_result, summarize_diseases, "Error predicting disease"),
+    'soil': (soil_result, summarize_soil, "Error analyzing soil")
+}
+
+def _batch_analysis(kind):
+    """
+    Analyze every image of a multipart upload (image files and/or zip
+    archives in any field) and stream the results as NDJSON.
+    
+    One line is written per image as soon as it finishes, in completion
+    order, followed by a final line with the aggregated summary.
+    """
+    files = [file for _, file in request.files.items(multi=True)]
+    if not files:
+        return jsonify({"error": "No images provided"}), 400
+    # Get language from form or session
+    language = request.form.get('language', session.get('language', 'en'))
+    
+    # Everything is read up front, the request body is gone once streaming starts
     try:
-        result = analyze_soil(processed_image, language)
-        return jsonify(result), 200
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        images, errors = read_uploaded_images(files)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not images and not errors:
+        return jsonify({"error": "No images provided"}), 400
+    
+    render, summarize, error_prefix = BATCH_ANALYSES[kind]
+    
+    def generate():
+        classifications = []
+        for filename, message in errors:
+            yield json.dumps({"filename": filename, "error": message}) + "\n"
+        
+        with ThreadPoolExecutor(max_workers=Config.BATCH_PARALLELISM) as pool:
+            futures = {
+                pool.submit(_classify_upload, kind, data): (index, filename)
+                for index, (filename, data) in enumerate(images)
+            }
+            try:
+                for future in as_completed(futures):
+                    index, filename = futures[future]
+                    line = {"index": index, "filename": filename}
+                    try:
+                        classification = future.result()
+                    except AnalysisBusyError:
+                        line["error"] = BUSY_MESSAGE
+                    except Exception as e:
+                        line["error"] = f"{error_prefix}: {e}"
+                    else:
+                        if classification is None:
+                            line["error"] = "Failed to process image"
+                        else:
+                            classifications.append(classification)
+                            with analysis_stages.labels(kind, 'recommendations').time():
+                                line["result"] = render(classification, language)
+                    yield json.dumps(line) + "\n"
+            finally:
+                # Skip the remaining images if the client went away
+                for future in futures:
+                    future.cancel()
+        
+        summary = summarize(classifications, language)
+        summary["failed"] = len(images) + len(errors) - len(classifications)
+        yield json.dumps({"summary": summary}) + "\n"
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@api_bp.route('/detect-disease/batch', methods=['POST'])
+@rate_limited('detect_disease_batch', Config.RATE_LIMIT_BATCH, Config.CONCURRENCY_LIMIT_BATCH)
+@per_file_upload_errors
+def detect_disease_batch():
+    """Endpoint for plant disease detection over many images"""
+    return _batch_analysis('disease')
+
+@api_bp.route('/analyze-soil/batch', methods=['POST'])
+@rate_limited('analyze_soil_batch', Config.RATE_LIMIT_BATCH, Config.CONCURRENCY_LIMIT_BATCH)
+@per_file_upload_errors
+def soil_analysis_batch():
+    """Endpoint for soil analysis over many images"""
+    return _batch_analysis('soil')
 
 @api_bp.route('/weather', methods=['GET'])
+@rate_limited('weather', Config.RATE_LIMIT_WEATHER)
 def weather():
     """Endpoint for weather data and recommendations"""
     try:
@@ -85,7 +253,10 @@ def weather():
         if not lat or not lon:
             return jsonify({"error": "Latitude and longitude parameters are required"}), 400
         
-        weather_data = get_weather_data(lat, lon)
+        try:
+            weather_data = get_cached_weather_data(lat, lon)
+        except ValueError:
+            return jsonify({"error": "Latitude and longitude must be valid coordinates"}), 400
         if not weather_data:
             return jsonify({"error": "Failed to fetch weather data"}), 500
         
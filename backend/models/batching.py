@@ -0,0 +1,121 @@
+"""
+Dynamic micro-batching for model inference.
+
+Requests submit single preprocessed tensors; a worker thread groups them
+into batches of up to max_batch_size, waiting at most max_wait seconds
+after the first one arrives, runs one vectorised forward pass and hands
+each request its own row of the output.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from backend.utils.metrics import Histogram
+
+class MicroBatcher:
+    """
+    Collects single-item inference requests into batches.
+
+    Args:
+        forward (callable): Takes an (N, ...) float32 array and returns an
+            array whose first dimension is N
+        max_batch_size (int): Largest batch handed to forward
+        max_wait (float): Seconds to wait for more requests after the first
+        name (str): Thread name
+    """
+
+    def __init__(self, forward, max_batch_size=8, max_wait=0.01, name='batcher'):
+        self.forward = forward
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.name = name
+        self.batch_sizes = Histogram(buckets=range(1, max_batch_size + 1))
+        self.queue_latency = Histogram()
+        self.total_latency = Histogram()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._buffer = None
+
+    def _ensure_worker(self):
+        # The worker thread does not survive a fork, start one per process
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def submit(self, tensor):
+        """
+        Queue one tensor with a leading batch dimension of 1.
+
+        Returns:
+            Future: Resolves to the forward output row for this tensor
+        """
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((tensor, future, time.perf_counter()))
+        return future
+
+    def predict(self, tensor, timeout=None):
+        """Submit a tensor and wait for its output row"""
+        return self.submit(tensor).result(timeout)
+
+    def _collect(self):
+        items = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(items) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                items.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return items
+
+    def _batch_array(self, tensors):
+        # Copy the inputs into a reused (max_batch_size, ...) buffer
+        sample_shape = tensors[0].shape[1:]
+        if self._buffer is None or self._buffer.shape[1:] != sample_shape:
+            self._buffer = np.empty((self.max_batch_size,) + sample_shape, dtype=np.float32)
+        batch = self._buffer[:len(tensors)]
+        np.concatenate(tensors, axis=0, out=batch)
+        return batch
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            started = time.perf_counter()
+            for _, _, submitted in items:
+                self.queue_latency.observe((started - submitted) * 1000)
+            self.batch_sizes.observe(len(items))
+
+            try:
+                outputs = self.forward(self._batch_array([tensor for tensor, _, _ in items]))
+            except Exception as e:
+                for _, future, _ in items:
+                    future.set_exception(e)
+                continue
+
+            finished = time.perf_counter()
+            for i, (_, future, submitted) in enumerate(items):
+                self.total_latency.observe((finished - submitted) * 1000)
+                future.set_result(outputs[i])
+
+    def stats(self):
+        """Return batch size and latency distributions"""
+        return {
+            "queue_depth": self._queue.qsize(),
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_latency_ms": self.queue_latency.snapshot(),
+            "total_latency_ms": self.total_latency.snapshot()
+        }
@@ -3,6 +3,10 @@ import numpy as np
 import json
 import random
 from pathlib import Path
+from backend.models.batching import MicroBatcher
+from backend.models.recommendations import knowledge_base
+from backend.models.registry import get_model
+from backend.utils.config import Config
 
 # Simplified class names without TensorFlow dependency
 class_names = {
@@ -25,53 +29,124 @@ translations = {
     }
 }
 
-def predict_disease(image, language='en'):
-    """Simulate plant disease prediction without ML model"""
+def simulate_disease_forward(batch):
+    """
+    Simulated forward pass over a batch of preprocessed images.
+    
+    Returns an (N, num_classes) array of class probabilities where one
+    random class per image gets a confidence between 0.7 and 0.99.
+    """
+    n = len(batch)
+    num_classes = len(class_names)
+    predicted = np.random.randint(0, num_classes, size=n)
+    confidence = np.random.uniform(0.7, 0.99, size=n)
+    
+    probabilities = np.empty((n, num_classes), dtype=np.float32)
+    probabilities[:] = ((1 - confidence) / (num_classes - 1))[:, None]
+    probabilities[np.arange(n), predicted] = confidence
+    return probabilities
+
+def disease_forward(batch):
+    """Run the disease model from the registry, or the simulator if there is none"""
+    model = get_model('disease')
+    if model is None:
+        return simulate_disease_forward(batch)
+    return model(batch)
+
+def disease_label(predicted_class, language='en'):
+    """Return the display name of a disease class in the given language"""
+    model = get_model('disease')
+    if model is not None and model.labels:
+        labels = model.labels.get(language) or model.labels['en']
+        return labels[predicted_class]
+    return translations[language][predicted_class]
+
+# Groups concurrent requests into one forward pass when enabled
+disease_batcher = MicroBatcher(
+    disease_forward,
+    max_batch_size=Config.INFERENCE_MAX_BATCH_SIZE,
+    max_wait=Config.INFERENCE_MAX_WAIT_MS / 1000,
+    name='disease-batcher'
+)
+
+def classify_disease(image):
+    """
+    Run disease classification on a preprocessed image.
+    
+    Returns:
+        dict: Language-independent result with the class index and confidence
+    """
+    if image is None:
+        raise Exception("Invalid image data")
+    
+    if Config.INFERENCE_BATCHING:
+        probabilities = disease_batcher.predict(image, timeout=Config.INFERENCE_TIMEOUT)
+    else:
+        probabilities = disease_forward(image)[0]
+    
+    predicted_class = int(np.argmax(probabilities))
+    return {
+        "class": predicted_class,
+        "confidence": float(probabilities[predicted_class])
+    }
+
+def disease_result(classification, language='en'):
+    """Render a classify_disease result in the given language"""
     # Validate language selection
     if language not in translations:
         language = 'en'  # Default to English
     
+    predicted_class = classification["class"]
+    return {
+        "disease": disease_label(predicted_class, language),
+        "confidence": classification["confidence"],
+        "recommendations": get_treatment_recommendations(predicted_class, language)
+    }
+
+def summarize_diseases(classifications, language='en'):
+    """
+    Aggregate the classify_disease results of a batch, e.g. the photos
+    taken across one plot.
+    
+    Returns:
+        dict: Number of images, share of healthy plants and the
+        prevalence of each class found, most common first
+    """
+    if language not in translations:
+        language = 'en'
+    
+    total = len(classifications)
+    counts = {}
+    confidence = {}
+    for classification in classifications:
+        predicted_class = classification["class"]
+        counts[predicted_class] = counts.get(predicted_class, 0) + 1
+        confidence[predicted_class] = confidence.get(predicted_class, 0.0) + classification["confidence"]
+    
+    healthy = sum(count for predicted_class, count in counts.items()
+                  if disease_label(predicted_class, 'en') == "Healthy")
+    prevalence = [
+        {
+            "disease": disease_label(predicted_class, language),
+            "count": count,
+            "share": round(count / total, 3),
+            "mean_confidence": round(confidence[predicted_class] / count, 3)
+        }
+        for predicted_class, count in sorted(counts.items(), key=lambda item: -item[1])
+    ]
+    return {
+        "images": total,
+        "healthy_share": round(healthy / total, 3) if total else 0.0,
+        "prevalence": prevalence
+    }
+
+def predict_disease(image, language='en'):
+    """Predict plant disease with the disease model, or simulate it if none is installed"""
     try:
-        # Generate a "prediction" (random for demo purposes)
-        if image is not None:
-            # For demo, we'll simulate a prediction
-            predicted_class = np.random.randint(0, 5)  # Random class between 0-4
-            confidence = np.random.uniform(0.7, 0.99)  # Random confidence
-            
-            result = {
-                "disease": translations[language][predicted_class],
-                "confidence": float(confidence),
-                "recommendations": get_treatment_recommendations(predicted_class, language)
-            }
-            
-            return result
-        else:
-            raise Exception("Invalid image data")
+        return disease_result(classify_disease(image), language)
     except Exception as e:
         raise Exception(f"Error predicting disease: {e}")
 
 def get_treatment_recommendations(disease_class, language='en'):
-    """Get treatment recommendations for a disease"""
-    # Sample recommendations
-    recommendations = {
-        'en': {
-            0: ["Plant is healthy, no treatment needed."],
-            1: ["Remove infected leaves.", "Apply copper-based fungicide.", "Ensure proper spacing for air circulation."],
-            2: ["Remove infected plants to prevent spread.", "Apply fungicide with chlorothalonil.", "Avoid overhead irrigation."],
-            3: ["Apply copper-based bactericide.", "Rotate crops.", "Avoid working with wet plants."],
-            4: ["Remove infected leaves.", "Apply fungicide.", "Maintain proper plant spacing."]
-        },
-        'hi': {
-            0: ["पौधा स्वस्थ है, कोई उपचार की आवश्यकता नहीं है।"],
-            1: ["संक्रमित पत्तियों को हटा दें।", "कॉपर-आधारित फफूंदनाशक लगाएं।", "हवा के संचार के लिए उचित स्पेसिंग सुनिश्चित करें।"],
-            2: ["प्रसार को रोकने के लिए संक्रमित पौधों को हटा दें।", "क्लोरोथालोनिल वाले फफूंदनाशक लगाएं।", "ऊपरी सिंचाई से बचें।"],
-            3: ["कॉपर-आधारित बैक्टीरियासाइड लगाएं।", "फसलों का रोटेशन करें।", "गीले पौधों के साथ काम करने से बचें।"],
-            4: ["संक्रमित पत्तियों को हटा दें।", "फफूंदनाशक लगाएं।", "उचित पौधों की स्पेसिंग बनाए रखें।"]
-        }
-    }
-    
-    # Validate language selection
-    if language not in recommendations:
-        language = 'en'  # Default to English
-    
-    return recommendations[language][disease_class] 
\ No newline at end of file
+    """Get treatment recommendations for a disease from the knowledge base"""
+    return knowledge_base.for_class('disease', disease_class, language)
@@ -0,0 +1,239 @@
+"""
+Executor for CPU-bound image analysis.
+
+Preprocessing and inference hold the GIL for most of their run time, so
+doing them in the request thread stalls every other request the worker
+is serving. With Config.ANALYSIS_WORKERS > 0 they run in a process pool
+instead: the uploaded bytes are handed over through shared memory, each
+pool process loads the models once, and only the small result dict
+comes back. The number of analyses queued or running is bounded; beyond
+that callers get AnalysisBusyError so the route can answer 503.
+"""
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+from backend.models.disease_detection import classify_disease
+from backend.models.registry import registry
+from backend.models.soil_analysis import classify_soil
+from backend.utils.config import Config
+from backend.utils.helpers import preprocess_image
+from backend.utils.metrics import metrics
+
+# Classifier for each kind of analysis
+ANALYZERS = {
+    'disease': classify_disease,
+    'soil': classify_soil
+}
+
+# Stages timed for every analysis, in milliseconds; the routes add
+# 'upload' (reading the file) and 'recommendations' (building the result)
+STAGES = ('queue_wait', 'preprocess', 'inference', 'total')
+
+analysis_stages = metrics.histogram(
+    'analysis_stage_duration_seconds', 'Time spent in each stage of an image analysis',
+    ('kind', 'stage')
+)
+
+class AnalysisBusyError(Exception):
+    """Raised when too many analyses are already queued or running"""
+
+def analyze_image(kind, image_data):
+    """
+    Preprocess an uploaded image and classify it.
+
+    Args:
+        kind (str): 'disease' or 'soil'
+        image_data: The uploaded image as bytes or a memoryview
+
+    Returns:
+        tuple: (classification, timings) where classification is the
+        language-independent result, or None if the image can't be read,
+        and timings holds the per-stage durations in milliseconds
+    """
+    start = time.perf_counter()
+    tensor = preprocess_image(image_data)
+    preprocessed = time.perf_counter()
+    timings = {"preprocess": (preprocessed - start) * 1000}
+    if tensor is None:
+        return None, timings
+
+    classification = ANALYZERS[kind](tensor)
+    timings["inference"] = (time.perf_counter() - preprocessed) * 1000
+    return classification, timings
+
+def _init_pool_process():
+    # Load the models once per pool process rather than on first request
+    if Config.USE_MODELS:
+        registry.preload(list(ANALYZERS))
+
+def _analyze_shared(kind, shm_name, size, submitted_at):
+    """Pool-side entry point: read the image from shared memory and analyze it"""
+    started = time.time()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    view = shm.buf[:size]
+    try:
+        classification, timings = analyze_image(kind, view)
+    finally:
+        view.release()
+        shm.close()
+    timings["queue_wait"] = max(started - submitted_at, 0) * 1000
+    return classification, timings
+
+class AnalysisExecutor:
+    """
+    Runs analyses inline or in a process pool, with a bound on how many
+    may be pending at once.
+
+    Args:
+        workers (int): Pool processes; 0 runs analyses in the calling thread
+        max_pending (int): Analyses queued or running before new ones are refused
+        start_method (str): multiprocessing start method for the pool
+    """
+
+    def __init__(self, workers=0, max_pending=16, start_method='forkserver'):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.start_method = start_method
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        # Pool processes belong to the process that started them, so a
+        # forked gunicorn worker starts its own
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                context = multiprocessing.get_context(self.start_method)
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                                 initializer=_init_pool_process)
+                self._pid = os.getpid()
+            return self._pool
+
+    def _discard_pool(self, pool):
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False)
+
+    def _reserve(self):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise AnalysisBusyError(f"{self.pending} analyses are already pending")
+            self.pending += 1
+
+    def _release(self, failed=False):
+        with self._lock:
+            self.pending -= 1
+            if failed:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    def analyze(self, kind, image_data, timeout=None):
+        """
+        Preprocess and classify an uploaded image.
+
+        Args:
+            kind (str): 'disease' or 'soil'
+            image_data (bytes): The uploaded image
+            timeout (float): Seconds to wait for a pooled analysis;
+                defaults to Config.ANALYSIS_TIMEOUT
+
+        Returns:
+            dict: The classification, or None if the image can't be read
+
+        Raises:
+            AnalysisBusyError: If max_pending analyses are already in progress
+            TimeoutError: If the pool did not finish in time
+        """
+        self._reserve()
+        start = time.perf_counter()
+        if self.workers:
+            classification, timings = self._analyze_in_pool(kind, image_data, timeout)
+        else:
+            try:
+                classification, timings = analyze_image(kind, image_data)
+            except Exception:
+                self._release(failed=True)
+                raise
+            timings["queue_wait"] = 0.0
+            self._release()
+
+        timings["total"] = (time.perf_counter() - start) * 1000
+        for stage, value in timings.items():
+            analysis_stages.labels(kind, stage).observe(value)
+        return classification
+
+    def _analyze_in_pool(self, kind, image_data, timeout):
+        timeout = Config.ANALYSIS_TIMEOUT if timeout is None else timeout
+        size = len(image_data)
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        shm.buf[:size] = image_data
+
+        def cleanup(future):
+            # Runs when the pool finishes, even if the caller timed out
+            shm.close()
+            shm.unlink()
+            self._release(failed=future.cancelled() or future.exception() is not None)
+
+        pool = None
+        try:
+            pool = self._get_pool()
+            future = pool.submit(_analyze_shared, kind, shm.name, size, time.time())
+        except Exception:
+            if pool is not None:
+                self._discard_pool(pool)
+            shm.close()
+            shm.unlink()
+            self._release(failed=True)
+            raise
+        future.add_done_callback(cleanup)
+
+        try:
+            return future.result(timeout)
+        except BrokenProcessPool:
+            # A pool process died (e.g. out of memory); start afresh next time
+            self._discard_pool(pool)
+            raise
+        except FutureTimeoutError:
+            raise TimeoutError(f"Analysis did not finish within {timeout}s")
+
+    def shutdown(self):
+        """Stop the pool processes started by this process"""
+        with self._lock:
+            pool = self._pool if self._pid == os.getpid() else None
+            self._pool = None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        """Return pool size, queue depth, counters and per-kind, per-stage timings"""
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "stage_ms": {f"{kind}.{stage}": histogram.snapshot()
+                         for (kind, stage), histogram in analysis_stages.children()}
+        }
+
+analysis_executor = AnalysisExecutor(
+    workers=Config.ANALYSIS_WORKERS,
+    max_pending=Config.ANALYSIS_MAX_PENDING,
+    start_method=Config.ANALYSIS_START_METHOD
+)
+atexit.register(analysis_executor.shutdown)
@@ -0,0 +1,166 @@
+"""
+Recommendation knowledge base for ShetkarAI.
+
+Advice is data, not code: recommendations.json (or the file set in
+Config.RECOMMENDATIONS_PATH) holds per-class advice for each model and
+threshold rules for measured values, each text given in every language
+it has been translated to. The file is compiled once at import into
+read-only tables indexed by (kind, class, language), so a lookup does
+not build anything.
+
+A rule fires when all of its conditions hold, e.g.
+``{"group": "ph", "when": {"ph": {"lt": 6.0}}, "text": {...}}``.
+Within a group only the first matching rule fires, which gives
+if/elif/else chains; ``exists`` matches any value that is present.
+A rule set may also define a ``default`` text used when no rule fired
+and a ``no_data`` text used when there are no facts at all.
+"""
+import json
+import operator
+import os
+from types import MappingProxyType
+
+from backend.utils.config import Config
+
+# Condition operators available to rules
+OPERATORS = {
+    'lt': operator.lt,
+    'le': operator.le,
+    'gt': operator.gt,
+    'ge': operator.ge,
+    'eq': operator.eq,
+    'in': lambda value, limit: value in limit,
+    'exists': lambda value, limit: True
+}
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), 'recommendations.json')
+
+def _localize(text, languages, missing, where):
+    # One text in every language, falling back to English
+    localized = {}
+    for language in languages:
+        if language in text:
+            localized[language] = text[language]
+        else:
+            localized[language] = text['en']
+            missing.append((language, where))
+    return localized
+
+def _compile_conditions(when, where):
+    conditions = []
+    for field, checks in when.items():
+        for name, limit in checks.items():
+            if name not in OPERATORS:
+                raise ValueError(f"{where}: unknown operator '{name}'")
+            if name == 'in':
+                limit = frozenset(limit)
+            conditions.append((field, OPERATORS[name], limit))
+    return tuple(conditions)
+
+class KnowledgeBase:
+    """
+    Compiled recommendation tables and rules.
+
+    Args:
+        data (dict): The parsed knowledge base file
+        languages (list): Languages to compile; others fall back to English
+    """
+
+    def __init__(self, data, languages):
+        self.languages = tuple(languages)
+        self.missing = []
+
+        self.classes = {}
+        for kind, table in data.get('classes', {}).items():
+            by_language = {language: {} for language in self.languages}
+            for class_id, texts in table.items():
+                localized = [_localize(text, self.languages, self.missing, f"{kind}/{class_id}")
+                             for text in texts]
+                for language in self.languages:
+                    by_language[language][int(class_id)] = tuple(text[language] for text in localized)
+            self.classes[kind] = MappingProxyType({
+                language: MappingProxyType(texts) for language, texts in by_language.items()
+            })
+
+        self.rules = {}
+        for kind, rule_set in data.get('rules', {}).items():
+            # Rules are kept grouped, in order of first appearance
+            groups = {}
+            for i, rule in enumerate(rule_set.get('rules', [])):
+                where = f"{kind} rule {i}"
+                groups.setdefault(rule.get('group', where), []).append((
+                    _compile_conditions(rule.get('when', {}), where),
+                    MappingProxyType(_localize(rule['text'], self.languages, self.missing, where))
+                ))
+            extras = {
+                name: MappingProxyType(_localize(rule_set[name], self.languages, self.missing, f"{kind}/{name}"))
+                for name in ('default', 'no_data') if name in rule_set
+            }
+            self.rules[kind] = (tuple(tuple(rules) for rules in groups.values()), MappingProxyType(extras))
+
+    def _language(self, language):
+        return language if language in self.languages else 'en'
+
+    def for_class(self, kind, class_id, language='en'):
+        """
+        Return the advice for a predicted class.
+
+        Returns:
+            tuple: The recommendation texts (empty for unknown classes)
+        """
+        return self.classes[kind][self._language(language)].get(class_id, ())
+
+    def evaluate(self, kind, facts, language='en'):
+        """
+        Run the rules of kind against facts.
+
+        Args:
+            kind (str): Rule set name, e.g. 'soil' or 'weather'
+            facts (dict): Measured values, None values count as absent;
+                None or empty for no data at all
+            language (str): Language of the returned texts
+
+        Returns:
+            list: Texts of the rules that fired, one per group at most
+        """
+        language = self._language(language)
+        groups, extras = self.rules[kind]
+        if not facts and 'no_data' in extras:
+            return [extras['no_data'][language]]
+
+        result = []
+        for rules in groups:
+            for conditions, text in rules:
+                for field, check, limit in conditions:
+                    value = facts.get(field)
+                    if value is None or not check(value, limit):
+                        break
+                else:
+                    # First matching rule of the group wins
+                    result.append(text[language])
+                    break
+
+        if not result and 'default' in extras:
+            result.append(extras['default'][language])
+        return result
+
+def load_knowledge_base(path=None, languages=None):
+    """
+    Load and compile a knowledge base file, reporting missing translations.
+
+    Args:
+        path (str): JSON file; defaults to Config.RECOMMENDATIONS_PATH or
+            the bundled recommendations.json
+        languages (list): Defaults to Config.SUPPORTED_LANGUAGES
+
+    Returns:
+        KnowledgeBase: The compiled knowledge base
+    """
+    path = path or Config.RECOMMENDATIONS_PATH or DEFAULT_PATH
+    with open(path, encoding='utf-8') as f:
+        knowledge_base = KnowledgeBase(json.load(f), languages or Config.SUPPORTED_LANGUAGES)
+    for language, where in knowledge_base.missing:
+        print(f"Missing '{language}' recommendation text for {where}, using English")
+    return knowledge_base
+
+knowledge_base = load_knowledge_base()
@@ -0,0 +1,227 @@
+"""
+Model registry for ShetkarAI.
+
+Discovers model artifacts under Config.MODEL_PATH and loads them lazily,
+once per process. An artifact is named after the model it serves:
+
+    disease.npz / disease.onnx
+    soil.npz / soil.onnx
+
+plus an optional ``<name>.labels.json`` holding either a list of English
+class names or a {"en": [...], "hi": [...]} mapping.
+
+The ``.npz`` format is a small CPU-friendly MLP: arrays ``w0, b0, w1, b1,
+...`` for the dense layers (ReLU between them, softmax at the end) and an
+optional integer ``pool`` giving the average-pooling factor applied to
+the image first; the flattened input is in HWC order. ``.onnx`` models
+need onnxruntime installed.
+
+When no artifact exists for a model, callers fall back to the simulator.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from backend.utils.config import Config
+from backend.utils.helpers import image_tensor_shape
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+def _file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()[:12]
+
+def _softmax(logits):
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+class NumpyModel:
+    """Dense network stored as NumPy arrays in an .npz file"""
+    backend = 'numpy'
+
+    def __init__(self, path):
+        with np.load(path) as data:
+            self.pool = int(data['pool']) if 'pool' in data else 1
+            self.layers = []
+            i = 0
+            while f'w{i}' in data:
+                weights = np.ascontiguousarray(data[f'w{i}'], dtype=np.float32)
+                bias = np.ascontiguousarray(data[f'b{i}'], dtype=np.float32)
+                self.layers.append((weights, bias))
+                i += 1
+        if not self.layers:
+            raise ValueError(f"{path} contains no w0/b0 layer weights")
+
+    @property
+    def nbytes(self):
+        return sum(weights.nbytes + bias.nbytes for weights, bias in self.layers)
+
+    def __call__(self, batch):
+        if Config.IMAGE_LAYOUT == 'NCHW':
+            batch = batch.transpose(0, 2, 3, 1)
+        n, height, width, channels = batch.shape
+        x = batch
+        if self.pool > 1:
+            x = x.reshape(n, height // self.pool, self.pool,
+                          width // self.pool, self.pool, channels).mean(axis=(2, 4))
+        x = x.reshape(n, -1)
+        for i, (weights, bias) in enumerate(self.layers):
+            x = x @ weights + bias
+            if i < len(self.layers) - 1:
+                np.maximum(x, 0, out=x)
+        return _softmax(x)
+
+class OnnxModel:
+    """ONNX model run with onnxruntime on the CPU"""
+    backend = 'onnx'
+
+    def __init__(self, path):
+        if onnxruntime is None:
+            raise ImportError("onnxruntime is required to load .onnx models")
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = Config.MODEL_THREADS
+        self.session = onnxruntime.InferenceSession(
+            path, sess_options=options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.nbytes = os.path.getsize(path)
+
+    def __call__(self, batch):
+        logits = self.session.run(None, {self.input_name: batch})[0]
+        return _softmax(np.asarray(logits, dtype=np.float32))
+
+MODEL_BACKENDS = {
+    '.npz': NumpyModel,
+    '.onnx': OnnxModel
+}
+
+class LoadedModel:
+    """A loaded model plus its metadata"""
+
+    def __init__(self, name, path, model, labels, load_seconds, warmup_ms):
+        self.name = name
+        self.path = path
+        self.model = model
+        self.labels = labels
+        self.version = f"{name}-{model.backend}-{_file_digest(path)}"
+        self.load_seconds = load_seconds
+        self.warmup_ms = warmup_ms
+
+    def __call__(self, batch):
+        return self.model(batch)
+
+    def stats(self):
+        return {
+            "backend": self.model.backend,
+            "path": self.path,
+            "version": self.version,
+            "load_seconds": round(self.load_seconds, 3),
+            "warmup_ms": round(self.warmup_ms, 2),
+            "memory_bytes": self.model.nbytes
+        }
+
+class ModelRegistry:
+    """Finds and lazily loads the models under a directory"""
+
+    def __init__(self, model_path=None):
+        self.model_path = model_path or Config.MODEL_PATH
+        self._models = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+
+    def find_artifact(self, name):
+        """Return the artifact path for a model name, or None"""
+        for extension in MODEL_BACKENDS:
+            path = os.path.join(self.model_path, name + extension)
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def _load_labels(self, name):
+        path = os.path.join(self.model_path, f"{name}.labels.json")
+        if not os.path.isfile(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            labels = json.load(f)
+        if isinstance(labels, list):
+            labels = {'en': labels}
+        return labels
+
+    def _load(self, name):
+        path = self.find_artifact(name)
+        if path is None:
+            return None
+
+        start = time.perf_counter()
+        model = MODEL_BACKENDS[os.path.splitext(path)[1]](path)
+        labels = self._load_labels(name)
+        load_seconds = time.perf_counter() - start
+
+        # Warm-up pass so the first real request doesn't pay for lazy
+        # allocations inside the runtime
+        start = time.perf_counter()
+        model(np.zeros(image_tensor_shape(), dtype=np.float32))
+        warmup_ms = (time.perf_counter() - start) * 1000
+
+        loaded = LoadedModel(name, path, model, labels, load_seconds, warmup_ms)
+        print(f"Loaded {loaded.version} in {load_seconds:.2f}s "
+              f"({model.nbytes / 1024 / 1024:.1f} MB, warm-up {warmup_ms:.1f} ms)")
+        return loaded
+
+    def get(self, name):
+        """
+        Return the loaded model for name, loading it on first use.
+
+        Returns:
+            LoadedModel: The model, or None if there is no usable artifact
+        """
+        if name in self._models:
+            return self._models[name]
+
+        with self._lock:
+            if name not in self._models:
+                try:
+                    self._models[name] = self._load(name)
+                except Exception as e:
+                    print(f"Error loading model '{name}': {e}")
+                    self._errors[name] = str(e)
+                    self._models[name] = None
+        return self._models[name]
+
+    def preload(self, names):
+        """Load the given models now, e.g. in the gunicorn master before forking"""
+        for name in names:
+            self.get(name)
+
+    def stats(self):
+        """Return metadata for every model looked up so far"""
+        result = {}
+        for name, model in self._models.items():
+            if model is not None:
+                result[name] = model.stats()
+            else:
+                result[name] = {"backend": "simulator", "error": self._errors.get(name)}
+        return result
+
+registry = ModelRegistry()
+
+def get_model(name):
+    """Return the real model for name, or None to use the simulator"""
+    if not Config.USE_MODELS:
+        return None
+    return registry.get(name)
+
+def model_version(name):
+    """Return the version of the model serving name, 'simulator' if none"""
+    model = get_model(name)
+    return model.version if model is not None else 'simulator'
@@ -0,0 +1,60 @@
+"""
+Content-addressed cache of image analysis results.
+
+Results are keyed on a hash of the uploaded bytes plus the version of the
+model that produced them, and stored without translations (class index,
+confidence, properties) so one entry serves every language.
+"""
+import hashlib
+
+from backend.models.registry import model_version
+from backend.utils.cache import make_cache
+from backend.utils.config import Config
+
+# In-memory tier, bounded by total size
+result_cache = make_cache(
+    'analysis_results',
+    maxsize=Config.RESULT_CACHE_MAX_ENTRIES,
+    ttl=Config.RESULT_CACHE_TTL,
+    shared=False,
+    max_bytes=Config.RESULT_CACHE_MAX_BYTES
+)
+
+# Optional on-disk tier that survives restarts and is shared by workers
+result_store = None
+if Config.RESULT_CACHE_PERSIST:
+    result_store = make_cache(
+        'analysis_results_disk',
+        maxsize=Config.RESULT_CACHE_DISK_ENTRIES,
+        ttl=Config.RESULT_CACHE_TTL,
+        shared=True
+    )
+
+def result_key(kind, image_data):
+    """
+    Build the cache key for an analysis of image_data.
+    
+    Args:
+        kind (str): Model name ('disease' or 'soil')
+        image_data (bytes): The uploaded image
+        
+    Returns:
+        str: Key combining the kind, model version and content hash
+    """
+    digest = hashlib.sha256(image_data).hexdigest()
+    return f"{kind}:{model_version(kind)}:{digest}"
+
+def lookup_result(key):
+    """Return the cached analysis for key, or None"""
+    result = result_cache.get(key)
+    if result is None and result_store is not None:
+        result = result_store.get(key)
+        if result is not None:
+            result_cache.set(key, result)
+    return result
+
+def store_result(key, result):
+    """Cache a language-independent analysis result"""
+    result_cache.set(key, result)
+    if result_store is not None:
+        result_store.set(key, result)
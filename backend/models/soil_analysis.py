@@ -3,6 +3,8 @@ import numpy as np
 import json
 import random
 from pathlib import Path
+from backend.models.recommendations import knowledge_base
+from backend.models.registry import get_model
 
 # Simplified soil types without TensorFlow dependency
 soil_types = {
@@ -23,117 +25,111 @@ translations = {
     }
 }
 
-def analyze_soil(image, language='en'):
-    """Simulate soil analysis without ML model"""
-    # Validate language selection
-    if language not in translations:
-        language = 'en'  # Default to English
+def predict_soil_type(image):
+    """
+    Classify the soil type of a preprocessed image.
     
-    try:
-        # Generate a "prediction" (random for demo purposes)
-        if image is not None:
-            # For demo, we'll simulate a prediction
-            soil_type = np.random.randint(0, 4)  # Random soil type between 0-3
-            
-            # Simulate soil properties
-            properties = {
-                "ph": round(np.random.uniform(5.5, 7.5), 1),
-                "nitrogen": round(np.random.uniform(10, 40), 0),
-                "phosphorus": round(np.random.uniform(5, 20), 0),
-                "potassium": round(np.random.uniform(5, 20), 0),
-                "organic_matter": round(np.random.uniform(1, 5), 1)
-            }
-            
-            result = {
-                "soil_type": translations[language][soil_type],
-                "properties": properties,
-                "recommendations": get_soil_recommendations(soil_type, properties, language)
-            }
-            
-            return result
-        else:
-            raise Exception("Invalid image data")
-    except Exception as e:
-        raise Exception(f"Error analyzing soil: {e}")
+    Uses the soil model from the registry if one is installed, otherwise
+    picks a random soil type.
+    """
+    model = get_model('soil')
+    if model is None:
+        return int(np.random.randint(0, 4))  # Random soil type between 0-3
+    return int(np.argmax(model(image)[0]))
 
-def get_soil_recommendations(soil_type, properties, language='en'):
-    """Get recommendations based on soil type and properties"""
-    # Sample recommendations
-    recommendations = {
-        'en': {
-            0: [  # Clay soil
-                "Add organic matter to improve drainage.",
-                "Avoid overwatering as clay retains moisture well.",
-                "Plant crops that thrive in clay soil like cabbage and broccoli."
-            ],
-            1: [  # Sandy soil
-                "Add compost to improve water retention.",
-                "Water frequently as sandy soil drains quickly.",
-                "Plant root vegetables like carrots and potatoes."
-            ],
-            2: [  # Loamy soil
-                "Maintain organic matter levels with regular compost additions.",
-                "Most crops will grow well in this balanced soil type.",
-                "Rotate crops to maintain soil health."
-            ],
-            3: [  # Silty soil
-                "Add organic matter to improve structure.",
-                "Avoid walking on soil when wet to prevent compaction.",
-                "Good for growing most vegetables and fruits."
-            ]
-        },
-        'hi': {
-            0: [  # Clay soil
-                "जल निकासी में सुधार के लिए जैविक पदार्थ जोड़ें।",
-                "अधिक पानी देने से बचें क्योंकि मिट्टी नमी को अच्छी तरह से बनाए रखती है।",
-                "पत्तागोभी और ब्रोकोली जैसी फसलें लगाएं जो चिकनी मिट्टी में अच्छी तरह से उगती हैं।"
-            ],
-            1: [  # Sandy soil
-                "पानी के धारण को बेहतर बनाने के लिए कम्पोस्ट जोड़ें।",
-                "बार-बार पानी दें क्योंकि रेतीली मिट्टी जल्दी सूख जाती है।",
-                "गाजर और आलू जैसी जड़ वाली सब्जियां लगाएं।"
-            ],
-            2: [  # Loamy soil
-                "नियमित कम्पोस्ट जोड़कर जैविक पदार्थ के स्तर को बनाए रखें।",
-                "अधिकांश फसलें इस संतुलित मिट्टी के प्रकार में अच्छी तरह से उगेंगी।",
-                "मिट्टी के स्वास्थ्य को बनाए रखने के लिए फसलों को घुमाएं।"
-            ],
-            3: [  # Silty soil
-                "संरचना में सुधार के लिए जैविक पदार्थ जोड़ें।",
-                "संघनन को रोकने के लिए गीली मिट्टी पर चलने से बचें।",
-                "अधिकांश सब्जियों और फलों के लिए अच्छी है।"
-            ]
-        }
-    }
+def soil_label(soil_type, language='en'):
+    """Return the display name of a soil type in the given language"""
+    model = get_model('soil')
+    if model is not None and model.labels:
+        labels = model.labels.get(language) or model.labels['en']
+        return labels[soil_type]
+    return translations[language][soil_type]
+
+def classify_soil(image):
+    """
+    Run soil analysis on a preprocessed image.
+    
+    Returns:
+        dict: Language-independent result with the soil type index and
+        (simulated) soil properties
+    """
+    if image is None:
+        raise Exception("Invalid image data")
     
-    # Additional pH-based recommendations
-    ph_recommendations = {
-        'en': {
-            "low": "Your soil pH is low. Consider adding lime to raise pH.",
-            "high": "Your soil pH is high. Consider adding sulfur to lower pH.",
-            "optimal": "Your soil pH is in the optimal range for most crops."
-        },
-        'hi': {
-            "low": "आपकी मिट्टी का पीएच कम है। पीएच बढ़ाने के लिए चूना जोड़ने पर विचार करें।",
-            "high": "आपकी मिट्टी का पीएच अधिक है। पीएच कम करने के लिए सल्फर जोड़ने पर विचार करें।",
-            "optimal": "आपकी मिट्टी का पीएच अधिकांश फसलों के लिए इष्टतम सीमा में है।"
-        }
+    soil_type = predict_soil_type(image)
+    
+    # Simulate soil properties
+    properties = {
+        "ph": round(float(np.random.uniform(5.5, 7.5)), 1),
+        "nitrogen": round(float(np.random.uniform(10, 40)), 0),
+        "phosphorus": round(float(np.random.uniform(5, 20)), 0),
+        "potassium": round(float(np.random.uniform(5, 20)), 0),
+        "organic_matter": round(float(np.random.uniform(1, 5)), 1)
     }
     
+    return {
+        "soil_type": soil_type,
+        "properties": properties
+    }
+
+def soil_result(classification, language='en'):
+    """Render a classify_soil result in the given language"""
     # Validate language selection
-    if language not in recommendations:
+    if language not in translations:
         language = 'en'  # Default to English
     
-    # Get basic recommendations based on soil type
-    result = recommendations[language][soil_type].copy()
+    soil_type = classification["soil_type"]
+    properties = classification["properties"]
+    return {
+        "soil_type": soil_label(soil_type, language),
+        "properties": dict(properties),
+        "recommendations": get_soil_recommendations(soil_type, properties, language)
+    }
+
+def summarize_soil(classifications, language='en'):
+    """
+    Aggregate the classify_soil results of a batch of samples.
     
-    # Add pH-specific recommendation
-    ph = properties['ph']
-    if ph < 6.0:
-        result.append(ph_recommendations[language]["low"])
-    elif ph > 7.2:
-        result.append(ph_recommendations[language]["high"])
-    else:
-        result.append(ph_recommendations[language]["optimal"])
+    Returns:
+        dict: Number of samples, how often each soil type was found
+        (most common first) and the mean of each soil property
+    """
+    if language not in translations:
+        language = 'en'
+    
+    total = len(classifications)
+    counts = {}
+    totals = {}
+    for classification in classifications:
+        soil_type = classification["soil_type"]
+        counts[soil_type] = counts.get(soil_type, 0) + 1
+        for name, value in classification["properties"].items():
+            totals[name] = totals.get(name, 0.0) + value
+    
+    return {
+        "images": total,
+        "soil_types": [
+            {"soil_type": soil_label(soil_type, language), "count": count, "share": round(count / total, 3)}
+            for soil_type, count in sorted(counts.items(), key=lambda item: -item[1])
+        ],
+        "mean_properties": {name: round(value / total, 2) for name, value in totals.items()}
+    }
+
+def analyze_soil(image, language='en'):
+    """Analyze soil with the soil model, simulating what it can't predict"""
+    try:
+        return soil_result(classify_soil(image), language)
+    except Exception as e:
+        raise Exception(f"Error analyzing soil: {e}")
+
+def get_soil_recommendations(soil_type, properties, language='en'):
+    """
+    Get recommendations based on soil type and properties.
     
-    return result 
\ No newline at end of file
+    Combines the advice for the soil type with the knowledge base's soil
+    rules (e.g. pH thresholds) applied to the measured properties.
+    """
+    return [
+        *knowledge_base.for_class('soil', soil_type, language),
+        *knowledge_base.evaluate('soil', properties, language)
+    ]
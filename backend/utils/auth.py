@@ -0,0 +1,530 @@
+"""
+Local verification of Supabase access tokens for ShetkarAI.
+
+After login the Supabase access and refresh tokens are kept in the
+session. Protected routes (see login_required) verify the access token
+in this process: the signature against the project's JWT secret (HS256)
+or its published signing keys (RS256/ES256, fetched once and cached;
+needs the optional PyJWT package), then the expiry, audience and
+issuer. No Supabase call is made on the way. API clients such as the
+mobile app send the token as "Authorization: Bearer <token>" instead.
+
+When a session's token is within Config.AUTH_REFRESH_MARGIN seconds of
+expiring, it is refreshed by a background thread and the next request
+of that session picks the new tokens up. Only a session that was idle
+past the expiry waits for a refresh inline. Refresh tokens are
+single-use, so each exchange is claimed and recorded in a SQLite file
+shared by the workers of the host (Config.AUTH_REFRESH_DB_PATH); a
+request in any worker that still carries the old token gets the new
+pair from there rather than exchanging it again.
+"""
+import base64
+import binascii
+import functools
+import hashlib
+import hmac
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from flask import g, jsonify, redirect, request, session, url_for
+
+from backend.utils.config import Config
+from backend.utils.http import get_with_retries
+from backend.utils.metrics import metrics
+from backend.utils.supabase import get_supabase_client
+
+try:
+    import jwt
+except ImportError:
+    jwt = None
+
+ASYMMETRIC_ALGORITHMS = ('RS256', 'ES256')
+
+# Session keys holding the login; dropped together when it is no longer valid
+LOGIN_KEYS = ('user_id', 'username', 'access_token', 'refresh_token')
+
+# Seconds before an unknown key ID may trigger another fetch of the signing keys
+JWKS_MIN_REFETCH = 60
+
+token_checks = metrics.counter(
+    'auth_token_checks_total', 'Access tokens checked locally, by where they came from and result',
+    ('source', 'result')
+)
+token_refreshes = metrics.counter(
+    'auth_token_refreshes_total', 'Access token refreshes, background or inline, by outcome',
+    ('mode', 'outcome')
+)
+
+class TokenError(Exception):
+    """Raised when an access token is malformed, forged or not for this project"""
+
+class TokenExpiredError(TokenError):
+    """Raised when an access token's signature is valid but it has expired"""
+
+class TokenUnverifiableError(TokenError):
+    """Raised when this process has no key (or library) to check a token with"""
+
+def _b64decode(segment):
+    return base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4))
+
+class TokenVerifier:
+    """
+    Verifies Supabase access tokens without calling Supabase.
+
+    Args:
+        secret (str): The project's JWT secret, for HS256 tokens
+        jwks_url (str): Where the project's public signing keys are published
+        apikey (str): Supabase API key sent when fetching the keys
+        issuer (str): Expected "iss" claim, or None to skip the check
+        audience (str): Expected "aud" claim
+        leeway (float): Seconds of clock skew tolerated on "exp" and "nbf"
+        jwks_ttl (float): Seconds the fetched signing keys are reused
+    """
+
+    def __init__(self, secret='', jwks_url=None, apikey=None, issuer=None,
+                 audience='authenticated', leeway=30, jwks_ttl=3600):
+        self.secret = secret.encode('utf-8') if secret else None
+        self.jwks_url = jwks_url
+        self.apikey = apikey
+        self.issuer = issuer
+        self.audience = audience
+        self.leeway = leeway
+        self.jwks_ttl = jwks_ttl
+        self._keys = {}
+        self._keys_fetched_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def available(self):
+        """Whether this process can verify any tokens at all"""
+        return self.secret is not None or (jwt is not None and bool(self.jwks_url))
+
+    def _fetch_keys(self):
+        # Keeps the previous keys if the fetch fails
+        self._keys_fetched_at = time.monotonic()
+        try:
+            headers = {'apikey': self.apikey} if self.apikey else None
+            response = get_with_retries(self.jwks_url, headers=headers, retries=1, upstream='supabase_jwks')
+            response.raise_for_status()
+            keys = {}
+            for jwk in response.json().get('keys', []):
+                if jwk.get('alg') in ASYMMETRIC_ALGORITHMS:
+                    keys[jwk.get('kid')] = jwt.PyJWK(jwk).key
+            self._keys = keys
+        except (requests.RequestException, ValueError, jwt.PyJWTError) as e:
+            print(f"Error fetching signing keys: {e}")
+
+    def _signing_key(self, kid):
+        with self._lock:
+            age = None if self._keys_fetched_at is None else time.monotonic() - self._keys_fetched_at
+            if age is None or age > self.jwks_ttl or (kid not in self._keys and age > JWKS_MIN_REFETCH):
+                # Unknown key IDs appear when Supabase rotates its keys
+                self._fetch_keys()
+            return self._keys.get(kid)
+
+    def _check_signature(self, header, signing_input, signature, token):
+        alg = header.get('alg')
+        if alg == 'HS256':
+            if self.secret is None:
+                raise TokenUnverifiableError("SUPABASE_JWT_SECRET is not set")
+            expected = hmac.new(self.secret, signing_input, hashlib.sha256).digest()
+            if not hmac.compare_digest(expected, signature):
+                raise TokenError("Invalid token signature")
+        elif alg in ASYMMETRIC_ALGORITHMS:
+            if jwt is None or not self.jwks_url:
+                raise TokenUnverifiableError(f"{alg} tokens need the PyJWT package and SUPABASE_URL")
+            key = self._signing_key(header.get('kid'))
+            if key is None:
+                raise TokenUnverifiableError(f"No signing key with ID {header.get('kid')!r}")
+            try:
+                # Only the signature: the claims are checked below for every algorithm
+                jwt.decode(token, key, algorithms=[alg], options={
+                    "verify_exp": False, "verify_nbf": False, "verify_iat": False,
+                    "verify_aud": False, "verify_iss": False
+                })
+            except jwt.PyJWTError:
+                raise TokenError("Invalid token signature")
+        else:
+            raise TokenError(f"Unsupported token algorithm {alg!r}")
+
+    def verify(self, token):
+        """
+        Check a token's signature and claims.
+
+        Returns:
+            dict: The token's claims; "sub" is the user ID
+
+        Raises:
+            TokenExpiredError: If the token is genuine but expired
+            TokenUnverifiableError: If there is no key to check it with
+            TokenError: If the token is malformed or invalid
+        """
+        try:
+            header_b64, payload_b64, signature_b64 = token.split('.')
+            header = json.loads(_b64decode(header_b64))
+            claims = json.loads(_b64decode(payload_b64))
+            signature = _b64decode(signature_b64)
+        except (AttributeError, ValueError, binascii.Error):
+            raise TokenError("Malformed token")
+        if not isinstance(header, dict) or not isinstance(claims, dict):
+            raise TokenError("Malformed token")
+
+        self._check_signature(header, f"{header_b64}.{payload_b64}".encode('ascii'), signature, token)
+
+        now = time.time()
+        audience = claims.get('aud')
+        if self.audience and self.audience not in (audience if isinstance(audience, list) else [audience]):
+            raise TokenError("Token is for another audience")
+        if self.issuer and claims.get('iss') != self.issuer:
+            raise TokenError("Token is from another issuer")
+        if not claims.get('sub'):
+            raise TokenError("Token has no subject")
+        if claims.get('nbf') is not None and now < claims['nbf'] - self.leeway:
+            raise TokenError("Token is not valid yet")
+        if not isinstance(claims.get('exp'), (int, float)) or now > claims['exp'] + self.leeway:
+            raise TokenExpiredError("Token has expired")
+        return claims
+
+def tokens_from_auth_session(auth_session):
+    """The parts of a Supabase auth session kept in the web session, or None"""
+    if auth_session is None or not auth_session.access_token:
+        return None
+    return {"access_token": auth_session.access_token, "refresh_token": auth_session.refresh_token}
+
+def _exchange_refresh_token(refresh_token):
+    response = get_supabase_client().auth.refresh_session(refresh_token)
+    return tokens_from_auth_session(response.session)
+
+class RefreshLedger:
+    """
+    Record of the refresh tokens exchanged on this host and what they were
+    exchanged for, in a SQLite file shared by every worker process.
+
+    Supabase refresh tokens are single-use: sending one again revokes the
+    login. So a token is exchanged by whichever thread first claims it
+    here, and every other request still carrying it, in any worker, takes
+    the new pair from the ledger instead.
+
+    Args:
+        path (str): SQLite database file
+        result_ttl (float): Seconds an exchange is remembered
+        claim_timeout (float): Seconds after which an unfinished claim is
+            taken to be abandoned by a dead process and may be claimed again
+        sweep_interval (float): Seconds between removals of expired entries
+    """
+
+    def __init__(self, path, result_ttl=24 * 3600, claim_timeout=60, sweep_interval=300):
+        self.path = path
+        self.result_ttl = result_ttl
+        self.claim_timeout = claim_timeout
+        self.sweep_interval = sweep_interval
+        self._next_sweep = time.time() + sweep_interval
+        self._local = threading.local()
+        self._stats_conn = None
+        self._stats_pid = None
+        self._stats_lock = threading.Lock()
+
+    def _connect(self):
+        # One connection per thread and per process; connections must
+        # not cross a fork. The file is only created once a token is refreshed
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS token_refreshes "
+                "(key TEXT PRIMARY KEY, tokens TEXT, claimed_at REAL, expires_at REAL)"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _key(refresh_token):
+        # The spent token itself isn't kept
+        return hashlib.sha256(refresh_token.encode('utf-8')).hexdigest()
+
+    def claim(self, refresh_token):
+        """Reserve refresh_token for exchange; False if it is taken or already exchanged"""
+        conn = self._connect()
+        key = self._key(refresh_token)
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, claimed_at FROM token_refreshes WHERE key = ? AND expires_at > ?",
+                               (key, now)).fetchone()
+            claimed = row is None or (row[0] is None and now - row[1] > self.claim_timeout)
+            if claimed:
+                conn.execute(
+                    "INSERT OR REPLACE INTO token_refreshes (key, tokens, claimed_at, expires_at) "
+                    "VALUES (?, NULL, ?, ?)",
+                    (key, now, now + self.result_ttl)
+                )
+            if now >= self._next_sweep:
+                self._next_sweep = now + self.sweep_interval
+                conn.execute("DELETE FROM token_refreshes WHERE expires_at <= ?", (now,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return claimed
+
+    def finish(self, refresh_token, tokens):
+        """Record what a claimed token was exchanged for"""
+        self._connect().execute(
+            "UPDATE token_refreshes SET tokens = ?, expires_at = ? WHERE key = ?",
+            (json.dumps(tokens), time.time() + self.result_ttl, self._key(refresh_token))
+        )
+
+    def release(self, refresh_token):
+        """Give up a claim whose exchange failed"""
+        self._connect().execute("DELETE FROM token_refreshes WHERE key = ? AND tokens IS NULL",
+                                (self._key(refresh_token),))
+
+    def lookup(self, refresh_token):
+        """
+        Returns:
+            tuple: (claimed, tokens): whether refresh_token is claimed or
+            exchanged, and the tokens it was exchanged for, if it has been
+        """
+        row = self._connect().execute(
+            "SELECT tokens FROM token_refreshes WHERE key = ? AND expires_at > ?",
+            (self._key(refresh_token), time.time())
+        ).fetchone()
+        if row is None:
+            return False, None
+        return True, json.loads(row[0]) if row[0] is not None else None
+
+    def stats(self):
+        """Return the ledger counters as a dict"""
+        # Scraped on every /metrics request, from whichever thread serves
+        # it: read through one connection per process, and don't create
+        # the file before anything has been refreshed
+        if not os.path.exists(self.path):
+            return {"claimed": 0, "exchanged": 0}
+        with self._stats_lock:
+            if self._stats_conn is None or self._stats_pid != os.getpid():
+                self._stats_conn = sqlite3.connect(self.path, timeout=5, isolation_level=None,
+                                                   check_same_thread=False)
+                self._stats_pid = os.getpid()
+            try:
+                pending, exchanged = self._stats_conn.execute(
+                    "SELECT COUNT(*) - COUNT(tokens), COUNT(tokens) FROM token_refreshes WHERE expires_at > ?",
+                    (time.time(),)
+                ).fetchone()
+            except sqlite3.OperationalError:
+                # Created by another worker that hasn't made the table yet
+                return {"claimed": 0, "exchanged": 0}
+        return {"claimed": pending, "exchanged": exchanged}
+
+class TokenRefresher:
+    """
+    Refreshes access tokens off the request path.
+
+    A refresh started with schedule() runs on a small thread pool; its
+    result is kept in the ledger under the old refresh token until the
+    session it belongs to collects it with take(), from any worker.
+
+    Args:
+        ledger (RefreshLedger): Where exchanges are claimed and recorded
+        workers (int): Refreshes run at once per process
+        wait_timeout (float): Seconds an inline refresh waits for one
+            already under way elsewhere
+    """
+
+    def __init__(self, ledger, workers=2, wait_timeout=10):
+        self.ledger = ledger
+        self.workers = workers
+        self.wait_timeout = wait_timeout
+        self._pending = set()
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        # Threads don't survive a fork; each gunicorn worker starts its own
+        if self._pool is None or self._pid != os.getpid():
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='token-refresh')
+            self._pid = os.getpid()
+            self._pending = set()
+        return self._pool
+
+    def _refresh(self, refresh_token, mode):
+        if not self.ledger.claim(refresh_token):
+            # Exchanged already, or being exchanged by another thread or worker
+            return self._wait(refresh_token) if mode == 'inline' else None
+        try:
+            tokens = _exchange_refresh_token(refresh_token)
+        except Exception as e:
+            print(f"Error refreshing access token: {e}")
+            tokens = None
+        token_refreshes.labels(mode, 'ok' if tokens else 'error').inc()
+        if tokens:
+            self.ledger.finish(refresh_token, tokens)
+        else:
+            self.ledger.release(refresh_token)
+        return tokens
+
+    def _wait(self, refresh_token):
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            claimed, tokens = self.ledger.lookup(refresh_token)
+            if tokens is not None or not claimed:
+                return tokens
+            time.sleep(0.05)
+        return None
+
+    def _refresh_in_background(self, refresh_token):
+        try:
+            self._refresh(refresh_token, 'background')
+        except sqlite3.Error as e:
+            print(f"Error recording token refresh: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(refresh_token)
+
+    def schedule(self, refresh_token):
+        """Start refreshing in the background unless already done or under way"""
+        if not refresh_token or self.ledger.lookup(refresh_token)[0]:
+            return
+        with self._lock:
+            pool = self._get_pool()
+            if refresh_token in self._pending:
+                return
+            self._pending.add(refresh_token)
+        pool.submit(self._refresh_in_background, refresh_token)
+
+    def take(self, refresh_token):
+        """Return the tokens refresh_token was exchanged for, or None"""
+        return self.ledger.lookup(refresh_token)[1] if refresh_token else None
+
+    def refresh_now(self, refresh_token):
+        """Return fresh tokens, refreshing inline if no other refresh finished"""
+        if not refresh_token:
+            return None
+        return self.take(refresh_token) or self._refresh(refresh_token, 'inline')
+
+    def stats(self):
+        """Return the refresh queue counters as a dict"""
+        return dict(self.ledger.stats(), pending=len(self._pending))
+
+def _jwks_url():
+    if Config.SUPABASE_JWKS_URL:
+        return Config.SUPABASE_JWKS_URL
+    if Config.SUPABASE_URL:
+        return Config.SUPABASE_URL.rstrip('/') + '/auth/v1/.well-known/jwks.json'
+    return None
+
+verifier = TokenVerifier(
+    secret=Config.SUPABASE_JWT_SECRET,
+    jwks_url=_jwks_url(),
+    apikey=Config.SUPABASE_KEY,
+    issuer=Config.SUPABASE_URL.rstrip('/') + '/auth/v1' if Config.SUPABASE_URL else None,
+    leeway=Config.AUTH_CLOCK_LEEWAY,
+    jwks_ttl=Config.AUTH_JWKS_TTL
+)
+refresher = TokenRefresher(RefreshLedger(Config.AUTH_REFRESH_DB_PATH))
+metrics.register_collector('token_refresher', refresher.stats)
+
+def store_tokens(tokens):
+    """Keep a Supabase token pair in the session of the current request"""
+    if tokens:
+        session['access_token'] = tokens['access_token']
+        session['refresh_token'] = tokens['refresh_token']
+
+def _forget_login():
+    for key in LOGIN_KEYS:
+        session.pop(key, None)
+
+def _session_user_id():
+    user_id = session.get('user_id')
+    if user_id is None:
+        return None
+    access_token = session.get('access_token')
+    if access_token is None:
+        # Logged in before tokens were kept; the signed session still vouches for it
+        return user_id
+
+    try:
+        claims = verifier.verify(access_token)
+    except TokenExpiredError:
+        token_checks.labels('session', 'expired').inc()
+        tokens = refresher.refresh_now(session.get('refresh_token'))
+        if tokens is None:
+            _forget_login()
+            return None
+        store_tokens(tokens)
+        return user_id
+    except TokenUnverifiableError:
+        token_checks.labels('session', 'unverifiable').inc()
+        return user_id
+    except TokenError:
+        token_checks.labels('session', 'invalid').inc()
+        _forget_login()
+        return None
+
+    if claims['sub'] != user_id:
+        token_checks.labels('session', 'invalid').inc()
+        _forget_login()
+        return None
+    token_checks.labels('session', 'ok').inc()
+    if claims['exp'] - time.time() < Config.AUTH_REFRESH_MARGIN:
+        refresh_token = session.get('refresh_token')
+        tokens = refresher.take(refresh_token)
+        if tokens is not None:
+            store_tokens(tokens)
+        else:
+            refresher.schedule(refresh_token)
+    return user_id
+
+def _bearer_user_id(token):
+    try:
+        claims = verifier.verify(token)
+    except TokenExpiredError:
+        token_checks.labels('bearer', 'expired').inc()
+        return None
+    except TokenUnverifiableError:
+        token_checks.labels('bearer', 'unverifiable').inc()
+        return None
+    except TokenError:
+        token_checks.labels('bearer', 'invalid').inc()
+        return None
+    token_checks.labels('bearer', 'ok').inc()
+    return claims['sub']
+
+def current_user_id():
+    """
+    Return the ID of the user making the request, from a bearer token or
+    the session, or None if the request isn't authenticated.
+    """
+    if 'auth_user_id' not in g:
+        header = request.headers.get('Authorization', '')
+        if header[:7].lower() == 'bearer ':
+            g.auth_user_id = _bearer_user_id(header[7:].strip())
+        else:
+            g.auth_user_id = _session_user_id()
+    return g.auth_user_id
+
+def authentication_required_response():
+    """401 for API and bearer-token clients, a redirect to the login page for browsers"""
+    if request.path.startswith('/api/') or 'Authorization' in request.headers:
+        return jsonify({"error": "Authentication required"}), 401, {'WWW-Authenticate': 'Bearer'}
+    return redirect(url_for('login_page'))
+
+def login_required(view):
+    """Only run view for an authenticated user; see current_user_id()"""
+    @functools.wraps(view)
+    def wrapped(*args, **kwargs):
+        if current_user_id() is None:
+            return authentication_required_response()
+        return view(*args, **kwargs)
+    return wrapped
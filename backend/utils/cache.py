@@ -0,0 +1,229 @@
+"""
+Caching helpers for ShetkarAI.
+
+Provides a thread-safe in-process LRU cache with per-entry TTL and a
+SQLite-backed cache that all gunicorn workers on a host can share.
+Both keep hit/miss/eviction counters for monitoring.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from backend.utils.config import Config
+
+# Every cache created through make_cache, by name
+_caches = {}
+
+def json_size(value):
+    """Approximate memory cost of a JSON-serialisable value in bytes"""
+    return len(json.dumps(value, separators=(',', ':')))
+
+class TTLCache:
+    """
+    In-process LRU cache whose entries expire after a TTL.
+
+    Bounded by entry count, and also by total size when max_bytes is set
+    (entry sizes are measured with the sizeof callable).
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, name=None, max_bytes=None, sizeof=json_size):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remove(self, key):
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at, _ = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+                self.evictions += 1
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        """Store value under key, evicting the least recently used entries"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, expires_at, size)
+            self._bytes += size
+            while len(self._data) > self.maxsize or (
+                    self.max_bytes is not None and self._bytes > self.max_bytes and len(self._data) > 1):
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def delete(self, key):
+        """Remove key from the cache if present"""
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Return the cache counters as a dict"""
+        return {
+            "backend": "memory",
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+class SQLiteCache:
+    """
+    TTL cache stored in a SQLite file so every worker process sees the
+    same entries. Values must be JSON-serialisable.
+    """
+
+    def __init__(self, path, maxsize=1024, ttl=300, name='default'):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._table = f"cache_{name}"
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self._table} "
+            "(key TEXT PRIMARY KEY, value TEXT, expires_at REAL, used_at REAL)"
+        )
+
+    def _connect(self):
+        # One connection per thread and per process; connections must
+        # not cross a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired"""
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            f"SELECT value FROM {self._table} WHERE key = ? AND expires_at > ?",
+            (str(key), now)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return default
+        conn.execute(f"UPDATE {self._table} SET used_at = ? WHERE key = ?", (now, str(key)))
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        """Store value under key and trim expired or excess entries"""
+        conn = self._connect()
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        conn.execute(
+            f"INSERT OR REPLACE INTO {self._table} (key, value, expires_at, used_at) "
+            "VALUES (?, ?, ?, ?)",
+            (str(key), json.dumps(value), expires_at, now)
+        )
+        removed = conn.execute(
+            f"DELETE FROM {self._table} WHERE expires_at <= ?", (now,)
+        ).rowcount
+        removed += conn.execute(
+            f"DELETE FROM {self._table} WHERE key IN (SELECT key FROM {self._table} "
+            "ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+            (self.maxsize,)
+        ).rowcount
+        self.evictions += max(removed, 0)
+
+    def delete(self, key):
+        """Remove key from the cache if present"""
+        self._connect().execute(f"DELETE FROM {self._table} WHERE key = ?", (str(key),))
+
+    def clear(self):
+        """Remove all entries"""
+        self._connect().execute(f"DELETE FROM {self._table}")
+
+    def __len__(self):
+        return self._connect().execute(f"SELECT COUNT(*) FROM {self._table}").fetchone()[0]
+
+    def stats(self):
+        """Return the cache counters as a dict (hits/misses are per process)"""
+        return {
+            "backend": "sqlite",
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+def make_cache(name, maxsize=1024, ttl=300, shared=None, max_bytes=None):
+    """
+    Create a named cache using the backend selected in Config.
+
+    Args:
+        name (str): Cache name, used for monitoring and the SQLite table
+        maxsize (int): Maximum number of entries
+        ttl (float): Seconds before an entry expires
+        shared (bool): Force the shared SQLite backend on or off;
+            defaults to Config.CACHE_BACKEND == 'sqlite'
+        max_bytes (int): Optional size bound for the in-memory backend
+
+    Returns:
+        TTLCache or SQLiteCache: The new cache
+    """
+    if shared is None:
+        shared = Config.CACHE_BACKEND == 'sqlite'
+
+    if shared:
+        cache = SQLiteCache(Config.SHARED_CACHE_PATH, maxsize=maxsize, ttl=ttl, name=name)
+    else:
+        cache = TTLCache(maxsize=maxsize, ttl=ttl, name=name, max_bytes=max_bytes)
+
+    _caches[name] = cache
+    return cache
+
+def cache_stats():
+    """Return the counters of every named cache"""
+    return {name: cache.stats() for name, cache in _caches.items()}
@@ -0,0 +1,88 @@
+"""
+Response compression for ShetkarAI.
+
+HTML, JSON and other text responses above Config.COMPRESSION_MIN_SIZE
+are compressed with brotli (when the brotli package is installed and the
+client accepts it) or gzip. Responses that carry an ETag, such as cached
+pages, keep their compressed bodies in a small cache so a repeat visit
+is not compressed again.
+"""
+import gzip
+
+from flask import request
+
+from backend.utils.cache import TTLCache
+from backend.utils.config import Config
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content types worth compressing
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/javascript', 'application/javascript',
+    'application/json', 'application/x-ndjson', 'image/svg+xml'
+}
+
+def _compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=Config.BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=Config.GZIP_LEVEL, mtime=0)
+
+def choose_encoding(accept_encodings):
+    """Pick 'br' or 'gzip' from an Accept-Encoding header, or None"""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+# Compressed bodies of responses with an ETag, by (etag, encoding)
+_compressed = TTLCache(maxsize=512, ttl=24 * 60 * 60, name='compressed_responses',
+                       max_bytes=Config.COMPRESSION_CACHE_BYTES, sizeof=len)
+
+def compress_response(response):
+    """
+    after_request hook that compresses eligible responses in place.
+
+    Streamed, file and partial responses are left alone, as are
+    responses that are already encoded.
+    """
+    response.vary.add('Accept-Encoding')
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if len(data) < Config.COMPRESSION_MIN_SIZE:
+        return response
+
+    etag, weak = response.get_etag()
+    key = (etag, encoding)
+    body = _compressed.get(key) if etag else None
+    if body is None:
+        body = _compress(data, encoding)
+        if etag:
+            _compressed.set(key, body)
+    if len(body) >= len(data):
+        return response
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    if etag and not weak:
+        # Same content, different bytes: the tag must no longer be strong
+        response.set_etag(etag, weak=True)
+    return response
+
+def init_compression(app):
+    """Register response compression on app if enabled in Config"""
+    if Config.COMPRESSION:
+        app.after_request(compress_response)
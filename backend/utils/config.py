@@ -11,20 +11,220 @@ class Config:
     SUPABASE_KEY = os.environ.get('SUPABASE_KEY', '')
     DEBUG = os.environ.get('DEBUG', 'False').lower() == 'true'
     
+    # Supabase connection pool settings (per gunicorn worker)
+    SUPABASE_POOL_MAXSIZE = int(os.environ.get('SUPABASE_POOL_MAXSIZE', 10))
+    SUPABASE_POOL_KEEPALIVE = int(os.environ.get('SUPABASE_POOL_KEEPALIVE', 10))
+    SUPABASE_KEEPALIVE_EXPIRY = float(os.environ.get('SUPABASE_KEEPALIVE_EXPIRY', 30))
+    SUPABASE_CONNECT_TIMEOUT = float(os.environ.get('SUPABASE_CONNECT_TIMEOUT', 3))
+    SUPABASE_TIMEOUT = float(os.environ.get('SUPABASE_TIMEOUT', 10))
+    
+    # Local verification of Supabase access tokens: the project's JWT
+    # secret for HS256 tokens; RS256/ES256 tokens are checked against the
+    # keys published at SUPABASE_JWKS_URL (default: derived from SUPABASE_URL)
+    SUPABASE_JWT_SECRET = os.environ.get('SUPABASE_JWT_SECRET', '')
+    SUPABASE_JWKS_URL = os.environ.get('SUPABASE_JWKS_URL', '')
+    AUTH_JWKS_TTL = int(os.environ.get('AUTH_JWKS_TTL', 3600))
+    AUTH_CLOCK_LEEWAY = int(os.environ.get('AUTH_CLOCK_LEEWAY', 30))
+    # Seconds before expiry at which a session's token is refreshed in the background
+    AUTH_REFRESH_MARGIN = int(os.environ.get('AUTH_REFRESH_MARGIN', 300))
+    # Refresh tokens exchanged on this host, shared by its workers so each
+    # single-use token is exchanged once
+    AUTH_REFRESH_DB_PATH = os.environ.get('AUTH_REFRESH_DB_PATH', os.path.join('instance', 'token_refreshes.sqlite3'))
+    # Require a login (session or bearer token) for the /api routes other than health
+    API_REQUIRE_AUTH = os.environ.get('API_REQUIRE_AUTH', 'False').lower() == 'true'
+    
+    # Session storage: 'cookie' (Flask's signed cookie), 'memory' (per
+    # worker, single-worker deployments only) or 'sqlite' (shared by all
+    # workers on the host); the server-side backends only put an ID in the cookie
+    SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'cookie')
+    SESSION_DB_PATH = os.environ.get('SESSION_DB_PATH', os.path.join('instance', 'sessions.sqlite3'))
+    # Idle seconds before a server-side session expires
+    SESSION_TTL = int(os.environ.get('SESSION_TTL', 7 * 24 * 60 * 60))
+    SESSION_MAX_ENTRIES = int(os.environ.get('SESSION_MAX_ENTRIES', 100000))
+    SESSION_SWEEP_INTERVAL = float(os.environ.get('SESSION_SWEEP_INTERVAL', 300))
+    
+    # Rate limiting: per-client token buckets with budgets of
+    # "<requests>/<seconds>" per route (empty for none). Buckets are kept
+    # per worker ('memory') or in a SQLite file shared by all workers ('sqlite')
+    RATE_LIMITING = os.environ.get('RATE_LIMITING', 'True').lower() == 'true'
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+    RATE_LIMIT_DB_PATH = os.environ.get('RATE_LIMIT_DB_PATH', os.path.join('instance', 'rate_limits.sqlite3'))
+    RATE_LIMIT_MAX_BUCKETS = int(os.environ.get('RATE_LIMIT_MAX_BUCKETS', 100000))
+    # Clients are told apart by the first of these that is available:
+    # 'user' (logged in), 'session' (server-side sessions only), 'ip'
+    RATE_LIMIT_KEY = [kind.strip() for kind in os.environ.get(
+        'RATE_LIMIT_KEY', 'user,ip').split(',') if kind.strip()]
+    RATE_LIMIT_DETECT_DISEASE = os.environ.get('RATE_LIMIT_DETECT_DISEASE', '30/60')
+    RATE_LIMIT_ANALYZE_SOIL = os.environ.get('RATE_LIMIT_ANALYZE_SOIL', '30/60')
+    RATE_LIMIT_BATCH = os.environ.get('RATE_LIMIT_BATCH', '5/300')
+    RATE_LIMIT_WEATHER = os.environ.get('RATE_LIMIT_WEATHER', '60/60')
+    # Image requests in progress per worker before new ones get a 503
+    # (0 for no cap), and the Retry-After sent with it
+    CONCURRENCY_LIMIT_ANALYSIS = int(os.environ.get('CONCURRENCY_LIMIT_ANALYSIS', 8))
+    CONCURRENCY_LIMIT_BATCH = int(os.environ.get('CONCURRENCY_LIMIT_BATCH', 2))
+    ADMISSION_RETRY_AFTER = int(os.environ.get('ADMISSION_RETRY_AFTER', 2))
+    # Reverse proxies in front of the app whose X-Forwarded-For is trusted
+    # for the client IP (Render runs one)
+    TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 0))
+    
+    # Cache settings ('memory' per worker, or 'sqlite' shared by all workers)
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+    SHARED_CACHE_PATH = os.environ.get('SHARED_CACHE_PATH', os.path.join('instance', 'cache.sqlite3'))
+    PROFILE_CACHE_SIZE = int(os.environ.get('PROFILE_CACHE_SIZE', 10000))
+    PROFILE_CACHE_TTL = int(os.environ.get('PROFILE_CACHE_TTL', 600))
+    
+    # Background language preference writes
+    PREFERENCE_FLUSH_INTERVAL = float(os.environ.get('PREFERENCE_FLUSH_INTERVAL', 2))
+    PREFERENCE_FLUSH_BATCH_SIZE = int(os.environ.get('PREFERENCE_FLUSH_BATCH_SIZE', 50))
+    PREFERENCE_WRITE_RETRIES = int(os.environ.get('PREFERENCE_WRITE_RETRIES', 5))
+    
+    # Outbound HTTP (weather and other third-party APIs)
+    HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', 10))
+    HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 3))
+    HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', 10))
+    HTTP_RETRIES = int(os.environ.get('HTTP_RETRIES', 2))
+    HTTP_BACKOFF = float(os.environ.get('HTTP_BACKOFF', 0.3))
+    HTTP_MAX_BACKOFF = float(os.environ.get('HTTP_MAX_BACKOFF', 5))
+    # Seconds a call may take with all its retries; keep it well below the
+    # gunicorn worker timeout (30 s) so a slow upstream can't get workers killed
+    HTTP_DEADLINE = float(os.environ.get('HTTP_DEADLINE', 15))
+    
     # Add other configuration variables as needed
     UPLOAD_FOLDER = os.path.join('backend', 'static', 'uploads')
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
     
+    # Largest request body, and largest uploaded image by bytes and by
+    # pixels (read from its header); uploads over them are cut off with a
+    # 413 as soon as that is known
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 100 * 1024 * 1024))
+    UPLOAD_MAX_IMAGE_BYTES = int(os.environ.get('UPLOAD_MAX_IMAGE_BYTES', 16 * 1024 * 1024))
+    UPLOAD_MAX_PIXELS = int(os.environ.get('UPLOAD_MAX_PIXELS', 50 * 1000 * 1000))
+    # Uploads are kept in memory up to this size, then spooled to a temp file
+    UPLOAD_SPOOL_THRESHOLD = int(os.environ.get('UPLOAD_SPOOL_THRESHOLD', 4 * 1024 * 1024))
+    # Keep a copy of every upload in UPLOAD_FOLDER (off by default)
+    PERSIST_UPLOADS = os.environ.get('PERSIST_UPLOADS', 'False').lower() == 'true'
+    UPLOAD_RETENTION_MAX_AGE = int(os.environ.get('UPLOAD_RETENTION_MAX_AGE', 24 * 60 * 60))
+    UPLOAD_RETENTION_MAX_BYTES = int(os.environ.get('UPLOAD_RETENTION_MAX_BYTES', 500 * 1024 * 1024))
+    UPLOAD_SWEEP_INTERVAL = int(os.environ.get('UPLOAD_SWEEP_INTERVAL', 10 * 60))
+    
     # Database settings (for future implementation)
     DB_URI = os.environ.get('DB_URI', 'mongodb://localhost:27017/shetkar_ai')
     
     # ML Model settings
-    MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'models')
+    MODEL_PATH = os.environ.get('MODEL_PATH', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'models'))
+    # Use model artifacts found under MODEL_PATH; the simulators are used otherwise
+    USE_MODELS = os.environ.get('USE_MODELS', 'True').lower() == 'true'
+    # Load models at import time (use with gunicorn --preload to share them between workers)
+    MODEL_PRELOAD = os.environ.get('MODEL_PRELOAD', 'False').lower() == 'true'
+    MODEL_THREADS = int(os.environ.get('MODEL_THREADS', 1))
+    # Recommendation knowledge base; defaults to backend/models/recommendations.json
+    RECOMMENDATIONS_PATH = os.environ.get('RECOMMENDATIONS_PATH', '')
+    
+    # Image preprocessing (ImageNet normalisation by default)
+    IMAGE_LAYOUT = os.environ.get('IMAGE_LAYOUT', 'NHWC')
+    IMAGE_MEAN = (0.485, 0.456, 0.406)
+    IMAGE_STD = (0.229, 0.224, 0.225)
+    
+    # Micro-batching of disease inference; only useful with threaded
+    # workers (e.g. gunicorn --threads), where requests arrive concurrently
+    INFERENCE_BATCHING = os.environ.get('INFERENCE_BATCHING', 'False').lower() == 'true'
+    INFERENCE_MAX_BATCH_SIZE = int(os.environ.get('INFERENCE_MAX_BATCH_SIZE', 8))
+    INFERENCE_MAX_WAIT_MS = float(os.environ.get('INFERENCE_MAX_WAIT_MS', 10))
+    INFERENCE_TIMEOUT = float(os.environ.get('INFERENCE_TIMEOUT', 30))
+    
+    # Process pool for image preprocessing and inference; 0 runs them in
+    # the request thread
+    ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', 0))
+    # Analyses queued or running per web worker before new ones get a 503
+    ANALYSIS_MAX_PENDING = int(os.environ.get('ANALYSIS_MAX_PENDING', 16))
+    ANALYSIS_TIMEOUT = float(os.environ.get('ANALYSIS_TIMEOUT', 30))
+    ANALYSIS_START_METHOD = os.environ.get('ANALYSIS_START_METHOD', 'forkserver')
+    
+    # Batch analysis endpoints (multiple images or a zip archive per request)
+    BATCH_MAX_IMAGES = int(os.environ.get('BATCH_MAX_IMAGES', 50))
+    # Largest single image accepted from inside a zip archive
+    BATCH_MAX_IMAGE_BYTES = int(os.environ.get('BATCH_MAX_IMAGE_BYTES', UPLOAD_MAX_IMAGE_BYTES))
+    # Total size of a batch's images once zip archives are unpacked
+    BATCH_MAX_TOTAL_BYTES = int(os.environ.get('BATCH_MAX_TOTAL_BYTES', MAX_CONTENT_LENGTH))
+    # Images of one batch analysed at the same time
+    BATCH_PARALLELISM = int(os.environ.get('BATCH_PARALLELISM', 4))
+    
+    # Cache of analysis results keyed on image content and model version
+    RESULT_CACHE_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', 8 * 1024 * 1024))
+    RESULT_CACHE_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 50000))
+    RESULT_CACHE_TTL = int(os.environ.get('RESULT_CACHE_TTL', 7 * 24 * 60 * 60))
+    # Also keep results in the SQLite file at SHARED_CACHE_PATH across restarts
+    RESULT_CACHE_PERSIST = os.environ.get('RESULT_CACHE_PERSIST', 'False').lower() == 'true'
+    RESULT_CACHE_DISK_ENTRIES = int(os.environ.get('RESULT_CACHE_DISK_ENTRIES', 200000))
     
     # Supported languages
     SUPPORTED_LANGUAGES = ['en', 'hi']
     DEFAULT_LANGUAGE = 'en'
+    # Optional directory of <language>.json catalogs adding to or overriding
+    # the built-in strings
+    TRANSLATIONS_PATH = os.environ.get('TRANSLATIONS_PATH', '')
+    
+    # Cache of rendered language-only pages (/language, /login), served
+    # with ETag/Last-Modified; templates and catalogs are checked for
+    # changes every PAGE_CACHE_CHECK_INTERVAL seconds
+    PAGE_CACHE = os.environ.get('PAGE_CACHE', 'True').lower() == 'true'
+    PAGE_CACHE_SIZE = int(os.environ.get('PAGE_CACHE_SIZE', 256))
+    PAGE_CACHE_CHECK_INTERVAL = float(os.environ.get('PAGE_CACHE_CHECK_INTERVAL', 2))
+    
+    # Compression of HTML/JSON responses (brotli if installed, else gzip);
+    # bodies smaller than COMPRESSION_MIN_SIZE bytes are sent as they are
+    COMPRESSION = os.environ.get('COMPRESSION', 'True').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+    GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 6))
+    BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', 5))
+    # Compressed copies of cached pages (those with an ETag), in bytes
+    COMPRESSION_CACHE_BYTES = int(os.environ.get('COMPRESSION_CACHE_BYTES', 2 * 1024 * 1024))
+    
+    # Request, analysis and upstream timings served in the Prometheus
+    # format on /metrics; set METRICS_TOKEN to require it as a bearer token
+    METRICS = os.environ.get('METRICS', 'True').lower() == 'true'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+    
+    # Readiness (/api/health/ready): Supabase is probed in the background
+    # every READINESS_PROBE_INTERVAL seconds; only the checks listed in
+    # READINESS_CRITICAL make the instance unready, the rest report degraded
+    READINESS_PROBE_INTERVAL = float(os.environ.get('READINESS_PROBE_INTERVAL', 30))
+    READINESS_PROBE_TIMEOUT = float(os.environ.get('READINESS_PROBE_TIMEOUT', 3))
+    # OpenWeatherMap bills each call, so its health comes from real lookups
+    # (circuit breaker and cache); set this to also probe it every so many
+    # seconds from every worker (e.g. 900), or leave 0 for no probe
+    READINESS_WEATHER_PROBE_INTERVAL = float(os.environ.get('READINESS_WEATHER_PROBE_INTERVAL', 0))
+    READINESS_CRITICAL = [name.strip() for name in os.environ.get(
+        'READINESS_CRITICAL', 'models,uploads,analysis_queue').split(',') if name.strip()]
+    # Free disk space needed for spooled and persisted uploads
+    READINESS_MIN_FREE_BYTES = int(os.environ.get('READINESS_MIN_FREE_BYTES', 100 * 1024 * 1024))
+    # Share of ANALYSIS_MAX_PENDING in use at which the instance reports unready
+    READINESS_MAX_QUEUE_RATIO = float(os.environ.get('READINESS_MAX_QUEUE_RATIO', 0.9))
+    
+    # Bearer token for the /admin endpoints; they answer 404 while unset
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+    
+    # Request profiling, off until switched on through /admin/profiling or
+    # PROFILE_SIGNAL; 'sample' collects flamegraph stacks, 'cprofile' pstats
+    PROFILE_ON_START = os.environ.get('PROFILE_ON_START', 'False').lower() == 'true'
+    PROFILE_MODE = os.environ.get('PROFILE_MODE', 'sample')
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0.1))
+    # Milliseconds between stack samples of a profiled request
+    PROFILE_SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', 5))
+    PROFILE_SIGNAL = os.environ.get('PROFILE_SIGNAL', 'SIGUSR2')
+    PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join('instance', 'profiles'))
     
     # Weather API settings
     WEATHER_API_KEY = os.environ.get('WEATHER_API_KEY', '')
-    WEATHER_API_URL = 'https://api.openweathermap.org/data/2.5/weather' 
\ No newline at end of file
+    WEATHER_API_URL = os.environ.get('WEATHER_API_URL', 'https://api.openweathermap.org/data/2.5/weather')
+    WEATHER_TIMEOUT = float(os.environ.get('WEATHER_TIMEOUT', 10))
+    # Consecutive failed calls before the weather circuit opens, and how
+    # long it stays open
+    WEATHER_BREAKER_THRESHOLD = int(os.environ.get('WEATHER_BREAKER_THRESHOLD', 5))
+    WEATHER_BREAKER_RESET = float(os.environ.get('WEATHER_BREAKER_RESET', 30))
+    
+    # Weather cache: coordinates are snapped to a grid of this many degrees
+    WEATHER_GRID_STEP = float(os.environ.get('WEATHER_GRID_STEP', 0.05))
+    WEATHER_CACHE_TTL = int(os.environ.get('WEATHER_CACHE_TTL', 600))
+    WEATHER_STALE_TTL = int(os.environ.get('WEATHER_STALE_TTL', 1800))
+    WEATHER_CACHE_SIZE = int(os.environ.get('WEATHER_CACHE_SIZE', 5000)) 
\ No newline at end of file
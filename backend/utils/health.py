@@ -0,0 +1,254 @@
+"""
+Liveness and readiness checks for ShetkarAI.
+
+Liveness only says the worker is answering requests. Readiness says it
+can do useful work: the models it will serve have loaded, uploads have
+somewhere to go, the analysis queue is not saturated, and Supabase and
+OpenWeatherMap are configured and reachable. Supabase is probed by a
+background thread every Config.READINESS_PROBE_INTERVAL seconds, so a
+readiness request never waits on it. OpenWeatherMap bills every call,
+so its health is read from the weather circuit breaker and cache, which
+real lookups keep up to date; an active probe is only made if
+Config.READINESS_WEATHER_PROBE_INTERVAL is set.
+
+Only the checks named in Config.READINESS_CRITICAL make an instance
+unready; the others are reported as degraded.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import requests
+
+from backend.models.executor import analysis_executor
+from backend.models.registry import registry
+from backend.utils.config import Config
+from backend.utils.helpers import weather_breaker, weather_cache
+from backend.utils.http import get_with_retries
+
+# Models the API serves
+MODELS = ('disease', 'soil')
+
+# Coordinates used to probe the weather API (the middle of India)
+WEATHER_PROBE_COORDINATES = (20.59, 78.96)
+
+def _probe_result(response=None, error=None, started=None):
+    # 401/403 mean the credentials are wrong; every call would fail too
+    ok = response is not None and response.status_code < 500 and response.status_code not in (401, 403)
+    result = {
+        "ok": ok,
+        "checked_at": time.time(),
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1)
+    }
+    if response is not None:
+        result["status_code"] = response.status_code
+    if error is not None:
+        # Only the type: the message can contain the URL with the API key
+        result["error"] = type(error).__name__
+    return result
+
+def probe_supabase():
+    """Call the Supabase auth health endpoint with the configured key"""
+    if not Config.SUPABASE_URL or not Config.SUPABASE_KEY:
+        return {"ok": False, "checked_at": time.time(), "error": "SUPABASE_URL or SUPABASE_KEY is not set"}
+    started = time.perf_counter()
+    try:
+        response = get_with_retries(
+            Config.SUPABASE_URL.rstrip('/') + '/auth/v1/health',
+            headers={'apikey': Config.SUPABASE_KEY},
+            retries=0,
+            timeout=(Config.HTTP_CONNECT_TIMEOUT, Config.READINESS_PROBE_TIMEOUT),
+            upstream='supabase_probe'
+        )
+    except requests.RequestException as e:
+        return _probe_result(error=e, started=started)
+    return _probe_result(response, started=started)
+
+def probe_weather():
+    """Fetch the weather for one fixed location"""
+    if not Config.WEATHER_API_KEY:
+        return {"ok": False, "checked_at": time.time(), "error": "WEATHER_API_KEY is not set"}
+    lat, lon = WEATHER_PROBE_COORDINATES
+    started = time.perf_counter()
+    try:
+        response = get_with_retries(
+            Config.WEATHER_API_URL,
+            params={'lat': lat, 'lon': lon, 'appid': Config.WEATHER_API_KEY, 'units': 'metric'},
+            retries=0,
+            timeout=(Config.HTTP_CONNECT_TIMEOUT, Config.READINESS_PROBE_TIMEOUT),
+            upstream='weather_probe'
+        )
+    except requests.RequestException as e:
+        return _probe_result(error=e, started=started)
+    return _probe_result(response, started=started)
+
+class UpstreamMonitor:
+    """
+    Probes upstream services from a background thread and keeps the
+    latest result of each.
+
+    Args:
+        probes (dict): {name: callable returning a result dict with "ok"}
+        interval (float): Seconds between probe rounds
+    """
+
+    def __init__(self, probes, interval=30):
+        self.probes = probes
+        self.interval = interval
+        self.results = {}
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._first_round = threading.Event()
+
+    def ensure_started(self):
+        """Start the probe thread for this process if it isn't running"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                # A forked worker inherits the parent's results but not its thread
+                self._first_round = threading.Event()
+                self._thread = threading.Thread(target=self._run, name='upstream-monitor', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def probe_all(self):
+        """Run every probe once and store the results"""
+        for name, probe in self.probes.items():
+            try:
+                self.results[name] = probe()
+            except Exception as e:
+                print(f"Error probing {name}: {e}")
+                self.results[name] = {"ok": False, "checked_at": time.time(), "error": str(e)}
+
+    def _run(self):
+        while True:
+            self.probe_all()
+            self._first_round.set()
+            time.sleep(self.interval)
+
+    def wait_for_first_round(self, timeout):
+        """Wait up to timeout seconds for the first results after start-up"""
+        return self._first_round.wait(timeout)
+
+    def result(self, name):
+        """Return the latest result for name, marked stale if it is too old"""
+        result = self.results.get(name)
+        if result is None:
+            return {"ok": False, "error": "not probed yet"}
+        if time.time() - result["checked_at"] > 3 * self.interval:
+            return dict(result, ok=False, error="probe result is stale")
+        return result
+
+upstream_monitor = UpstreamMonitor(
+    {'supabase': probe_supabase},
+    interval=Config.READINESS_PROBE_INTERVAL
+)
+
+# Opt-in, as each probe is a billed weather call from every worker
+weather_monitor = UpstreamMonitor(
+    {'weather': probe_weather},
+    interval=Config.READINESS_WEATHER_PROBE_INTERVAL
+) if Config.READINESS_WEATHER_PROBE_INTERVAL > 0 else None
+
+def check_models():
+    """Models with an artifact must load; models without one use the simulator"""
+    if not Config.USE_MODELS:
+        return {"ok": True, "backend": "simulator"}
+    models = {}
+    for name in MODELS:
+        path = registry.find_artifact(name)
+        if path is None:
+            models[name] = "simulator"
+        elif analysis_executor.workers:
+            # Loaded by the pool processes, not by this one
+            models[name] = "pool" if os.access(path, os.R_OK) else "unreadable"
+        else:
+            models[name] = "loaded" if registry.get(name) is not None else "failed"
+    return {"ok": all(state in ("simulator", "pool", "loaded") for state in models.values()),
+            "models": models}
+
+def _folder_capacity(folder):
+    try:
+        os.makedirs(folder, exist_ok=True)
+        free = shutil.disk_usage(folder).free
+    except OSError as e:
+        return {"ok": False, "error": str(e)}
+    writable = os.access(folder, os.W_OK)
+    ok = writable and free >= Config.READINESS_MIN_FREE_BYTES
+    return {"ok": ok, "writable": writable, "free_bytes": free}
+
+def check_uploads():
+    """Large uploads spool to the temp folder; persisted ones go to UPLOAD_FOLDER"""
+    folders = {"temp": tempfile.gettempdir()}
+    if Config.PERSIST_UPLOADS:
+        folders["upload_folder"] = Config.UPLOAD_FOLDER
+    details = {name: _folder_capacity(folder) for name, folder in folders.items()}
+    return {"ok": all(detail["ok"] for detail in details.values()), **details}
+
+def check_analysis_queue():
+    """Unready while the analysis queue is nearly full, so traffic goes elsewhere"""
+    pending, limit = analysis_executor.pending, analysis_executor.max_pending
+    return {"ok": pending < limit * Config.READINESS_MAX_QUEUE_RATIO,
+            "pending": pending, "max_pending": limit}
+
+def check_supabase():
+    return upstream_monitor.result('supabase')
+
+def check_weather():
+    """Judged from the weather lookups users make, plus the probe if enabled"""
+    if not Config.WEATHER_API_KEY:
+        return {"ok": False, "error": "WEATHER_API_KEY is not set"}
+    cache = weather_cache.stats()
+    result = {
+        "ok": weather_breaker.state != 'open',
+        "breaker": weather_breaker.stats(),
+        "upstream_calls": cache["upstream_calls"],
+        "upstream_errors": cache["upstream_errors"]
+    }
+    if weather_monitor is not None:
+        probe = weather_monitor.result('weather')
+        result.update(probe=probe, ok=result["ok"] and probe["ok"])
+    return result
+
+CHECKS = {
+    'models': check_models,
+    'uploads': check_uploads,
+    'analysis_queue': check_analysis_queue,
+    'supabase': check_supabase,
+    'weather': check_weather
+}
+
+def readiness():
+    """
+    Run every readiness check.
+
+    Returns:
+        tuple: (ready, report) where ready is False if a critical check
+        failed and report holds the status and each check's details
+    """
+    monitors = [upstream_monitor] + ([weather_monitor] if weather_monitor is not None else [])
+    for monitor in monitors:
+        monitor.ensure_started()
+    for monitor in monitors:
+        monitor.wait_for_first_round(Config.READINESS_PROBE_TIMEOUT)
+
+    checks = {}
+    for name, check in CHECKS.items():
+        try:
+            result = check()
+        except Exception as e:
+            result = {"ok": False, "error": str(e)}
+        checks[name] = dict(result, critical=name in Config.READINESS_CRITICAL)
+
+    ready = all(check["ok"] for check in checks.values() if check["critical"])
+    if not ready:
+        status = "unready"
+    elif all(check["ok"] for check in checks.values()):
+        status = "ready"
+    else:
+        status = "degraded"
+    return ready, {"status": status, "checks": checks}
@@ -1,39 +1,264 @@
+import hashlib
+import io
 import os
+import threading
+import zipfile
+import zlib
 import numpy as np
-from werkzeug.utils import secure_filename
-from flask import current_app
-import requests
+from PIL import Image
+from werkzeug.exceptions import HTTPException, UnsupportedMediaType
 from backend.utils.config import Config
-from backend.utils.translations import get_text
+from backend.models.recommendations import knowledge_base
+from backend.utils.uploads import check_image, start_upload_sweeper, upload_error
+from backend.utils.weather_cache import WeatherCache
+from backend.utils.http import CircuitBreaker, get_with_retries
 
 def allowed_file(filename):
     """Check if the file has an allowed extension"""
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
 
-def save_uploaded_file(file):
-    """Save an uploaded file and return the path"""
+def save_uploaded_file(file, data=None):
+    """
+    Save an uploaded file and return the path.
+    
+    The file is named after a hash of its contents, so concurrent uploads
+    with the same filename never overwrite each other and re-uploads of
+    the same photo reuse one file. Its extension is that of the format the
+    contents are in, whatever the client called it.
+    """
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
+        if data is None:
+            data = file.read()
+        try:
+            extension = check_image(data)
+        except HTTPException:
+            return None
+        filename = f"{hashlib.sha256(data).hexdigest()[:32]}.{extension}"
         # Create upload folder if it doesn't exist
         os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
         
         filepath = os.path.join(Config.UPLOAD_FOLDER, filename)
-        file.save(filepath)
+        if not os.path.exists(filepath):
+            # Write to a temporary name first so readers never see a partial file
+            tmp_path = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, filepath)
+        start_upload_sweeper()
         return filepath
     return None
 
-def preprocess_image(image_path, target_size=(224, 224)):
+def read_uploaded_file(file):
     """
-    A simplified version that just verifies the image exists
-    and returns a placeholder for the demo
+    Read an uploaded file into memory for analysis.
+    
+    The upload is only written to disk when Config.PERSIST_UPLOADS is
+    enabled.
+    
+    Args:
+        file (FileStorage): The uploaded file
+        
+    Returns:
+        bytes: The file contents, or None if the file type is not allowed
+        
+    Raises:
+        RequestEntityTooLarge: If the image is over the byte or pixel limit
     """
-    if not os.path.exists(image_path):
+    if not file or not allowed_file(file.filename):
         return None
     
-    # Just return a dummy array for demo purposes
-    # No actual image processing needed for the MVP demo
-    return np.ones((1,)) # Dummy array, just needs to be non-None
+    data = file.read()
+    try:
+        check_image(data)
+    except UnsupportedMediaType:
+        return None
+    if Config.PERSIST_UPLOADS:
+        save_uploaded_file(file, data)
+    return data
+
+def read_uploaded_images(files, max_images=None, max_bytes=None):
+    """
+    Read every image of a batch upload into memory.
+    
+    Zip archives are unpacked; files and entries that are not images of an
+    allowed type are reported as errors rather than failing the whole
+    batch, including files already rejected while they arrived (see
+    per_file_upload_errors in backend/utils/uploads.py).
+    
+    Args:
+        files (list): Uploaded FileStorage objects, images or .zip archives
+        max_images (int): Maximum number of images; defaults to
+            Config.BATCH_MAX_IMAGES
+        max_bytes (int): Maximum total size of the images, unpacked;
+            defaults to Config.BATCH_MAX_TOTAL_BYTES
+        
+    Returns:
+        tuple: (images, errors) where images is a list of (filename, bytes)
+        and errors a list of (filename, message)
+        
+    Raises:
+        ValueError: If the batch holds more than max_images images or
+            max_bytes bytes of them
+    """
+    max_images = max_images or Config.BATCH_MAX_IMAGES
+    max_bytes = max_bytes or Config.BATCH_MAX_TOTAL_BYTES
+    images = []
+    errors = []
+    total_bytes = 0
+    
+    def reserve(size):
+        # Called before a zip entry is unpacked, so a small archive can't
+        # make the worker hold more than max_bytes
+        nonlocal total_bytes
+        if len(images) >= max_images:
+            raise ValueError(f"A batch may contain at most {max_images} images")
+        if total_bytes + size > max_bytes:
+            raise ValueError(f"A batch may contain at most {max_bytes // (1024 * 1024)} MB of images")
+        total_bytes += size
+    
+    for file in files:
+        if not file or not file.filename:
+            continue
+        error = upload_error(file)
+        if error is not None:
+            errors.append((file.filename, error))
+            continue
+        if file.filename.lower().endswith('.zip'):
+            try:
+                with zipfile.ZipFile(file.stream) as archive:
+                    for info in archive.infolist():
+                        name = info.filename
+                        if info.is_dir() or os.path.basename(name).startswith('.') or name.startswith('__MACOSX/'):
+                            continue
+                        if not allowed_file(name):
+                            errors.append((name, "Invalid file format"))
+                        elif info.flag_bits & 0x1:
+                            errors.append((name, "Encrypted zip entries are not supported"))
+                        elif info.file_size > Config.BATCH_MAX_IMAGE_BYTES:
+                            errors.append((name, "Image is too large"))
+                        else:
+                            reserve(info.file_size)
+                            try:
+                                data = archive.read(info)
+                            except (zipfile.BadZipFile, RuntimeError, NotImplementedError,
+                                    zlib.error, EOFError) as e:
+                                # A corrupt entry, or a compression method
+                                # Python can't unpack (e.g. AES)
+                                print(f"Error reading {name} from zip archive: {e}")
+                                errors.append((name, "Could not read file from zip archive"))
+                                continue
+                            try:
+                                check_image(data)
+                            except HTTPException as e:
+                                errors.append((name, e.description))
+                            else:
+                                images.append((name, data))
+            except zipfile.BadZipFile:
+                errors.append((file.filename, "Invalid zip archive"))
+            continue
+        
+        try:
+            data = read_uploaded_file(file)
+        except HTTPException as e:
+            errors.append((file.filename, e.description))
+            continue
+        if not data:
+            errors.append((file.filename, "Invalid file format"))
+        else:
+            reserve(len(data))
+            images.append((file.filename, data))
+    
+    return images, errors
+
+# Per-channel normalisation constants, shaped for broadcasting over HWC
+_IMAGE_MEAN = np.asarray(Config.IMAGE_MEAN, dtype=np.float32).reshape(1, 1, 3) * 255
+_IMAGE_INV_STD = 1.0 / (np.asarray(Config.IMAGE_STD, dtype=np.float32).reshape(1, 1, 3) * 255)
+
+# Scratch buffers for the float conversion, reused per thread and size
+_scratch = threading.local()
+
+def _scratch_buffer(height, width):
+    buffers = getattr(_scratch, 'buffers', None)
+    if buffers is None:
+        buffers = _scratch.buffers = {}
+    key = (height, width)
+    if key not in buffers:
+        buffers[key] = np.empty((height, width, 3), dtype=np.float32)
+    return buffers[key]
+
+def image_tensor_shape(target_size=(224, 224), layout=None, batch_size=1):
+    """Return the tensor shape preprocess_image produces for these settings"""
+    width, height = target_size
+    layout = layout or Config.IMAGE_LAYOUT
+    if layout == 'NCHW':
+        return (batch_size, 3, height, width)
+    return (batch_size, height, width, 3)
+
+def preprocess_image(image, target_size=(224, 224), layout=None, out=None):
+    """
+    Decode an image and turn it into a normalised float32 model input.
+    
+    JPEGs much larger than the target are decoded at a reduced scale
+    (draft mode), so a 12 MP phone photo never gets fully decoded.
+    
+    Args:
+        image: A file path, raw bytes or a readable binary stream
+            (e.g. the upload's ``file.stream``)
+        target_size (tuple): Output (width, height)
+        layout (str): 'NHWC' or 'NCHW'; defaults to Config.IMAGE_LAYOUT
+        out (np.ndarray): Optional preallocated float32 array of the
+            output shape (see image_tensor_shape) to write into
+        
+    Returns:
+        np.ndarray: Contiguous float32 tensor with a batch dimension of 1,
+        or None if the image cannot be read
+    """
+    if isinstance(image, (str, os.PathLike)) and not os.path.exists(image):
+        return None
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        image = io.BytesIO(image)
+    
+    width, height = target_size
+    layout = layout or Config.IMAGE_LAYOUT
+    
+    try:
+        with Image.open(image) as img:
+            # Let the JPEG decoder downscale by 1/2, 1/4 or 1/8 while
+            # staying at or above the target size
+            img.draft('RGB', (width, height))
+            img = img.convert('RGB')
+            if img.size != (width, height):
+                img = img.resize((width, height), Image.BILINEAR, reducing_gap=3.0)
+            pixels = np.asarray(img)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        print(f"Error preprocessing image: {e}")
+        return None
+    
+    shape = image_tensor_shape(target_size, layout)
+    if out is None:
+        out = np.empty(shape, dtype=np.float32)
+    elif out.shape != shape or out.dtype != np.float32:
+        raise ValueError(f"Output buffer must be float32 with shape {shape}")
+    
+    # (pixels - mean) / std, computed in place without temporaries
+    scratch = _scratch_buffer(height, width)
+    np.subtract(pixels, _IMAGE_MEAN, out=scratch)
+    np.multiply(scratch, _IMAGE_INV_STD, out=scratch)
+    
+    if layout == 'NCHW':
+        np.copyto(out[0], scratch.transpose(2, 0, 1))
+    else:
+        np.copyto(out[0], scratch)
+    
+    return out
+
+# Fails fast while OpenWeatherMap is down instead of tying up workers
+weather_breaker = CircuitBreaker(
+    'weather',
+    failure_threshold=Config.WEATHER_BREAKER_THRESHOLD,
+    reset_timeout=Config.WEATHER_BREAKER_RESET
+)
 
 def get_weather_data(lat, lon):
     """Get weather data for a location"""
@@ -45,7 +270,12 @@ def get_weather_data(lat, lon):
     }
     
     try:
-        response = requests.get(Config.WEATHER_API_URL, params=params)
+        response = get_with_retries(
+            Config.WEATHER_API_URL,
+            params=params,
+            breaker=weather_breaker,
+            timeout=(Config.HTTP_CONNECT_TIMEOUT, Config.WEATHER_TIMEOUT)
+        )
         if response.status_code == 200:
             return response.json()
         else:
@@ -54,6 +284,23 @@ def get_weather_data(lat, lon):
         print(f"Error fetching weather data: {e}")
         return None
 
+# Shared by all requests in this worker
+weather_cache = WeatherCache(
+    get_weather_data,
+    ttl=Config.WEATHER_CACHE_TTL,
+    stale_ttl=Config.WEATHER_STALE_TTL,
+    maxsize=Config.WEATHER_CACHE_SIZE
+)
+
+def get_cached_weather_data(lat, lon):
+    """
+    Get weather data for a location through the weather cache.
+    
+    Raises:
+        ValueError: If lat/lon are not valid coordinates
+    """
+    return weather_cache.get(lat, lon)
+
 def generate_weather_recommendations(weather_data, language='en'):
     """
     Generate farming recommendations based on weather data
@@ -66,82 +313,14 @@ def generate_weather_recommendations(weather_data, language='en'):
         list: List of recommendations in the selected language
     """
     if not weather_data:
-        return ["Unable to generate recommendations without weather data."]
+        return knowledge_base.evaluate('weather', None, language)
     
-    temp = weather_data.get('main', {}).get('temp')
-    humidity = weather_data.get('main', {}).get('humidity')
-    wind_speed = weather_data.get('wind', {}).get('speed')
     weather_desc = weather_data.get('weather', [{}])[0].get('main')
-    
-    # Define recommendations in English - will be translated
-    recommendations_en = []
-    
-    # Temperature-based recommendations
-    if temp is not None:
-        if temp > 35:
-            recommendations_en.append("High temperature alert: Ensure adequate water for crops.")
-        elif temp < 10:
-            recommendations_en.append("Low temperature alert: Protect sensitive crops from frost.")
-    
-    # Humidity-based recommendations
-    if humidity is not None:
-        if humidity > 80:
-            recommendations_en.append("High humidity: Be aware of potential fungal diseases.")
-        elif humidity < 30:
-            recommendations_en.append("Low humidity: Increase watering frequency.")
-    
-    # Weather description-based recommendations
-    if weather_desc:
-        if weather_desc.lower() in ['rain', 'thunderstorm', 'drizzle']:
-            recommendations_en.append("Rainfall expected: Hold off on pesticide application.")
-        elif weather_desc.lower() == 'clear':
-            recommendations_en.append("Clear weather: Good time for harvesting or planting.")
-    
-    if not recommendations_en:
-        recommendations_en.append("No specific recommendations at this time.")
-    
-    # Weather recommendation translations
-    weather_translations = {
-        "High temperature alert: Ensure adequate water for crops.": {
-            "en": "High temperature alert: Ensure adequate water for crops.",
-            "hi": "उच्च तापमान चेतावनी: फसलों के लिए पर्याप्त पानी सुनिश्चित करें।"
-        },
-        "Low temperature alert: Protect sensitive crops from frost.": {
-            "en": "Low temperature alert: Protect sensitive crops from frost.",
-            "hi": "निम्न तापमान चेतावनी: संवेदनशील फसलों को पाले से बचाएं।"
-        },
-        "High humidity: Be aware of potential fungal diseases.": {
-            "en": "High humidity: Be aware of potential fungal diseases.",
-            "hi": "उच्च आर्द्रता: संभावित कवक रोगों से सावधान रहें।"
-        },
-        "Low humidity: Increase watering frequency.": {
-            "en": "Low humidity: Increase watering frequency.",
-            "hi": "कम आर्द्रता: पानी देने की आवृत्ति बढ़ाएं।"
-        },
-        "Rainfall expected: Hold off on pesticide application.": {
-            "en": "Rainfall expected: Hold off on pesticide application.",
-            "hi": "वर्षा की उम्मीद है: कीटनाशक के छिड़काव को रोक दें।"
-        },
-        "Clear weather: Good time for harvesting or planting.": {
-            "en": "Clear weather: Good time for harvesting or planting.",
-            "hi": "साफ मौसम: फसल काटने या बोने का अच्छा समय।"
-        },
-        "No specific recommendations at this time.": {
-            "en": "No specific recommendations at this time.",
-            "hi": "इस समय कोई विशिष्ट सिफारिशें नहीं हैं।"
-        },
-        "Unable to generate recommendations without weather data.": {
-            "en": "Unable to generate recommendations without weather data.",
-            "hi": "मौसम डेटा के बिना सिफारिशें उत्पन्न करने में असमर्थ।"
-        }
+    facts = {
+        'temp': weather_data.get('main', {}).get('temp'),
+        'humidity': weather_data.get('main', {}).get('humidity'),
+        'wind_speed': weather_data.get('wind', {}).get('speed'),
+        'condition': weather_desc.lower() if weather_desc else None
     }
-    
-    # Translate recommendations to the requested language
-    recommendations = []
-    for rec in recommendations_en:
-        if rec in weather_translations and language in weather_translations[rec]:
-            recommendations.append(weather_translations[rec][language])
-        else:
-            recommendations.append(rec)  # Fallback to English if no translation
-    
-    return recommendations 
+    # Thresholds and texts come from the weather rules of the knowledge base
+    return knowledge_base.evaluate('weather', facts, language)
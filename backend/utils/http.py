@@ -0,0 +1,214 @@
+"""
+Outbound HTTP helpers for ShetkarAI.
+
+Provides a pooled keep-alive requests session per process, bounded
+retries with jittered exponential backoff, and a circuit breaker that
+fails fast while an upstream is down.
+"""
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from backend.utils.config import Config
+from backend.utils.metrics import metrics
+
+# Status codes worth retrying
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+upstream_duration = metrics.histogram(
+    'upstream_request_duration_seconds', 'Time taken by each call to an upstream service',
+    ('upstream', 'outcome')
+)
+
+def outcome_label(status_code=None):
+    """Label an upstream call by status class ('2xx', '5xx', ...) or 'error'"""
+    return f"{status_code // 100}xx" if status_code else 'error'
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+def get_http_session():
+    """
+    Return the shared requests session for this process.
+
+    Connections are kept alive and pooled; a new session is created after
+    a fork so workers never share sockets.
+    """
+    global _session, _session_pid
+
+    pid = os.getpid()
+    if _session is not None and _session_pid == pid:
+        return _session
+
+    with _session_lock:
+        if _session is None or _session_pid != pid:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=Config.HTTP_POOL_SIZE,
+                                  max_retries=0)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+            _session_pid = pid
+
+    return _session
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the circuit breaker is open"""
+
+class CircuitBreaker:
+    """
+    Counts consecutive failures of an upstream and stops calling it for
+    reset_timeout seconds once failure_threshold is reached. After that
+    a single trial call is let through; success closes the circuit.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.rejected = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        """Return True if a call may go to the upstream now"""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                if self.opened_at is None:
+                    print(f"Circuit '{self.name}' opened after {self.failures} failures")
+                self.opened_at = time.monotonic()
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "rejected": self.rejected
+        }
+
+def _retry_delay(attempt, response=None):
+    # Honour a numeric Retry-After from 429/503 responses, capped
+    if response is not None:
+        retry_after = response.headers.get('Retry-After', '')
+        if retry_after.isdigit():
+            return min(float(retry_after), Config.HTTP_MAX_BACKOFF)
+    delay = min(Config.HTTP_BACKOFF * (2 ** attempt), Config.HTTP_MAX_BACKOFF)
+    # Full jitter, so retries from many workers don't arrive in lockstep
+    return random.uniform(0, delay)
+
+def get_with_retries(url, params=None, breaker=None, retries=None,
+                     timeout=None, upstream=None, headers=None, deadline=None):
+    """
+    GET a URL through the shared session with retries and a circuit breaker.
+
+    Connection errors, timeouts and 429/5xx responses are retried up to
+    retries times with jittered exponential backoff. All attempts and the
+    waits between them fit in deadline seconds: the timeouts and backoff
+    are cut to the time left, and no retry starts once it has run out.
+
+    Args:
+        url (str): URL to fetch
+        params (dict): Query parameters
+        breaker (CircuitBreaker): Optional breaker guarding the upstream
+        retries (int): Retry count; defaults to Config.HTTP_RETRIES
+        timeout (tuple): (connect, read) timeouts in seconds
+        upstream (str): Name the attempts are timed under on /metrics;
+            defaults to the breaker's name
+        headers (dict): Extra request headers
+        deadline (float): Seconds the whole call may take; defaults to
+            Config.HTTP_DEADLINE
+
+    Returns:
+        requests.Response: The last response received
+
+    Raises:
+        CircuitOpenError: If the breaker refuses the call
+        requests.RequestException: If every attempt failed without a response,
+            or one failed with an error other than a connection error or timeout
+    """
+    retries = Config.HTTP_RETRIES if retries is None else retries
+    connect_timeout, read_timeout = timeout or (Config.HTTP_CONNECT_TIMEOUT, Config.HTTP_READ_TIMEOUT)
+    deadline = time.monotonic() + (Config.HTTP_DEADLINE if deadline is None else deadline)
+
+    if breaker is not None and not breaker.allow():
+        raise CircuitOpenError(f"Circuit '{breaker.name}' is open")
+
+    upstream = upstream or (breaker.name if breaker is not None else 'http')
+    session = get_http_session()
+    response = None
+    for attempt in range(retries + 1):
+        response = None
+        start = time.perf_counter()
+        # Never wait past the deadline; the read timeout bounds each socket
+        # read, so a response that keeps trickling in can still overrun it
+        remaining = max(deadline - time.monotonic(), 0.001)
+        try:
+            response = session.get(url, params=params, headers=headers,
+                                   timeout=(min(connect_timeout, remaining), min(read_timeout, remaining)))
+            if response.status_code not in RETRY_STATUSES:
+                break
+            error = None
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        except Exception:
+            # Not worth retrying (e.g. a broken chunked body), but still a
+            # failed call; recording it also ends a half-open trial
+            if breaker is not None:
+                breaker.record_failure()
+            raise
+        finally:
+            status = response.status_code if response is not None else None
+            upstream_duration.labels(upstream, outcome_label(status)).observe(
+                (time.perf_counter() - start) * 1000
+            )
+
+        if attempt < retries:
+            delay = _retry_delay(attempt, response)
+            if time.monotonic() + delay >= deadline:
+                # No time left for another attempt
+                break
+            time.sleep(delay)
+
+    failed = response is None or response.status_code >= 500 or response.status_code == 429
+    if breaker is not None:
+        if failed:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+    if response is None:
+        raise error
+    return response
@@ -0,0 +1,313 @@
+"""
+Lightweight in-process metrics for ShetkarAI.
+
+Besides the plain Histogram used by the batcher and executor, metrics
+can be registered by name with labels and exported in the Prometheus
+text format by render_prometheus(). Latencies are recorded in
+milliseconds, like everywhere else in the app, and exported in seconds
+as Prometheus expects.
+
+Components that already keep counters expose them through a collector:
+a function called at scrape time that returns its stats() dicts, so
+nothing extra is tracked per request. Each gunicorn worker keeps its own
+metrics; a scrape reports the worker process that served it.
+"""
+import bisect
+import hmac
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, abort, g, request
+
+from backend.utils.config import Config
+
+# Latency buckets in milliseconds
+DEFAULT_LATENCY_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+class Histogram:
+    """Thread-safe cumulative histogram with fixed bucket upper bounds"""
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        """Record one observation"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        """Observe the duration of a with block in milliseconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe((time.perf_counter() - start) * 1000)
+
+    def quantile(self, q):
+        """Estimate a quantile as the upper bound of the bucket containing it"""
+        with self._lock:
+            if not self.count:
+                return None
+            target = q * self.count
+            seen = 0
+            for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+                seen += count
+                if seen >= target:
+                    return bound
+        return float('inf')
+
+    def snapshot(self):
+        """Return the histogram as a JSON-friendly dict"""
+        with self._lock:
+            labels = [str(bound) for bound in self.buckets] + ['+Inf']
+            return {
+                "count": self.count,
+                "sum": round(self.sum, 3),
+                "buckets": dict(zip(labels, self.counts))
+            }
+
+class Gauge:
+    """Thread-safe value that can go up and down"""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+class Counter(Gauge):
+    """Gauge that is only ever increased"""
+
+    def dec(self, amount=1):
+        raise ValueError("Counters can only be increased")
+
+class MetricFamily:
+    """
+    A named metric with one child (Histogram, Gauge or Counter) per
+    combination of label values.
+
+    Args:
+        name (str): Prometheus metric name
+        help (str): One-line description
+        kind (str): 'histogram', 'gauge' or 'counter'
+        labels (tuple): Label names
+        factory (callable): Creates a child
+        scale (float): Factor applied to histogram values on export, e.g.
+            0.001 to turn milliseconds into seconds
+    """
+
+    def __init__(self, name, help, kind, labels, factory, scale=1.0):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.label_names = tuple(labels)
+        self.factory = factory
+        self.scale = scale
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """Return the child for the given label values, in label order"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"{self.name} takes labels {self.label_names}")
+            with self._lock:
+                child = self._children.setdefault(values, self.factory())
+        return child
+
+    def children(self):
+        """Return (label values, child) pairs"""
+        return list(self._children.items())
+
+    def samples(self):
+        """Yield (suffix, labels dict, value) for every child"""
+        for values, child in list(self._children.items()):
+            labels = dict(zip(self.label_names, values))
+            if self.kind != 'histogram':
+                yield '', labels, child.value
+                continue
+            with child._lock:
+                counts = list(child.counts)
+                count, total = child.count, child.sum
+            cumulative = 0
+            for bound, bucket_count in zip(child.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                yield '_bucket', dict(labels, le=_format_bound(bound * self.scale)), cumulative
+            yield '_sum', labels, total * self.scale
+            yield '_count', labels, count
+
+def _format_bound(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(round(value, 6))
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_sample(name, labels, value):
+    if labels:
+        name += '{' + ','.join(f'{label}="{_escape(text)}"' for label, text in labels.items()) + '}'
+    if isinstance(value, bool):
+        value = int(value)
+    return f"{name} {value}"
+
+class MetricsRegistry:
+    """Named metric families and scrape-time collectors"""
+
+    def __init__(self, prefix='shetkar'):
+        self.prefix = prefix
+        self._families = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _family(self, name, help, kind, labels, factory, scale=1.0):
+        name = f"{self.prefix}_{name}"
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = MetricFamily(name, help, kind, labels, factory, scale)
+                self._families[name] = family
+            elif family.kind != kind or family.label_names != tuple(labels):
+                raise ValueError(f"Metric {name} is already registered differently")
+        return family
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_LATENCY_BUCKETS, scale=0.001):
+        """Register a histogram of millisecond values, exported in seconds by default"""
+        return self._family(name, help, 'histogram', labels, lambda: Histogram(buckets), scale)
+
+    def gauge(self, name, help, labels=()):
+        """Register a gauge"""
+        return self._family(name, help, 'gauge', labels, Gauge)
+
+    def counter(self, name, help, labels=()):
+        """Register a counter"""
+        return self._family(name, help, 'counter', labels, Counter)
+
+    def register_collector(self, name, collect, label=None):
+        """
+        Export the numeric values of a stats dict as gauges at scrape time.
+
+        Args:
+            name (str): Metric name prefix, e.g. 'weather_cache'
+            collect (callable): Returns a stats dict; nested dicts are
+                flattened into the metric name
+            label (str): If set, collect() returns {value: stats} and each
+                key becomes this label, e.g. one cache per name
+        """
+        self._collectors.append((f"{self.prefix}_{name}", collect, label))
+
+    def _collected(self):
+        # (metric name, labels, value) for every numeric collector value
+        for prefix, collect, label in self._collectors:
+            try:
+                stats = collect()
+            except Exception as e:
+                print(f"Error collecting {prefix} metrics: {e}")
+                continue
+            groups = stats.items() if label else [(None, stats)]
+            for label_value, group in groups:
+                labels = {label: label_value} if label else {}
+                yield from _flatten(prefix, group, labels)
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format"""
+        lines = []
+        for family in list(self._families.values()):
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for suffix, labels, value in family.samples():
+                lines.append(_format_sample(family.name + suffix, labels, value))
+
+        typed = set()
+        for name, labels, value in self._collected():
+            if name not in typed:
+                lines.append(f"# TYPE {name} gauge")
+                typed.add(name)
+            lines.append(_format_sample(name, labels, value))
+        return '\n'.join(lines) + '\n'
+
+def _flatten(prefix, stats, labels):
+    for key, value in stats.items():
+        name = f"{prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', str(key))}"
+        if isinstance(value, dict):
+            # Histogram snapshots are exported as histograms where needed
+            if 'buckets' not in value:
+                yield from _flatten(name, value, labels)
+        elif isinstance(value, (int, float)):
+            yield name, labels, value
+
+# Metrics of this process
+metrics = MetricsRegistry()
+
+def render_prometheus():
+    """Return the metrics of this process in the Prometheus text format"""
+    return metrics.render()
+
+request_duration = metrics.histogram(
+    'http_request_duration_seconds', 'Time from request start until the response was sent',
+    ('method', 'route', 'status')
+)
+requests_in_flight = metrics.gauge(
+    'http_requests_in_flight', 'Requests currently being handled', ('route',)
+)
+
+def _route():
+    # The URL rule, not the path, so IDs in URLs don't create new series
+    rule = request.url_rule
+    return rule.rule if rule is not None else '<unmatched>'
+
+def _start_request():
+    g.metrics_start = time.perf_counter()
+    g.metrics_route = _route()
+    requests_in_flight.labels(g.metrics_route).inc()
+
+def _finish_request(method, route, status, start):
+    requests_in_flight.labels(route).dec()
+    request_duration.labels(method, route, str(status)).observe((time.perf_counter() - start) * 1000)
+
+def _record_response(response):
+    if 'metrics_start' in g:
+        method, route, status = request.method, g.metrics_route, response.status_code
+        start = g.pop('metrics_start')
+        # Streamed responses are only finished once their body is sent
+        response.call_on_close(lambda: _finish_request(method, route, status, start))
+    return response
+
+def _record_failure(error):
+    # after_request did not run, e.g. an exception escaped in debug mode
+    if 'metrics_start' in g:
+        _finish_request(request.method, g.metrics_route, 500, g.pop('metrics_start'))
+
+def metrics_endpoint():
+    """Prometheus scrape endpoint; needs the bearer token if METRICS_TOKEN is set"""
+    if Config.METRICS_TOKEN and not hmac.compare_digest(
+            request.headers.get('Authorization', '').encode('utf-8'),
+            f"Bearer {Config.METRICS_TOKEN}".encode('utf-8')):
+        abort(401)
+    return Response(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def init_metrics(app):
+    """Time every request of app and serve /metrics, if enabled in Config"""
+    if not Config.METRICS:
+        return
+    app.before_request(_start_request)
+    app.after_request(_record_response)
+    app.teardown_request(_record_failure)
+    app.add_url_rule('/metrics', 'metrics', metrics_endpoint)
@@ -0,0 +1,168 @@
+"""
+Rendered-page cache for ShetkarAI.
+
+Pages whose output depends only on the language (and a few other
+inputs) are rendered once per key and served from memory with an ETag
+and Last-Modified header, so a repeat visit that sends If-None-Match or
+If-Modified-Since gets an empty 304 response.
+
+The cache watches the template folder and the translation catalog files.
+When any of them changes the catalogs are recompiled and every cached
+page is dropped.
+"""
+import hashlib
+import os
+import threading
+import time
+from email.utils import formatdate
+
+from flask import make_response, render_template, request
+
+from backend.utils import translations
+from backend.utils.config import Config
+from backend.utils.metrics import metrics
+
+def _watched_files(paths):
+    for path in paths:
+        if not path:
+            continue
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    yield os.path.join(root, name)
+        elif os.path.isfile(path):
+            yield path
+
+class PageCache:
+    """
+    Cache of rendered pages that is invalidated when its sources change.
+
+    Args:
+        template_paths (list): Template files or folders to watch
+        catalog_paths (list): Translation catalog files or folders to watch
+        maxsize (int): Maximum number of cached pages
+        check_interval (float): Seconds between checks for changed sources
+    """
+
+    def __init__(self, template_paths, catalog_paths, maxsize=256, check_interval=2.0):
+        self.template_paths = list(template_paths)
+        self.catalog_paths = list(catalog_paths)
+        self.maxsize = maxsize
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._pages = {}
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._templates_state, self.last_modified = self._scan(self.template_paths)
+        self._catalogs_state, catalogs_modified = self._scan(self.catalog_paths)
+        self.last_modified = max(self.last_modified, catalogs_modified)
+
+    def _scan(self, paths):
+        state = []
+        newest = 0.0
+        for path in _watched_files(paths):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            state.append((path, stat.st_mtime_ns, stat.st_size))
+            newest = max(newest, stat.st_mtime)
+        return tuple(state), newest
+
+    def _check_sources(self):
+        # stat() the sources at most once per check_interval
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+
+        templates_state, templates_modified = self._scan(self.template_paths)
+        catalogs_state, catalogs_modified = self._scan(self.catalog_paths)
+        if templates_state == self._templates_state and catalogs_state == self._catalogs_state:
+            return
+
+        if catalogs_state != self._catalogs_state:
+            translations.reload_catalogs()
+        with self._lock:
+            self._templates_state = templates_state
+            self._catalogs_state = catalogs_state
+            self.last_modified = max(templates_modified, catalogs_modified, time.time())
+            self._pages.clear()
+            self.invalidations += 1
+
+    def get(self, key, render):
+        """
+        Return the cached page for key, rendering it with render() on a miss.
+
+        Returns:
+            tuple: (body bytes, etag, last_modified timestamp)
+        """
+        self._check_sources()
+        key = (translations.CATALOG_VERSION,) + tuple(key)
+        page = self._pages.get(key)
+        if page is not None:
+            self.hits += 1
+            return page
+
+        self.misses += 1
+        body = render().encode('utf-8')
+        page = (body, hashlib.sha1(body).hexdigest()[:20], self.last_modified)
+        with self._lock:
+            if len(self._pages) >= self.maxsize:
+                self._pages.pop(next(iter(self._pages)))
+            self._pages[key] = page
+        return page
+
+    def stats(self):
+        """Return the cache counters as a dict"""
+        return {
+            "size": len(self._pages),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations
+        }
+
+page_cache = None
+
+def init_page_cache(app):
+    """Create the page cache for app's templates and the translation catalogs"""
+    global page_cache
+    page_cache = PageCache(
+        [app.template_folder if os.path.isabs(app.template_folder)
+         else os.path.join(app.root_path, app.template_folder)],
+        [translations.__file__, Config.TRANSLATIONS_PATH],
+        maxsize=Config.PAGE_CACHE_SIZE,
+        check_interval=Config.PAGE_CACHE_CHECK_INTERVAL
+    )
+    metrics.register_collector('page_cache', page_cache.stats)
+    return page_cache
+
+def render_cached(template, key, **context):
+    """
+    Render a template through the page cache and answer conditional requests.
+
+    Args:
+        template (str): Template name
+        key (tuple): Every input besides the template that the output
+            depends on, e.g. (language,)
+        **context: Template variables
+
+    Returns:
+        Response: The page, or an empty 304 if the client's copy is current
+    """
+    if page_cache is None or not Config.PAGE_CACHE:
+        return make_response(render_template(template, **context))
+
+    body, etag, last_modified = page_cache.get(
+        (template, request.script_root) + tuple(key),
+        lambda: render_template(template, **context)
+    )
+    response = make_response(body)
+    response.set_etag(etag)
+    response.headers['Last-Modified'] = formatdate(last_modified, usegmt=True)
+    # The page depends on the language stored in the session cookie
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response.make_conditional(request)
@@ -0,0 +1,375 @@
+"""
+Request profiling for ShetkarAI, switchable at runtime.
+
+While profiling is on, a fraction (sample_rate) of requests is profiled
+in one of two modes:
+
+- 'sample': a background thread records the stack of every profiled
+  request's thread every Config.PROFILE_SAMPLE_INTERVAL milliseconds.
+  Stacks are aggregated per route in the collapsed format read by
+  flamegraph.pl, speedscope and inferno. Cheap enough for production.
+- 'cprofile': each profiled request runs under cProfile and the stats
+  are merged per route, for pstats or snakeviz. More detailed, much
+  slower.
+
+Profiling is controlled per worker process, either through
+/admin/profiling (which needs Config.ADMIN_TOKEN as a bearer token) or
+by sending Config.PROFILE_SIGNAL to a worker process (not the gunicorn
+master, which uses SIGUSR2 for upgrades). The signal toggles profiling;
+when it turns profiling off, the collected profiles are written to
+Config.PROFILE_DIR.
+
+Sampling uses sys._current_frames(), which sees threads but not
+greenlets, so under gevent workers use the 'cprofile' mode.
+"""
+import cProfile
+import hmac
+import io
+import marshal
+import os
+import pstats
+import random
+import re
+import signal
+import sys
+import threading
+import time
+
+from flask import Response, abort, g, jsonify, request
+
+from backend.utils.config import Config
+
+MODES = ('sample', 'cprofile')
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def collapse_stack(frame):
+    """Return a frame's stack, outermost first, as 'a;b;c'"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+class RouteProfile:
+    """Profiles aggregated for one route"""
+
+    def __init__(self):
+        self.requests = 0
+        self.samples = 0
+        self.stacks = {}
+        self.stats = None
+
+    def add_stack(self, stack, max_stacks):
+        if stack not in self.stacks and len(self.stacks) >= max_stacks:
+            stack = '[other stacks]'
+        self.stacks[stack] = self.stacks.get(stack, 0) + 1
+        self.samples += 1
+
+    def add_cprofile(self, profile):
+        if self.stats is None:
+            self.stats = pstats.Stats(profile)
+        else:
+            self.stats.add(profile)
+
+class RequestProfiler:
+    """
+    Samples or cProfiles a fraction of requests, aggregated per route.
+
+    Args:
+        sample_rate (float): Share of requests profiled while enabled
+        mode (str): 'sample' or 'cprofile'
+        interval (float): Seconds between stack samples
+        max_stacks (int): Distinct stacks kept per route
+    """
+
+    def __init__(self, sample_rate=0.1, mode='sample', interval=0.005, max_stacks=5000):
+        self.enabled = False
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.started_at = None
+        self.routes = {}
+        self._active = {}
+        self._sampler = None
+        self._sampler_pid = None
+        self._lock = threading.Lock()
+
+    def configure(self, enabled=None, sample_rate=None, mode=None, reset=False):
+        """
+        Change the profiling settings.
+
+        Raises:
+            ValueError: If sample_rate or mode is invalid
+        """
+        if sample_rate is not None:
+            sample_rate = float(sample_rate)
+            if not 0 <= sample_rate <= 1:
+                raise ValueError("sample_rate must be between 0 and 1")
+            self.sample_rate = sample_rate
+        if mode is not None:
+            if mode not in MODES:
+                raise ValueError(f"mode must be one of {', '.join(MODES)}")
+            if mode != self.mode:
+                reset = True
+            self.mode = mode
+        if reset:
+            with self._lock:
+                self.routes = {}
+        if enabled is not None:
+            enabled = bool(enabled)
+            if enabled and not self.enabled:
+                self.started_at = time.time()
+            self.enabled = enabled
+
+    def _route_profile(self, route):
+        profile = self.routes.get(route)
+        if profile is None:
+            with self._lock:
+                profile = self.routes.setdefault(route, RouteProfile())
+        return profile
+
+    def _ensure_sampler(self):
+        if self._sampler is not None and self._sampler.is_alive() and self._sampler_pid == os.getpid():
+            return
+        with self._lock:
+            if self._sampler is None or not self._sampler.is_alive() or self._sampler_pid != os.getpid():
+                self._active = {}
+                self._sampler = threading.Thread(target=self._sample_forever, name='profile-sampler',
+                                                 daemon=True)
+                self._sampler.start()
+                self._sampler_pid = os.getpid()
+
+    def _sample_forever(self):
+        # Runs while profiling is on in sample mode; restarted on demand
+        while self.enabled and self.mode == 'sample':
+            time.sleep(self.interval)
+            if not self._active:
+                continue
+            frames = sys._current_frames()
+            for thread_id, route in list(self._active.items()):
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self._route_profile(route).add_stack(collapse_stack(frame), self.max_stacks)
+
+    def start(self, route):
+        """
+        Start profiling the current request if it is sampled.
+
+        Returns:
+            object: A token for stop(), or None if the request isn't profiled
+        """
+        if not self.enabled or random.random() >= self.sample_rate:
+            return None
+        if self.mode == 'cprofile':
+            if sys.getprofile() is not None:
+                # Already under a profiler or debugger, e.g. a request left unclosed
+                return None
+            profile = cProfile.Profile()
+            profile.enable()
+            return (route, profile)
+        self._ensure_sampler()
+        thread_id = threading.get_ident()
+        self._active[thread_id] = route
+        return (route, thread_id)
+
+    def stop(self, token):
+        """Stop profiling a request started with start() and aggregate it"""
+        route, handle = token
+        profile = self._route_profile(route)
+        if isinstance(handle, cProfile.Profile):
+            handle.disable()
+            with self._lock:
+                profile.add_cprofile(handle)
+        else:
+            self._active.pop(handle, None)
+        profile.requests += 1
+
+    def collapsed(self, route=None):
+        """
+        Return the sampled stacks in the collapsed flamegraph format.
+
+        Every stack starts with its route, so one flamegraph shows all
+        routes side by side; pass route to get only that one.
+        """
+        lines = []
+        for name, profile in sorted(self.routes.items()):
+            if route is not None and name != route:
+                continue
+            for stack, count in sorted(profile.stacks.items()):
+                lines.append(f"{name};{stack} {count}")
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def pstats_dump(self, route):
+        """Return the merged cProfile stats of a route as a .prof file, or None"""
+        profile = self.routes.get(route)
+        if profile is None or profile.stats is None:
+            return None
+        with self._lock:
+            return marshal.dumps(profile.stats.stats)
+
+    def pstats_text(self, route, limit=40):
+        """Return the top functions of a route by cumulative time as text, or None"""
+        profile = self.routes.get(route)
+        if profile is None or profile.stats is None:
+            return None
+        out = io.StringIO()
+        stats = pstats.Stats(stream=out)
+        with self._lock:
+            stats.add(profile.stats)
+        stats.sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+
+    def status(self):
+        """Return the settings and per-route counts as a dict"""
+        return {
+            "enabled": self.enabled,
+            "mode": self.mode,
+            "sample_rate": self.sample_rate,
+            "pid": os.getpid(),
+            "started_at": self.started_at,
+            "routes": {route: {"requests": profile.requests, "samples": profile.samples}
+                       for route, profile in self.routes.items()}
+        }
+
+    def write_files(self, folder):
+        """
+        Write the collected profiles to folder, one file per route.
+
+        Returns:
+            list: Paths written
+        """
+        os.makedirs(folder, exist_ok=True)
+        prefix = os.path.join(folder, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+        written = []
+        for route, profile in list(self.routes.items()):
+            name = re.sub(r'[^A-Za-z0-9_.-]+', '_', route).strip('_') or 'root'
+            if profile.stacks:
+                path = f"{prefix}-{name}.collapsed"
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(self.collapsed(route))
+                written.append(path)
+            if profile.stats is not None:
+                path = f"{prefix}-{name}.prof"
+                with open(path, 'wb') as f:
+                    f.write(self.pstats_dump(route))
+                written.append(path)
+        return written
+
+profiler = RequestProfiler(
+    sample_rate=Config.PROFILE_SAMPLE_RATE,
+    mode=Config.PROFILE_MODE,
+    interval=Config.PROFILE_SAMPLE_INTERVAL / 1000
+)
+
+def _start_request():
+    if profiler.enabled and not request.path.startswith('/admin/'):
+        rule = request.url_rule
+        token = profiler.start(rule.rule if rule is not None else '<unmatched>')
+        if token is not None:
+            g.profile_token = token
+
+def _stop_request(response):
+    token = g.pop('profile_token', None)
+    if token is not None:
+        # Include the body of streamed responses
+        response.call_on_close(lambda: profiler.stop(token))
+    return response
+
+def _stop_failed_request(error):
+    token = g.pop('profile_token', None)
+    if token is not None:
+        profiler.stop(token)
+
+def _require_admin():
+    if not Config.ADMIN_TOKEN:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get('Authorization', '').encode('utf-8'),
+                               f"Bearer {Config.ADMIN_TOKEN}".encode('utf-8')):
+        abort(401)
+
+def profiling_settings():
+    """GET: status; POST {enabled, sample_rate, mode, reset}: change settings"""
+    _require_admin()
+    if request.method == 'POST':
+        settings = request.get_json(silent=True) or {}
+        try:
+            profiler.configure(
+                enabled=settings.get('enabled'),
+                sample_rate=settings.get('sample_rate'),
+                mode=settings.get('mode'),
+                reset=bool(settings.get('reset'))
+            )
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+    return jsonify(profiler.status()), 200
+
+def profiling_flamegraph():
+    """Collapsed stacks of this worker, for all routes or ?route=..."""
+    _require_admin()
+    return Response(profiler.collapsed(request.args.get('route')), mimetype='text/plain')
+
+def profiling_pstats():
+    """cProfile stats of ?route=..., as text or as a .prof file with ?format=prof"""
+    _require_admin()
+    route = request.args.get('route', '')
+    if request.args.get('format') == 'prof':
+        data = profiler.pstats_dump(route)
+        if data is None:
+            abort(404)
+        return Response(data, mimetype='application/octet-stream', headers={
+            'Content-Disposition': 'attachment; filename=profile.prof'
+        })
+    text = profiler.pstats_text(route)
+    if text is None:
+        abort(404)
+    return Response(text, mimetype='text/plain')
+
+def _toggle_from_signal(signum, frame):
+    # Signal handlers run in the main thread between bytecodes: keep it short
+    threading.Thread(target=_toggle, name='profile-toggle', daemon=True).start()
+
+def _toggle():
+    if profiler.enabled:
+        profiler.configure(enabled=False)
+        try:
+            for path in profiler.write_files(Config.PROFILE_DIR):
+                print(f"Wrote profile {path}")
+        except OSError as e:
+            print(f"Error writing profiles: {e}")
+        profiler.configure(reset=True)
+    else:
+        profiler.configure(enabled=True, reset=True)
+        print(f"Profiling {profiler.sample_rate:.0%} of requests ({profiler.mode}) in process {os.getpid()}")
+
+def install_profile_signal():
+    """
+    Make Config.PROFILE_SIGNAL toggle profiling in this process.
+
+    Gunicorn workers reset the signal after the app may have been imported
+    (always with --preload), so gunicorn.conf.py installs it again from
+    its post_worker_init hook.
+    """
+    if not Config.PROFILE_SIGNAL:
+        return
+    try:
+        signal.signal(getattr(signal, Config.PROFILE_SIGNAL), _toggle_from_signal)
+    except (AttributeError, ValueError) as e:
+        # Unknown signal, or not called from the main thread
+        print(f"Profiling signal {Config.PROFILE_SIGNAL} not installed: {e}")
+
+def init_profiling(app):
+    """Register the profiling hooks, the admin endpoints and the toggle signal"""
+    app.before_request(_start_request)
+    app.after_request(_stop_request)
+    app.teardown_request(_stop_failed_request)
+    app.add_url_rule('/admin/profiling', 'profiling_settings', profiling_settings,
+                     methods=['GET', 'POST'])
+    app.add_url_rule('/admin/profiling/flamegraph', 'profiling_flamegraph', profiling_flamegraph)
+    app.add_url_rule('/admin/profiling/pstats', 'profiling_pstats', profiling_pstats)
+
+    install_profile_signal()
+    if Config.PROFILE_ON_START:
+        profiler.configure(enabled=True)
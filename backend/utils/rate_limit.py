@@ -0,0 +1,312 @@
+"""
+Rate limiting and admission control for ShetkarAI.
+
+Each rate-limited route has a token bucket per client. The budget is
+set in Config as "<requests>/<seconds>": the bucket holds that many
+tokens, refills evenly over the period, and each request takes one. So
+a client can burst through the whole budget but no faster than the
+refill rate after that. A client is identified by the first available
+of Config.RATE_LIMIT_KEY: the logged-in user, the server-side session,
+or the IP address. A request over budget gets 429 with Retry-After.
+
+Buckets are kept per worker process ('memory') or in a SQLite file
+shared by every worker on the host ('sqlite'); with the memory backend
+a client's effective budget is multiplied by the number of workers.
+
+The image routes also have a cap on requests in progress per worker.
+Beyond it new requests get 503 with Retry-After before their upload is
+read, instead of queueing behind the ones already running.
+"""
+import functools
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, jsonify, request, session
+
+from backend.utils.auth import current_user_id
+from backend.utils.config import Config
+from backend.utils.metrics import metrics
+
+rate_limit_decisions = metrics.counter(
+    'rate_limit_decisions_total', 'Requests checked against a rate limit, by route and decision',
+    ('route', 'decision')
+)
+admission_rejections = metrics.counter(
+    'admission_rejections_total', 'Requests refused because the route was at its concurrency cap',
+    ('route',)
+)
+
+def parse_budget(text):
+    """
+    Parse a budget such as '30/60' (30 requests per 60 seconds).
+
+    Returns:
+        tuple: (capacity, refill rate in tokens per second), or None for
+        an empty budget, which means no limit
+
+    Raises:
+        ValueError: If the budget is malformed
+    """
+    if not text or not text.strip():
+        return None
+    count, _, seconds = text.partition('/')
+    capacity, period = float(count), float(seconds or 1)
+    if capacity <= 0 or period <= 0:
+        raise ValueError(f"Invalid rate limit budget {text!r}")
+    return capacity, capacity / period
+
+def _take(tokens, updated_at, now, capacity, rate, cost):
+    """Refill a bucket to now and take cost tokens; returns (tokens, allowed, retry_after)"""
+    tokens = capacity if tokens is None else min(capacity, tokens + (now - updated_at) * rate)
+    if tokens >= cost:
+        return tokens - cost, True, 0.0
+    return tokens, False, (cost - tokens) / rate
+
+class MemoryBucketStore:
+    """
+    Token buckets in an LRU dict of this process. A bucket dropped from a
+    full store starts again full, so the bound errs on the lenient side.
+
+    Args:
+        maxsize (int): Buckets kept before the least recently used are dropped
+    """
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.evictions = 0
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, cost=1):
+        """
+        Take cost tokens from the bucket for key.
+
+        Returns:
+            tuple: (allowed, seconds until cost tokens are available)
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (None, now))
+            tokens, allowed, retry_after = _take(tokens, updated_at, now, capacity, rate, cost)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+        return allowed, retry_after
+
+    def stats(self):
+        """Return the store counters as a dict"""
+        return {"backend": "memory", "buckets": len(self._buckets), "maxsize": self.maxsize,
+                "evictions": self.evictions}
+
+class SQLiteBucketStore:
+    """
+    Token buckets in a SQLite file shared by every worker process on the
+    host. Each take is one short write transaction.
+
+    Args:
+        path (str): SQLite database file
+        sweep_interval (float): Seconds between removals of idle buckets
+    """
+
+    def __init__(self, path, sweep_interval=300):
+        self.path = path
+        self.sweep_interval = sweep_interval
+        self.swept = 0
+        self._next_sweep = time.time() + sweep_interval
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit_buckets "
+            "(key TEXT PRIMARY KEY, tokens REAL, updated_at REAL, full_at REAL)"
+        )
+
+    def _connect(self):
+        # One connection per thread and per process; connections must
+        # not cross a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def take(self, key, capacity, rate, cost=1):
+        """
+        Take cost tokens from the bucket for key.
+
+        Returns:
+            tuple: (allowed, seconds until cost tokens are available)
+        """
+        conn = self._connect()
+        now = time.time()
+        # IMMEDIATE takes the write lock up front, so two workers can't
+        # both spend the same tokens
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?",
+                               (key,)).fetchone()
+            tokens, updated_at = row if row is not None else (None, now)
+            tokens, allowed, retry_after = _take(tokens, updated_at, now, capacity, rate, cost)
+            # full_at: when the bucket would be full again, so it can be dropped
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated_at, full_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, tokens, now, now + (capacity - tokens) / rate)
+            )
+            if now >= self._next_sweep:
+                self._next_sweep = now + self.sweep_interval
+                self.swept += max(conn.execute(
+                    "DELETE FROM rate_limit_buckets WHERE full_at <= ?", (now,)
+                ).rowcount, 0)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, retry_after
+
+    def stats(self):
+        """Return the store counters as a dict (swept is per process)"""
+        buckets = self._connect().execute("SELECT COUNT(*) FROM rate_limit_buckets").fetchone()[0]
+        return {"backend": "sqlite", "buckets": buckets, "swept": self.swept}
+
+class ConcurrencyCap:
+    """
+    Non-blocking cap on the requests a route has in progress in this process.
+
+    Args:
+        limit (int): Requests allowed at once; 0 means no cap
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a slot if one is free; returns whether it did"""
+        with self._lock:
+            if self.limit and self.in_flight >= self.limit:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def stats(self):
+        return {"in_flight": self.in_flight, "limit": self.limit, "rejected": self.rejected}
+
+def make_bucket_store(backend):
+    """
+    Create the bucket store for a backend name.
+
+    Raises:
+        ValueError: If backend isn't 'memory' or 'sqlite'
+    """
+    if backend == 'memory':
+        return MemoryBucketStore(maxsize=Config.RATE_LIMIT_MAX_BUCKETS)
+    if backend == 'sqlite':
+        return SQLiteBucketStore(Config.RATE_LIMIT_DB_PATH)
+    raise ValueError(f"Unknown rate limit backend {backend!r}; use 'memory' or 'sqlite'")
+
+bucket_store = make_bucket_store(Config.RATE_LIMIT_BACKEND)
+metrics.register_collector('rate_limit_store', bucket_store.stats)
+
+# Concurrency cap of each route that has one, by route name
+concurrency_caps = {}
+metrics.register_collector('concurrency_cap', lambda: {name: cap.stats()
+                                                       for name, cap in concurrency_caps.items()},
+                           label='route')
+
+def client_key():
+    """
+    Identify the client of the current request by the first of
+    Config.RATE_LIMIT_KEY ('user', 'session', 'ip') that is available.
+    """
+    for kind in Config.RATE_LIMIT_KEY:
+        if kind == 'user':
+            user_id = current_user_id()
+            if user_id is not None:
+                return f"user:{user_id}"
+        elif kind == 'session':
+            # Only server-side sessions have an ID; see backend/utils/sessions.py
+            sid = getattr(session, 'sid', None)
+            if sid:
+                return f"session:{sid}"
+        elif kind == 'ip':
+            return f"ip:{request.remote_addr}"
+    return f"ip:{request.remote_addr}"
+
+def _too_many_requests(retry_after):
+    seconds = max(1, math.ceil(retry_after))
+    return jsonify({"error": f"Too many requests, please try again in {seconds} seconds"}), 429, {
+        'Retry-After': str(seconds)
+    }
+
+def rate_limited(name, budget=None, concurrency=None):
+    """
+    Apply a per-client token bucket, and optionally a concurrency cap, to a view.
+
+    Args:
+        name (str): Route name, used in the bucket keys and metrics
+        budget (str): Budget such as '30/60'; '' or None for none
+        concurrency (int): Requests in progress per worker; 0 or None for no cap
+
+    Raises:
+        ValueError: If budget is malformed
+    """
+    limit = parse_budget(budget)
+    cap = ConcurrencyCap(concurrency) if concurrency else None
+    if cap is not None:
+        concurrency_caps[name] = cap
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapped(*args, **kwargs):
+            if not Config.RATE_LIMITING:
+                return view(*args, **kwargs)
+            if limit is not None:
+                capacity, rate = limit
+                try:
+                    allowed, retry_after = bucket_store.take(f"{name}:{client_key()}", capacity, rate)
+                except sqlite3.Error as e:
+                    # Fail open: a broken limiter must not take the route down
+                    print(f"Error checking rate limit for {name}: {e}")
+                    allowed = True
+                rate_limit_decisions.labels(name, 'allowed' if allowed else 'limited').inc()
+                if not allowed:
+                    return _too_many_requests(retry_after)
+            if cap is None:
+                return view(*args, **kwargs)
+            if not cap.acquire():
+                admission_rejections.labels(name).inc()
+                return jsonify({"error": "Server is busy, please try again shortly"}), 503, {
+                    'Retry-After': str(Config.ADMISSION_RETRY_AFTER)
+                }
+            try:
+                response = current_app.make_response(view(*args, **kwargs))
+            except Exception:
+                cap.release()
+                raise
+            if response.is_streamed:
+                # The work goes on while the body streams (the batch routes)
+                response.call_on_close(cap.release)
+            else:
+                cap.release()
+            return response
+        return wrapped
+    return decorator
@@ -0,0 +1,341 @@
+"""
+Server-side sessions for ShetkarAI.
+
+With Config.SESSION_BACKEND set to 'memory' or 'sqlite', the session
+data stays on the server and the cookie only carries a random session
+ID, which is set once when the session is created. The stored data is
+read the first time a request touches the session and written back only
+when the request changed it. Idle sessions expire after
+Config.SESSION_TTL seconds; reading a session that is past half its TTL
+pushes the expiry out again, and expired sessions are swept every
+Config.SESSION_SWEEP_INTERVAL seconds.
+
+'memory' keeps the sessions in an LRU dict in each worker process, so it
+only suits a single worker. 'sqlite' keeps them in a SQLite file that
+every worker on the host shares. 'cookie' (the default) keeps Flask's
+signed-cookie sessions.
+"""
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+
+from backend.utils.config import Config
+from backend.utils.metrics import metrics
+
+# Session IDs are 24 URL-safe characters (144 random bits)
+SESSION_ID_BYTES = 18
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{24}$')
+
+# Keys whose change means the user logged in or out; the session gets a
+# new ID so one planted before login can't be reused after it
+AUTH_KEYS = ('user_id',)
+
+def new_session_id():
+    return secrets.token_urlsafe(SESSION_ID_BYTES)
+
+class MemorySessionStore:
+    """
+    Sessions in an in-process LRU dict, expiring after ttl seconds idle.
+
+    Args:
+        maxsize (int): Sessions kept before the least recently used are dropped
+        ttl (float): Idle seconds before a session expires
+        sweep_interval (float): Seconds between sweeps of expired sessions
+    """
+
+    def __init__(self, maxsize=10000, ttl=7 * 24 * 3600, sweep_interval=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.loads = 0
+        self.saves = 0
+        self.deletes = 0
+        self.expired = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._next_sweep = time.monotonic() + sweep_interval
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        """Return a copy of the session data for sid, or None if unknown or expired"""
+        now = time.monotonic()
+        with self._lock:
+            self.loads += 1
+            entry = self._data.get(sid)
+            if entry is None:
+                return None
+            data, expires_at = entry
+            if expires_at <= now:
+                del self._data[sid]
+                self.expired += 1
+                return None
+            if expires_at - now < self.ttl / 2:
+                self._data[sid] = (data, now + self.ttl)
+            self._data.move_to_end(sid)
+            return dict(data)
+
+    def save(self, sid, data):
+        """Store the session data for sid and restart its TTL"""
+        now = time.monotonic()
+        with self._lock:
+            self.saves += 1
+            self._data[sid] = (dict(data), now + self.ttl)
+            self._data.move_to_end(sid)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+            if now >= self._next_sweep:
+                self._sweep(now)
+
+    def delete(self, sid):
+        """Remove the session sid if present"""
+        with self._lock:
+            self.deletes += 1
+            self._data.pop(sid, None)
+
+    def _sweep(self, now):
+        expired = [sid for sid, (_, expires_at) in self._data.items() if expires_at <= now]
+        for sid in expired:
+            del self._data[sid]
+        self.expired += len(expired)
+        self._next_sweep = now + self.sweep_interval
+
+    def stats(self):
+        """Return the store counters as a dict"""
+        return {
+            "backend": "memory",
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "loads": self.loads,
+            "saves": self.saves,
+            "deletes": self.deletes,
+            "expired": self.expired,
+            "evictions": self.evictions
+        }
+
+class SQLiteSessionStore:
+    """
+    Sessions in a SQLite file shared by every worker process on the host,
+    expiring after ttl seconds idle. Values are serialized like Flask's
+    cookie sessions.
+
+    Args:
+        path (str): SQLite database file
+        ttl (float): Idle seconds before a session expires
+        sweep_interval (float): Seconds between sweeps of expired sessions
+    """
+
+    def __init__(self, path, ttl=7 * 24 * 3600, sweep_interval=300):
+        self.path = path
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.loads = 0
+        self.saves = 0
+        self.deletes = 0
+        self.expired = 0
+        self._next_sweep = time.time() + sweep_interval
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS sessions "
+            "(sid TEXT PRIMARY KEY, data TEXT, expires_at REAL)"
+        )
+
+    def _connect(self):
+        # One connection per thread and per process; connections must
+        # not cross a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def load(self, sid):
+        """Return the session data for sid, or None if unknown or expired"""
+        conn = self._connect()
+        now = time.time()
+        self.loads += 1
+        row = conn.execute(
+            "SELECT data, expires_at FROM sessions WHERE sid = ? AND expires_at > ?", (sid, now)
+        ).fetchone()
+        if row is None:
+            return None
+        data, expires_at = row
+        if expires_at - now < self.ttl / 2:
+            conn.execute("UPDATE sessions SET expires_at = ? WHERE sid = ?", (now + self.ttl, sid))
+        return session_json_serializer.loads(data)
+
+    def save(self, sid, data):
+        """Store the session data for sid and restart its TTL"""
+        conn = self._connect()
+        now = time.time()
+        self.saves += 1
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (sid, data, expires_at) VALUES (?, ?, ?)",
+            (sid, session_json_serializer.dumps(dict(data)), now + self.ttl)
+        )
+        if now >= self._next_sweep:
+            # Each worker sweeps on its own schedule; the DELETE is idempotent
+            self._next_sweep = now + self.sweep_interval
+            self.expired += max(conn.execute(
+                "DELETE FROM sessions WHERE expires_at <= ?", (now,)
+            ).rowcount, 0)
+
+    def delete(self, sid):
+        """Remove the session sid if present"""
+        self.deletes += 1
+        self._connect().execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def stats(self):
+        """Return the store counters as a dict (counters are per process)"""
+        return {
+            "backend": "sqlite",
+            "size": self._connect().execute("SELECT COUNT(*) FROM sessions").fetchone()[0],
+            "loads": self.loads,
+            "saves": self.saves,
+            "deletes": self.deletes,
+            "expired": self.expired
+        }
+
+class ServerSession(SessionMixin):
+    """
+    Session whose data is loaded from the store on first access and
+    tracks whether the request changed it.
+    """
+
+    def __init__(self, store, sid=None):
+        self.store = store
+        self.sid = sid
+        self.modified = False
+        self.accessed = False
+        self._data = None
+        self._auth = None
+
+    def _load(self):
+        if self._data is None:
+            self.accessed = True
+            data = self.store.load(self.sid) if self.sid else None
+            if data is None:
+                # Unknown or expired: never reuse an ID the client made up
+                self.sid = None
+                data = {}
+            self._data = data
+            self._auth = tuple(data.get(key) for key in AUTH_KEYS)
+        return self._data
+
+    @property
+    def loaded(self):
+        return self._data is not None
+
+    def auth_changed(self):
+        """Whether a key in AUTH_KEYS changed during this request"""
+        return self.loaded and self._auth != tuple(self._data.get(key) for key in AUTH_KEYS)
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __setitem__(self, key, value):
+        self._load()[key] = value
+        self.modified = True
+
+    def __delitem__(self, key):
+        del self._load()[key]
+        self.modified = True
+
+    def __contains__(self, key):
+        return key in self._load()
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def clear(self):
+        self._load().clear()
+        self.modified = True
+
+class ServerSessionInterface(SessionInterface):
+    """Flask session interface that keeps the data in a session store"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid is not None and not SESSION_ID_PATTERN.match(sid):
+            sid = None
+        return ServerSession(self.store, sid)
+
+    def save_session(self, app, session, response):
+        if session.accessed:
+            response.vary.add('Cookie')
+        if not session.modified:
+            return
+
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.sid:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app),
+                                       samesite=self.get_cookie_samesite(app),
+                                       httponly=self.get_cookie_httponly(app))
+            return
+
+        new_sid = session.sid is None or session.auth_changed()
+        if new_sid:
+            if session.sid:
+                self.store.delete(session.sid)
+            session.sid = new_session_id()
+        self.store.save(session.sid, session)
+
+        # The ID never changes once set, unless the expiry has to slide
+        if new_sid or session.permanent:
+            response.set_cookie(
+                name, session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app)
+            )
+
+def make_session_store(backend):
+    """
+    Create the session store for a backend name.
+
+    Raises:
+        ValueError: If backend isn't 'memory' or 'sqlite'
+    """
+    if backend == 'memory':
+        return MemorySessionStore(maxsize=Config.SESSION_MAX_ENTRIES, ttl=Config.SESSION_TTL,
+                                  sweep_interval=Config.SESSION_SWEEP_INTERVAL)
+    if backend == 'sqlite':
+        return SQLiteSessionStore(Config.SESSION_DB_PATH, ttl=Config.SESSION_TTL,
+                                  sweep_interval=Config.SESSION_SWEEP_INTERVAL)
+    raise ValueError(f"Unknown session backend {backend!r}; use 'cookie', 'memory' or 'sqlite'")
+
+def init_sessions(app):
+    """Switch app to server-side sessions unless Config.SESSION_BACKEND is 'cookie'"""
+    if Config.SESSION_BACKEND == 'cookie':
+        return None
+    store = make_session_store(Config.SESSION_BACKEND)
+    app.session_interface = ServerSessionInterface(store)
+    metrics.register_collector('sessions', store.stats)
+    return store
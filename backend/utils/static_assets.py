@@ -0,0 +1,166 @@
+"""
+Fingerprinted static assets for ShetkarAI.
+
+Templates link static files with ``asset_url('css/dashboard.css')``,
+which puts a hash of the file's content in the URL. Those URLs never
+change meaning, so they are served with a one-year immutable
+Cache-Control header and a browser only downloads an asset again after
+it has changed.
+
+Text assets can be precompressed at build time with
+
+    python -m backend.utils.static_assets
+
+which writes ``.gz`` (and ``.br`` if the brotli package is installed)
+files next to them; the asset route serves these to clients that accept
+the encoding instead of compressing on every request.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import sys
+
+from flask import abort, current_app, request, send_file, url_for
+from werkzeug.security import safe_join
+
+from backend.utils.config import Config
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Extensions that are worth precompressing
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.json', '.svg', '.txt', '.html', '.map'}
+
+# Precompressed variants, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Content digests by path, with the (mtime_ns, size) they were computed for
+_digests = {}
+
+def asset_digest(path):
+    """
+    Return a short hash of a file's content, or None if it does not exist.
+
+    The hash is recomputed only when the file's mtime or size changes.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    state = (stat.st_mtime_ns, stat.st_size)
+    cached = _digests.get(path)
+    if cached is not None and cached[0] == state:
+        return cached[1]
+
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    digest = digest.hexdigest()[:12]
+    _digests[path] = (state, digest)
+    return digest
+
+def asset_url(filename):
+    """
+    URL of a static file with its content hash in the path.
+
+    Falls back to the plain /static URL if the file does not exist.
+    """
+    path = safe_join(current_app.static_folder, filename)
+    digest = asset_digest(path) if path else None
+    if digest is None:
+        return url_for('static', filename=filename)
+    return url_for('static_asset', digest=digest, filename=filename)
+
+def serve_asset(digest, filename):
+    """Serve a fingerprinted asset, preferring a precompressed variant"""
+    path = safe_join(current_app.static_folder, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    current = asset_digest(path)
+    if digest != current:
+        # An old or mistyped fingerprint: serve the file, but don't let it
+        # be cached under a URL that doesn't match its content
+        response = send_file(path, max_age=0)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    response = None
+    mtime = os.stat(path).st_mtime
+    for encoding, suffix in ENCODINGS:
+        variant = path + suffix
+        if (request.accept_encodings[encoding]
+                and os.path.isfile(variant)
+                and os.stat(variant).st_mtime >= mtime):
+            response = send_file(variant, mimetype=_mimetype(filename),
+                                 etag=f"{current}-{encoding}", max_age=IMMUTABLE_MAX_AGE)
+            response.headers['Content-Encoding'] = encoding
+            break
+    if response is None:
+        response = send_file(path, etag=current, max_age=IMMUTABLE_MAX_AGE)
+
+    response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    response.vary.add('Accept-Encoding')
+    return response
+
+def _mimetype(filename):
+    mimetype, _ = mimetypes.guess_type(filename)
+    return mimetype or 'application/octet-stream'
+
+def init_static_assets(app):
+    """Register the fingerprinted asset route and the asset_url template helper"""
+    app.add_url_rule(
+        f"{app.static_url_path}/assets/<digest>/<path:filename>",
+        'static_asset',
+        serve_asset
+    )
+    app.jinja_env.globals['asset_url'] = asset_url
+
+def precompress(folder, exclude=()):
+    """
+    Write .gz and .br variants of the compressible files under folder.
+
+    Variants that would not be smaller than the original are not kept.
+
+    Args:
+        folder (str): Static folder
+        exclude (tuple): Folders under folder to skip, e.g. uploads
+
+    Returns:
+        list: Paths of the variants written
+    """
+    exclude = {os.path.abspath(path) for path in exclude}
+    written = []
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = [name for name in dirs
+                   if os.path.abspath(os.path.join(root, name)) not in exclude]
+        for name in sorted(files):
+            if os.path.splitext(name)[1] not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+
+            variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                variants.append(('.br', brotli.compress(data, quality=11)))
+            for suffix, body in variants:
+                if len(body) >= len(data):
+                    continue
+                with open(path + suffix, 'wb') as f:
+                    f.write(body)
+                written.append(path + suffix)
+    return written
+
+if __name__ == '__main__':
+    static_folder = sys.argv[1] if len(sys.argv) > 1 else os.path.join('backend', 'static')
+    for variant in precompress(static_folder, exclude=[Config.UPLOAD_FOLDER]):
+        print(f"Wrote {variant}")
+    if brotli is None:
+        print("brotli is not installed; only gzip variants were written")
@@ -1,9 +1,44 @@
+import os
+import threading
+import time
+
+import httpx
 from supabase import create_client
+from supabase.lib.client_options import ClientOptions
+from backend.utils.cache import make_cache
 from backend.utils.config import Config
+from backend.utils.http import outcome_label, upstream_duration
+from backend.utils.write_behind import WriteBehindQueue
 
-def get_supabase_client():
+# Profile columns the app actually uses
+PROFILE_COLUMNS = ("id", "username", "language_preference")
+
+# One client per worker process, created on first use
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+class TimedTransport(httpx.HTTPTransport):
+    """HTTP transport that times every Supabase call for /metrics"""
+    
+    def handle_request(self, request):
+        # /auth/v1/... or /rest/v1/...
+        upstream = 'supabase_' + (request.url.path.strip('/').split('/', 1)[0] or 'api')
+        start = time.perf_counter()
+        status = None
+        try:
+            response = super().handle_request(request)
+            status = response.status_code
+            return response
+        finally:
+            upstream_duration.labels(upstream, outcome_label(status)).observe(
+                (time.perf_counter() - start) * 1000
+            )
+
+def _create_pooled_client():
     """
-    Create and return a Supabase client instance.
+    Build a Supabase client whose auth and table calls share one
+    keep-alive connection pool.
     """
     url = Config.SUPABASE_URL
     key = Config.SUPABASE_KEY
@@ -11,7 +46,98 @@ def get_supabase_client():
     if not url or not key:
         raise ValueError("Supabase URL and key must be set in the environment variables")
     
-    return create_client(url, key)
+    timeout = httpx.Timeout(Config.SUPABASE_TIMEOUT, connect=Config.SUPABASE_CONNECT_TIMEOUT)
+    limits = httpx.Limits(
+        max_connections=Config.SUPABASE_POOL_MAXSIZE,
+        max_keepalive_connections=Config.SUPABASE_POOL_KEEPALIVE,
+        keepalive_expiry=Config.SUPABASE_KEEPALIVE_EXPIRY
+    )
+    transport = TimedTransport(limits=limits)
+    
+    # The client is shared between users, so it must not hold on to a
+    # logged-in session or start a refresh timer for it
+    options = ClientOptions(
+        auto_refresh_token=False,
+        persist_session=False,
+        postgrest_client_timeout=timeout
+    )
+    client = create_client(url, key, options)
+    
+    # Route both sub-clients through the shared transport, closing the
+    # clients gotrue created for them (usually one shared by both)
+    replaced = {id(http): http for http in (client.auth._http_client, client.auth.admin._http_client)}
+    for http in replaced.values():
+        http.close()
+    auth_http = httpx.Client(transport=transport, timeout=timeout)
+    client.auth._http_client = auth_http
+    client.auth.admin._http_client = auth_http
+    
+    rest_session = client.postgrest.session
+    client.postgrest.session = type(rest_session)(
+        base_url=rest_session.base_url,
+        headers=rest_session.headers,
+        timeout=timeout,
+        transport=transport
+    )
+    rest_session.close()
+    
+    return client
+
+def get_supabase_client():
+    """
+    Return the Supabase client for this worker process.
+    
+    The client is created lazily and reused for every call. If the process
+    has been forked since (e.g. gunicorn workers), a fresh client is built
+    so sockets are never shared between processes.
+    """
+    global _client, _client_pid
+    
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+    
+    with _client_lock:
+        if _client is None or _client_pid != pid:
+            _client = _create_pooled_client()
+            _client_pid = pid
+    
+    return _client
+
+def reset_supabase_client():
+    """
+    Drop the cached client so the next call builds a new one.
+    
+    Registered as an after-fork hook; it can also be called after
+    changing the Supabase settings at runtime.
+    """
+    global _client, _client_pid, _client_lock
+    
+    _client = None
+    _client_pid = None
+    # The lock may have been held by another thread at fork time
+    _client_lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_supabase_client)
+
+# Read-through cache of profile rows, keyed by user ID
+profile_cache = make_cache('profiles', maxsize=Config.PROFILE_CACHE_SIZE, ttl=Config.PROFILE_CACHE_TTL)
+
+def _cache_profile(user_id, row):
+    """
+    Store the projected columns of a profile row in the cache.
+    
+    Rows missing any of the columns are not cached and drop any stale
+    entry instead.
+    """
+    if not all(column in row for column in PROFILE_COLUMNS):
+        profile_cache.delete(user_id)
+        return dict(row)
+    
+    profile = {column: row[column] for column in PROFILE_COLUMNS}
+    profile_cache.set(user_id, profile)
+    return profile
 
 def register_user(email, password, username, language_preference='en'):
     """
@@ -49,6 +175,7 @@ def register_user(email, password, username, language_preference='en'):
         }
         
         supabase.table("profiles").insert(profile_data).execute()
+        _cache_profile(user_id, profile_data)
         
     return user_response
 
@@ -75,7 +202,7 @@ def login_user(email, password):
 
 def get_user_profile(user_id):
     """
-    Get a user's profile data from Supabase.
+    Get a user's profile data, reading through the profile cache.
     
     Args:
         user_id (str): The user's ID
@@ -83,12 +210,16 @@ def get_user_profile(user_id):
     Returns:
         dict: User profile data
     """
+    profile = profile_cache.get(user_id)
+    if profile is not None:
+        return dict(profile)
+    
     supabase = get_supabase_client()
     
-    response = supabase.table("profiles").select("*").eq("id", user_id).execute()
+    response = supabase.table("profiles").select(*PROFILE_COLUMNS).eq("id", user_id).execute()
     
     if response.data and len(response.data) > 0:
-        return response.data[0]
+        return dict(_cache_profile(user_id, response.data[0]))
     
     return None
 
@@ -109,4 +240,72 @@ def update_language_preference(user_id, language):
         {"language_preference": language}
     ).eq("id", user_id).execute()
     
-    return response 
\ No newline at end of file
+    # Write the updated row through to the cache
+    if response.data:
+        _cache_profile(user_id, response.data[0])
+    else:
+        profile_cache.delete(user_id)
+    
+    return response 
+
+def _write_language_preferences(updates):
+    """
+    Persist a batch of queued language preferences.
+    
+    Users are grouped by language so each distinct value costs a single
+    update request.
+    
+    Args:
+        updates (dict): Mapping of user ID to language code
+    """
+    by_language = {}
+    for user_id, language in updates.items():
+        by_language.setdefault(language, []).append(user_id)
+    
+    supabase = get_supabase_client()
+    
+    for language, user_ids in by_language.items():
+        response = supabase.table("profiles").update(
+            {"language_preference": language}
+        ).in_("id", user_ids).execute()
+        
+        for row in response.data or []:
+            _cache_profile(row.get("id"), row)
+
+def _forget_language_preferences(updates):
+    """
+    Evict the cached profiles of users whose preference was never saved.
+    
+    queue_language_preference caches the new language before it is
+    written, so the next read has to go back to Supabase instead.
+    """
+    for user_id in updates:
+        profile_cache.delete(user_id)
+
+preference_writer = WriteBehindQueue(
+    _write_language_preferences,
+    interval=Config.PREFERENCE_FLUSH_INTERVAL,
+    batch_size=Config.PREFERENCE_FLUSH_BATCH_SIZE,
+    max_retries=Config.PREFERENCE_WRITE_RETRIES,
+    name='language-preference-writer',
+    on_failure=_forget_language_preferences
+)
+
+def queue_language_preference(user_id, language):
+    """
+    Queue a language preference update without waiting for Supabase.
+    
+    Repeated updates for the same user before the next flush are
+    coalesced into the last value. The cached profile is updated right
+    away so reads see the new preference; it is evicted again if the
+    write is dropped.
+    
+    Args:
+        user_id (str): The user's ID
+        language (str): The preferred language (en or hi)
+    """
+    profile = profile_cache.get(user_id)
+    if profile is not None:
+        profile_cache.set(user_id, dict(profile, language_preference=language))
+    
+    preference_writer.put(user_id, language)
@@ -1,7 +1,21 @@
 """
 Translations utility for multi-language support in ShetkarAI.
 Supports English (en) and Hindi (hi).
+
+All strings are compiled once at import time into read-only bundles,
+one per page and language, so rendering a page is a single lookup that
+returns the same mapping every time. Extra or overriding strings can be
+supplied as ``<language>.json`` files ({key: text}) in
+Config.TRANSLATIONS_PATH. Missing translations are reported when the
+bundles are built, and a page that uses an unknown key fails the build.
 """
+import hashlib
+import json
+import os
+import re
+from types import MappingProxyType
+
+from backend.utils.config import Config
 
 # Dictionary of translations for the application
 TRANSLATIONS = {
@@ -126,6 +140,167 @@ TRANSLATIONS = {
     }
 }
 
+# Keys each page (or group of strings used together) needs
+PAGES = {
+    "language_select": (
+        "language_select_title", "language_select_subtitle", "english", "hindi", "continue"
+    ),
+    "login": (
+        "login_title", "register_title", "email", "password", "username",
+        "login_button", "register_button", "no_account", "have_account",
+        "register_link", "login_link", "language_select_title"
+    ),
+    "dashboard": (
+        "app_title", "welcome", "detect_disease", "detect_disease_desc",
+        "analyze_soil", "analyze_soil_desc", "weather", "weather_desc",
+        "logout", "english", "hindi"
+    )
+}
+
+# Page bundle each template is rendered with
+TEMPLATE_PAGES = {
+    "language_select.html": "language_select",
+    "login.html": "login",
+    "dashboard.html": "dashboard"
+}
+
+def load_catalog_files(path):
+    """
+    Read external catalog files from a directory.
+    
+    Args:
+        path (str): Directory holding ``<language>.json`` files
+        
+    Returns:
+        dict: {key: {language: text}} for every string found
+    """
+    catalog = {}
+    if not path or not os.path.isdir(path):
+        return catalog
+    
+    for filename in sorted(os.listdir(path)):
+        language, extension = os.path.splitext(filename)
+        if extension != '.json':
+            continue
+        with open(os.path.join(path, filename), encoding='utf-8') as f:
+            for key, text in json.load(f).items():
+                catalog.setdefault(key, {})[language] = text
+    return catalog
+
+def merge_catalogs(base, extra):
+    """Return base with the strings of extra added or overriding it"""
+    merged = {key: dict(texts) for key, texts in base.items()}
+    for key, texts in extra.items():
+        merged.setdefault(key, {}).update(texts)
+    return merged
+
+def compile_catalog(translations, pages, languages):
+    """
+    Compile translations into frozen per-language and per-page mappings.
+    
+    Missing translations fall back to English and are reported.
+    
+    Args:
+        translations (dict): {key: {language: text}}
+        pages (dict): {page: keys used by the page}
+        languages (list): Languages to build
+        
+    Returns:
+        tuple: (catalogs, bundles, missing) where catalogs maps language
+        to {key: text}, bundles maps page to language to {key: text}
+        and missing lists the (language, key) pairs without a translation
+        
+    Raises:
+        KeyError: If a page uses a key that has no English text
+    """
+    missing = []
+    catalogs = {}
+    for language in languages:
+        texts = {}
+        for key, entry in translations.items():
+            if language in entry:
+                texts[key] = entry[language]
+            elif 'en' in entry:
+                texts[key] = entry['en']
+                missing.append((language, key))
+        catalogs[language] = MappingProxyType(texts)
+    
+    bundles = {}
+    for page, keys in pages.items():
+        unknown = [key for key in keys if key not in catalogs['en']]
+        if unknown:
+            raise KeyError(f"Page '{page}' uses unknown translation keys: {', '.join(unknown)}")
+        bundles[page] = MappingProxyType({
+            language: MappingProxyType({key: catalog[key] for key in keys})
+            for language, catalog in catalogs.items()
+        })
+    
+    return MappingProxyType(catalogs), MappingProxyType(bundles), missing
+
+def check_templates(template_folder, pages=None):
+    """
+    Find ``translations.<key>`` uses in templates that their page bundle lacks.
+    
+    Returns:
+        list: (template, key) pairs that would render as empty
+    """
+    pages = pages or PAGES
+    problems = []
+    for template, page in TEMPLATE_PAGES.items():
+        path = os.path.join(template_folder, template)
+        if not os.path.isfile(path):
+            continue
+        with open(path, encoding='utf-8') as f:
+            used = set(re.findall(r"translations\.(\w+)", f.read()))
+        problems.extend((template, key) for key in sorted(used - set(pages[page])))
+    return problems
+
+def build_catalogs():
+    """
+    (Re)compile the built-in strings and the catalog files.
+    
+    Called at import, and again by reload_catalogs when the catalog files
+    change while the app is running.
+    """
+    global CATALOGS, BUNDLES, MISSING_TRANSLATIONS, CATALOG_VERSION
+    catalogs, bundles, missing = compile_catalog(
+        merge_catalogs(TRANSLATIONS, load_catalog_files(Config.TRANSLATIONS_PATH)),
+        PAGES,
+        Config.SUPPORTED_LANGUAGES
+    )
+    for language, key in missing:
+        print(f"Missing '{language}' translation for '{key}', using English")
+    
+    # Changes whenever any compiled string changes; used by the page cache
+    CATALOG_VERSION = hashlib.sha1(
+        json.dumps({language: dict(texts) for language, texts in catalogs.items()},
+                   sort_keys=True).encode('utf-8')
+    ).hexdigest()[:12]
+    CATALOGS, BUNDLES, MISSING_TRANSLATIONS = catalogs, bundles, missing
+
+def reload_catalogs():
+    """Recompile the catalogs, keeping the old ones if the files are invalid"""
+    try:
+        build_catalogs()
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error reloading translation catalogs: {e}")
+
+build_catalogs()
+
+def get_bundle(page, language="en"):
+    """
+    Get the precompiled translations for a page.
+    
+    Args:
+        page (str): A key of PAGES
+        language (str): The language code. Unsupported languages get English.
+        
+    Returns:
+        Mapping: Read-only {key: text}; the same object on every call
+    """
+    bundles = BUNDLES[page]
+    return bundles.get(language) or bundles["en"]
+
 def get_text(key, language="en"):
     """
     Get the translated text for a given key and language.
@@ -137,10 +312,6 @@ def get_text(key, language="en"):
     Returns:
         str: The translated text or the key itself if not found.
     """
-    if key not in TRANSLATIONS:
-        return key
-    
-    if language not in TRANSLATIONS[key]:
-        return TRANSLATIONS[key]["en"]  # Fallback to English
-    
-    return TRANSLATIONS[key][language] 
\ No newline at end of file
+    catalog = CATALOGS.get(language) or CATALOGS["en"]  # Fallback to English
+    return catalog.get(key, key)
+ 
\ No newline at end of file
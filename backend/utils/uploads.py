@@ -0,0 +1,301 @@
+"""
+Upload handling for ShetkarAI.
+
+Uploaded files are spooled in memory up to a configurable size and only
+written to disk when persistence is explicitly enabled. Persisted files
+are kept in check by a background retention sweeper.
+
+Each uploaded file is checked while it arrives: its first bytes must be
+a PNG, JPEG or GIF signature (or a zip archive's, for .zip files), its
+dimensions are read from the image header against
+Config.UPLOAD_MAX_PIXELS, and it may not exceed
+Config.UPLOAD_MAX_IMAGE_BYTES. The first failed check aborts the request
+with 415 or 413 before the rest of the body is read, except on views
+marked with per_file_upload_errors (the batch routes): there the
+rejected file's data is dropped as it arrives and the reason is left on
+its stream for the view to report alongside the other files.
+"""
+import os
+import struct
+import threading
+import time
+from tempfile import SpooledTemporaryFile
+
+from flask import Request, current_app
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge, UnsupportedMediaType
+
+from backend.utils.config import Config
+from backend.utils.metrics import metrics
+
+upload_rejections = metrics.counter(
+    'upload_rejections_total', 'Uploaded files rejected while validating, by reason', ('reason',)
+)
+
+# Leading bytes of each accepted image format, and the extension used for it
+IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif')
+)
+ZIP_SIGNATURE = b'PK\x03\x04'
+SIGNATURE_BYTES = 8
+
+# JPEG start-of-frame markers, which carry the dimensions
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# Bytes of a file searched for its dimensions while it streams in; a
+# JPEG whose frame header comes later is checked once fully received
+HEADER_SCAN_BYTES = 256 * 1024
+
+def sniff_image(head):
+    """Return the extension for the image format head starts with, or None"""
+    for signature, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    return None
+
+def image_dimensions(head, extension):
+    """
+    Read (width, height) from the header of a PNG, JPEG or GIF image.
+
+    Args:
+        head (bytes): The start of the file
+        extension (str): Its format, as returned by sniff_image
+
+    Returns:
+        tuple: (width, height), or None if head ends before the dimensions
+
+    Raises:
+        ValueError: If the header is malformed
+    """
+    if extension == 'png':
+        if len(head) < 24:
+            return None
+        if head[12:16] != b'IHDR':
+            raise ValueError("PNG header lacks IHDR")
+        return struct.unpack('>II', head[16:24])
+    if extension == 'gif':
+        return struct.unpack('<HH', head[6:10]) if len(head) >= 10 else None
+
+    # JPEG: walk the marker segments up to the frame header
+    offset = 2
+    while True:
+        if len(head) < offset + 4:
+            return None
+        if head[offset] != 0xFF:
+            raise ValueError("JPEG marker expected")
+        marker = head[offset + 1]
+        if marker == 0xFF:
+            # Fill byte
+            offset += 1
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            if len(head) < offset + 9:
+                return None
+            height, width = struct.unpack('>HH', head[offset + 5:offset + 9])
+            return width, height
+        if marker in (0xD9, 0xDA):
+            raise ValueError("JPEG has no frame header")
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            # Markers without a length
+            offset += 2
+            continue
+        offset += 2 + struct.unpack('>H', head[offset + 2:offset + 4])[0]
+
+def _reject(reason, error):
+    upload_rejections.labels(reason).inc()
+    return error
+
+def check_image(data):
+    """
+    Check that data is an image of an accepted format and size.
+
+    Returns:
+        str: The extension of its format
+
+    Raises:
+        UnsupportedMediaType: If data isn't a PNG, JPEG or GIF image
+        RequestEntityTooLarge: If the image is over the byte or pixel limit
+    """
+    extension = sniff_image(data[:SIGNATURE_BYTES])
+    if extension is None:
+        raise _reject('not_image', UnsupportedMediaType("File is not a PNG, JPEG or GIF image"))
+    if len(data) > Config.UPLOAD_MAX_IMAGE_BYTES:
+        raise _reject('too_large', RequestEntityTooLarge("Image is too large"))
+    try:
+        dimensions = image_dimensions(data, extension)
+    except (ValueError, struct.error):
+        dimensions = None
+    if dimensions is None:
+        raise _reject('malformed', UnsupportedMediaType("Image header is damaged"))
+    _check_pixels(dimensions)
+    return extension
+
+def _check_pixels(dimensions):
+    width, height = dimensions
+    if width * height > Config.UPLOAD_MAX_PIXELS:
+        raise _reject('too_many_pixels', RequestEntityTooLarge(
+            f"Image is too large ({width}x{height} pixels)"))
+
+class ValidatedUpload(SpooledTemporaryFile):
+    """
+    Spooled file for one uploaded file that checks the data as the form
+    parser writes it, raising as soon as it is known to be unacceptable.
+
+    Args:
+        filename (str): Name the client gave the file; .zip files are
+            only checked to be zip archives and aren't capped per file
+        collect_errors (bool): Instead of raising, keep the reason in
+            error and drop the rest of the file
+    """
+
+    def __init__(self, filename=None, collect_errors=False):
+        super().__init__(max_size=Config.UPLOAD_SPOOL_THRESHOLD, mode='rb+')
+        self.is_archive = bool(filename) and filename.lower().endswith('.zip')
+        self.collect_errors = collect_errors
+        self.error = None
+        self.size = 0
+        self.extension = None
+        self.dimensions = None
+        # Start of the file, kept until the checks that need it are done
+        self._head = b''
+
+    def write(self, data):
+        if self.error is not None:
+            return len(data)
+        try:
+            self.size += len(data)
+            if not self.is_archive and self.size > Config.UPLOAD_MAX_IMAGE_BYTES:
+                raise _reject('too_large', RequestEntityTooLarge("Image is too large"))
+            if self._head is not None:
+                self._head += data
+                self._check_head()
+        except HTTPException as e:
+            if not self.collect_errors:
+                raise
+            self.error = e.description
+            self._head = None
+            self.seek(0)
+            self.truncate()
+            return len(data)
+        return super().write(data)
+
+    def _check_head(self):
+        head = self._head
+        if len(head) < SIGNATURE_BYTES:
+            return
+        if self.is_archive:
+            if not head.startswith(ZIP_SIGNATURE):
+                raise _reject('not_image', UnsupportedMediaType("File is not a zip archive"))
+            self._head = None
+            return
+        if self.extension is None:
+            self.extension = sniff_image(head)
+            if self.extension is None:
+                raise _reject('not_image', UnsupportedMediaType("File is not a PNG, JPEG or GIF image"))
+        try:
+            self.dimensions = image_dimensions(head, self.extension)
+        except (ValueError, struct.error):
+            raise _reject('malformed', UnsupportedMediaType("Image header is damaged")) from None
+        if self.dimensions is not None:
+            _check_pixels(self.dimensions)
+            self._head = None
+        elif len(head) >= HEADER_SCAN_BYTES:
+            self._head = None
+
+class SpooledUploadRequest(Request):
+    """
+    Request class that keeps uploads in memory below UPLOAD_SPOOL_THRESHOLD
+    and validates them while they arrive
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None,
+                         content_length=None):
+        view = current_app.view_functions.get(self.endpoint) if self.endpoint else None
+        return ValidatedUpload(filename, getattr(view, 'per_file_upload_errors', False))
+
+def per_file_upload_errors(view):
+    """
+    Mark a view that reports rejected uploaded files one by one (see
+    upload_error) instead of having the whole request fail
+    """
+    view.per_file_upload_errors = True
+    return view
+
+def upload_error(file):
+    """Why an uploaded file was rejected while it arrived, or None"""
+    return getattr(file.stream, 'error', None)
+
+def sweep_uploads(folder=None, max_age=None, max_bytes=None):
+    """
+    Delete old uploads and trim the folder to a total size.
+
+    Files older than max_age are removed first, then the oldest remaining
+    files until the folder is under max_bytes.
+
+    Args:
+        folder (str): Upload folder; defaults to Config.UPLOAD_FOLDER
+        max_age (float): Maximum file age in seconds
+        max_bytes (int): Maximum total size of the folder in bytes
+
+    Returns:
+        int: Number of files removed
+    """
+    folder = folder or Config.UPLOAD_FOLDER
+    max_age = Config.UPLOAD_RETENTION_MAX_AGE if max_age is None else max_age
+    max_bytes = Config.UPLOAD_RETENTION_MAX_BYTES if max_bytes is None else max_bytes
+
+    try:
+        entries = [entry for entry in os.scandir(folder)
+                   if entry.is_file() and not entry.name.startswith('.')]
+    except FileNotFoundError:
+        return 0
+
+    files = []
+    for entry in entries:
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, entry.path))
+    files.sort()
+
+    now = time.time()
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for mtime, size, path in files:
+        if now - mtime <= max_age and total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        total -= size
+
+    return removed
+
+_sweeper = None
+_sweeper_pid = None
+_sweeper_lock = threading.Lock()
+
+def _sweep_forever():
+    while True:
+        try:
+            sweep_uploads()
+        except OSError as e:
+            print(f"Error sweeping uploads: {e}")
+        time.sleep(Config.UPLOAD_SWEEP_INTERVAL)
+
+def start_upload_sweeper():
+    """Start the retention sweeper thread for this process if not running"""
+    global _sweeper, _sweeper_pid
+
+    if _sweeper is not None and _sweeper_pid == os.getpid():
+        return
+
+    with _sweeper_lock:
+        if _sweeper is None or _sweeper_pid != os.getpid():
+            _sweeper = threading.Thread(target=_sweep_forever, name='upload-sweeper', daemon=True)
+            _sweeper.start()
+            _sweeper_pid = os.getpid()
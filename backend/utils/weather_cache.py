@@ -0,0 +1,150 @@
+"""
+Weather response cache for ShetkarAI.
+
+Coordinates are snapped to a grid (Config.WEATHER_GRID_STEP degrees) so
+nearby farmers share one cached observation. Concurrent misses for the
+same cell make a single upstream call, and entries past their TTL are
+still served while a background refresh runs (stale-while-revalidate).
+"""
+import math
+import threading
+import time
+
+from backend.utils.cache import make_cache
+from backend.utils.config import Config
+
+def grid_cell(lat, lon, step=None):
+    """
+    Snap coordinates to the centre of their grid cell.
+
+    Args:
+        lat: Latitude (number or numeric string)
+        lon: Longitude (number or numeric string)
+        step (float): Cell size in degrees; defaults to Config.WEATHER_GRID_STEP
+
+    Returns:
+        tuple: (lat, lon) of the cell centre
+
+    Raises:
+        ValueError: If the coordinates are not valid numbers
+    """
+    step = step or Config.WEATHER_GRID_STEP
+    lat = float(lat)
+    lon = float(lon)
+    if not (math.isfinite(lat) and math.isfinite(lon)) or abs(lat) > 90 or abs(lon) > 180:
+        raise ValueError("Latitude and longitude are out of range")
+
+    # Round before flooring so e.g. 73.85 / 0.05 lands in cell 1477, not 1476.
+    # The poles belong to the cells next to them, or their centres would
+    # be past 90 degrees
+    last_row = math.ceil(round(90 / step, 9)) - 1
+    row = min(max(math.floor(round(lat / step, 9)), -last_row - 1), last_row)
+    lat = min(max((row + 0.5) * step, -90.0), 90.0)
+    # 180 and -180 are the same meridian; centres past it wrap around
+    if lon == 180:
+        lon = -180.0
+    lon = (math.floor(round(lon / step, 9)) + 0.5) * step
+    lon = (lon + 180) % 360 - 180
+    return round(lat, 4), round(lon, 4)
+
+class WeatherCache:
+    """
+    Grid-bucketed weather cache with single-flight and stale-while-revalidate.
+
+    Args:
+        fetch (callable): fetch(lat, lon) returning weather data or None
+        ttl (float): Seconds an observation is served as fresh
+        stale_ttl (float): Further seconds it may be served while refreshing
+        maxsize (int): Maximum number of cached cells
+    """
+
+    def __init__(self, fetch, ttl=600, stale_ttl=1800, maxsize=5000):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._cache = make_cache('weather', maxsize=maxsize, ttl=ttl + stale_ttl)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.fresh_hits = 0
+        self.stale_hits = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+        self.upstream_errors = 0
+
+    def get(self, lat, lon):
+        """
+        Return weather data for the grid cell containing lat/lon.
+
+        Returns:
+            dict: Weather data, or None if it could not be fetched
+
+        Raises:
+            ValueError: If the coordinates are invalid
+        """
+        cell = grid_cell(lat, lon)
+        key = f"{cell[0]},{cell[1]}"
+        self.requests += 1
+
+        entry = self._cache.get(key)
+        if entry is not None:
+            age = time.time() - entry['fetched_at']
+            if age < self.ttl:
+                self.fresh_hits += 1
+                return entry['data']
+            # Serve the stale observation and refresh it in the background
+            self.stale_hits += 1
+            self._refresh(key, cell, wait=False)
+            return entry['data']
+
+        return self._refresh(key, cell, wait=True)
+
+    def _refresh(self, key, cell, wait):
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = {"done": threading.Event(), "data": None}
+            elif wait:
+                self.coalesced += 1
+
+        if not leader:
+            if wait:
+                # The leader's fetch is bounded by the HTTP timeouts
+                flight["done"].wait()
+                return flight["data"]
+            return None
+
+        if wait:
+            return self._fetch(key, cell, flight)
+        threading.Thread(target=self._fetch, args=(key, cell, flight), daemon=True).start()
+        return None
+
+    def _fetch(self, key, cell, flight):
+        try:
+            self.upstream_calls += 1
+            data = self.fetch(*cell)
+            if data is not None:
+                self._cache.set(key, {"data": data, "fetched_at": time.time()})
+            else:
+                self.upstream_errors += 1
+            flight["data"] = data
+            return data
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight["done"].set()
+
+    def stats(self):
+        """Return hit counters and the share of requests that skipped the upstream"""
+        saved = self.requests - self.upstream_calls
+        return {
+            "requests": self.requests,
+            "fresh_hits": self.fresh_hits,
+            "stale_hits": self.stale_hits,
+            "coalesced": self.coalesced,
+            "upstream_calls": self.upstream_calls,
+            "upstream_errors": self.upstream_errors,
+            "upstream_calls_saved": max(saved, 0),
+            "savings_ratio": round(saved / self.requests, 3) if self.requests else 0.0
+        }
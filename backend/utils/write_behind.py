@@ -0,0 +1,193 @@
+"""
+Background write-behind queue for ShetkarAI.
+
+Updates are accepted immediately, coalesced per key (only the latest
+value is written) and flushed from a worker thread in batches, either
+when the batch size is reached or every flush interval.
+"""
+import atexit
+import os
+import random
+import threading
+import time
+
+class WriteBehindQueue:
+    """
+    Coalescing write-behind queue.
+
+    Args:
+        flush (callable): Called with a dict of {key: value} to persist;
+            it should raise on failure so the batch is retried
+        interval (float): Seconds between flushes of a partial batch
+        batch_size (int): Number of pending keys that triggers a flush
+        max_retries (int): Retries per batch before it is dropped
+        backoff (float): Base delay in seconds for exponential backoff
+        name (str): Name used in log messages
+        on_failure (callable): Called with a dict of {key: value} that was
+            dropped, after its retries or because it was still unwritten at
+            shutdown, e.g. to evict values cached ahead of the write
+    """
+
+    def __init__(self, flush, interval=2.0, batch_size=50, max_retries=5,
+                 backoff=0.5, name='write-behind', on_failure=None):
+        self.flush = flush
+        self.on_failure = on_failure
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.name = name
+        self._reset()
+
+        if hasattr(os, 'register_at_fork'):
+            # Pending writes belong to the parent; a forked worker starts empty
+            os.register_at_fork(after_in_child=self._reset)
+        atexit.register(self.close)
+
+    def _reset(self):
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self._flush_requested = False
+        self._in_flight = 0
+        self._writing = []
+        self.queued = 0
+        self.coalesced = 0
+        self.written = 0
+        self.failed = 0
+        self.retries = 0
+
+    def put(self, key, value):
+        """Queue value to be written for key, replacing any pending value"""
+        with self._cond:
+            if key in self._pending:
+                # Re-insert so the key moves to the back of the queue
+                del self._pending[key]
+                self.coalesced += 1
+            self._pending[key] = value
+            self.queued += 1
+
+            if self._closed:
+                # Shutting down: nobody is left to flush, write inline
+                batch = self._take_batch()
+            else:
+                batch = None
+                self._ensure_worker()
+                if len(self._pending) >= self.batch_size:
+                    self._cond.notify()
+
+        if batch:
+            self._write(batch)
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _take_batch(self):
+        keys = list(self._pending)[:self.batch_size]
+        batch = {key: self._pending.pop(key) for key in keys}
+        self._in_flight += len(batch)
+        self._writing.append(batch)
+        return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: (self._closed or self._flush_requested
+                             or len(self._pending) >= self.batch_size),
+                    timeout=self.interval
+                )
+                if self._closed and not self._pending:
+                    return
+                batch = self._take_batch()
+                self._flush_requested = bool(self._pending)
+
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.flush(batch)
+                self.written += len(batch)
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    with self._cond:
+                        # close() may have given up on it and reported it already
+                        reported = not any(other is batch for other in self._writing)
+                    if not reported:
+                        print(f"{self.name}: dropping {len(batch)} updates after {attempt + 1} attempts: {e}")
+                        self._dropped(batch)
+                    break
+                self.retries += 1
+                # Exponential backoff with jitter, capped at 30 seconds
+                delay = min(self.backoff * (2 ** attempt), 30) * random.uniform(0.5, 1.5)
+                time.sleep(delay)
+
+        with self._cond:
+            self._in_flight -= len(batch)
+            self._writing = [other for other in self._writing if other is not batch]
+            self._cond.notify_all()
+
+    def _dropped(self, batch):
+        self.failed += len(batch)
+        if self.on_failure is not None:
+            try:
+                self.on_failure(batch)
+            except Exception as e:
+                print(f"{self.name}: error handling {len(batch)} dropped updates: {e}")
+
+    def drain(self, timeout=None):
+        """
+        Wait until everything queued so far has been written or dropped.
+
+        Returns:
+            bool: True if the queue drained before the timeout
+        """
+        with self._cond:
+            if self._pending:
+                self._ensure_worker()
+                self._flush_requested = True
+                self._cond.notify_all()
+            return self._cond.wait_for(
+                lambda: not self._pending and not self._in_flight,
+                timeout=timeout
+            )
+
+    def close(self, timeout=10):
+        """Flush pending writes and stop the worker thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+            if thread.is_alive():
+                # Out of time: what is still queued or being retried is lost
+                with self._cond:
+                    unwritten = {}
+                    for batch in self._writing:
+                        unwritten.update(batch)
+                    unwritten.update(self._pending)
+                    self._writing = []
+                    self._pending = {}
+                if unwritten:
+                    print(f"{self.name}: dropping {len(unwritten)} unwritten updates at shutdown")
+                    self._dropped(unwritten)
+
+    def stats(self):
+        """Return the queue counters as a dict"""
+        return {
+            "pending": len(self._pending),
+            "in_flight": self._in_flight,
+            "queued": self.queued,
+            "coalesced": self.coalesced,
+            "written": self.written,
+            "failed": self.failed,
+            "retries": self.retries
+        }
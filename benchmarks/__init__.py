@@ -0,0 +1 @@
+"""Benchmarks and local stand-in servers for the ShetkarAI backend"""
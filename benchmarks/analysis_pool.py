@@ -0,0 +1,136 @@
+"""
+Effect of the analysis process pool on a threaded gunicorn worker.
+
+Runs one gunicorn worker with several threads and a synthetic disease
+model, posts phone-sized photos to /api/detect-disease from concurrent
+clients, and meanwhile measures /api/health latency as a stand-in for the
+light requests that share the worker. Compares inline analysis with
+ANALYSIS_WORKERS pool processes.
+
+Usage:
+    python -m benchmarks.analysis_pool [--uploads 60] [--concurrency 6] [--pool-workers 2]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from benchmarks.preprocess_images import make_corpus
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def write_synthetic_model(model_path, hidden=512, num_classes=5):
+    """Write a disease.npz the registry can load: 4x pooling and two dense layers"""
+    rng = np.random.default_rng(0)
+    np.savez(
+        os.path.join(model_path, 'disease.npz'),
+        pool=4,
+        w0=rng.standard_normal((56 * 56 * 3, hidden), dtype=np.float32) * 0.01,
+        b0=np.zeros(hidden, dtype=np.float32),
+        w1=rng.standard_normal((hidden, num_classes), dtype=np.float32) * 0.1,
+        b1=np.zeros(num_classes, dtype=np.float32)
+    )
+
+def _start_gunicorn(port, env):
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--workers', '1', '--bind', f'127.0.0.1:{port}',
+         '--log-level', 'warning', 'app:app'],
+        cwd=ROOT, env=env
+    )
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url + '/api/health', timeout=1)
+            return process, url
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("gunicorn did not start")
+
+def _run(label, url, corpus, uploads, concurrency):
+    health_latencies = []
+    stop = threading.Event()
+
+    def probe():
+        while not stop.is_set():
+            start = time.perf_counter()
+            requests.get(url + '/api/health', timeout=60)
+            health_latencies.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.02)
+
+    def upload(i):
+        # Vary one byte so the result cache never answers
+        data = corpus[i % len(corpus)] + i.to_bytes(4, 'big')
+        response = requests.post(url + '/api/detect-disease', files={
+            'image': (f'leaf{i}.jpg', data, 'image/jpeg')
+        }, timeout=120)
+        return response.status_code
+
+    prober = threading.Thread(target=probe, daemon=True)
+    prober.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        statuses = list(pool.map(upload, range(uploads)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    prober.join()
+
+    health_latencies.sort()
+    p95 = health_latencies[int(len(health_latencies) * 0.95) - 1]
+    print(f"{label:<10} {statuses.count(200) / elapsed:6.1f} analyses/s   "
+          f"503s {statuses.count(503):3d}   /api/health p50 "
+          f"{statistics.median(health_latencies):7.1f} ms   p95 {p95:7.1f} ms")
+
+def _stage_means(url):
+    # Mean ms per "kind.stage", from the stage histograms on /metrics
+    sums, counts = {}, {}
+    prefix = 'shetkar_analysis_stage_duration_seconds_'
+    for line in requests.get(url + '/metrics').text.splitlines():
+        if not line.startswith(prefix):
+            continue
+        name, value = line.rsplit(' ', 1)
+        suffix, _, labels = name[len(prefix):].partition('{')
+        labels = dict(part.split('=', 1) for part in labels.rstrip('}').replace('"', '').split(','))
+        stage = f"{labels['kind']}.{labels['stage']}"
+        if suffix == 'sum':
+            sums[stage] = float(value) * 1000
+        elif suffix == 'count':
+            counts[stage] = float(value)
+    return {stage: total / max(counts.get(stage, 0), 1) for stage, total in sums.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--uploads', type=int, default=60)
+    parser.add_argument('--concurrency', type=int, default=6)
+    parser.add_argument('--pool-workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    corpus = make_corpus(10)
+    with tempfile.TemporaryDirectory() as model_path:
+        write_synthetic_model(model_path)
+        env = dict(os.environ, MODEL_PATH=model_path, GUNICORN_THREADS=str(args.threads),
+                   GUNICORN_TIMEOUT='120')
+
+        for port, label, workers in ((8767, 'inline', 0), (8768, 'pool', args.pool_workers)):
+            process, url = _start_gunicorn(port, dict(env, ANALYSIS_WORKERS=str(workers)))
+            try:
+                _run(label, url, corpus, args.uploads, args.concurrency)
+                means = _stage_means(url)
+                print('           mean stage ms: ' +
+                      ', '.join(f"{stage} {value:.1f}" for stage, value in means.items()))
+            finally:
+                process.terminate()
+                process.wait()
+
+if __name__ == '__main__':
+    main()
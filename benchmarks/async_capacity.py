@@ -0,0 +1,109 @@
+"""
+Capacity of one gunicorn worker on the upstream-bound routes, sync vs gevent.
+
+Starts the app under gunicorn (using gunicorn.conf.py) against local
+Supabase and weather stand-ins that add a fixed latency, then drives
+POST /login and GET /api/weather with concurrent clients. Weather
+coordinates differ per request so the weather cache never answers.
+
+Usage:
+    python -m benchmarks.async_capacity [--latency 0.1] [--concurrency 50] [--requests 200]
+"""
+import argparse
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.fake_supabase import FAKE_KEY, start_fake_supabase
+from benchmarks.fake_weather import start_fake_weather
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _start_gunicorn(worker_class, port, env):
+    env = dict(env, GUNICORN_WORKER_CLASS=worker_class)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--workers', '1', '--bind', f'127.0.0.1:{port}',
+         '--log-level', 'warning', 'app:app'],
+        cwd=ROOT, env=env
+    )
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url + '/api/health', timeout=1)
+            return process, url
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"gunicorn ({worker_class}) did not start")
+
+def _login(url, i):
+    # A fresh session per call, as separate farmers logging in would be
+    response = requests.post(url + '/login', data={
+        "email": f"farmer{i}@example.com", "password": "secret"
+    }, allow_redirects=False, timeout=60)
+    return response.status_code == 302 and 'dashboard' in response.headers.get('Location', '')
+
+def _weather(url, i):
+    response = requests.get(url + '/api/weather', params={
+        "lat": round(random.uniform(-60, 60), 3), "lon": round(random.uniform(-170, 170), 3)
+    }, timeout=60)
+    return response.status_code == 200
+
+def _run(label, call, url, total, concurrency):
+    def timed(i):
+        start = time.perf_counter()
+        ok = call(url, i)
+        return ok, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for _, latency in results)
+    ok = sum(1 for success, _ in results if success)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:<18} {total / elapsed:8.1f} req/s   p50 {statistics.median(latencies):7.1f} ms   "
+          f"p95 {p95:7.1f} ms   ok {ok}/{total}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--latency', type=float, default=0.1,
+                        help='simulated upstream latency in seconds')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    supabase = start_fake_supabase(latency=args.latency)
+    weather = start_fake_weather(latency=args.latency)
+    env = dict(
+        os.environ,
+        SUPABASE_URL=supabase.url,
+        SUPABASE_KEY=FAKE_KEY,
+        WEATHER_API_URL=weather.url,
+        WEATHER_API_KEY='fake',
+        SUPABASE_POOL_MAXSIZE=str(args.concurrency),
+        SUPABASE_POOL_KEEPALIVE=str(args.concurrency),
+        HTTP_POOL_SIZE=str(args.concurrency),
+        GUNICORN_WORKER_CONNECTIONS=str(args.concurrency),
+        GUNICORN_TIMEOUT='120'
+    )
+
+    for port, worker_class in ((8765, 'sync'), (8766, 'gevent')):
+        process, url = _start_gunicorn(worker_class, port, env)
+        try:
+            _run(f'{worker_class} /login', _login, url, args.requests, args.concurrency)
+            _run(f'{worker_class} /api/weather', _weather, url, args.requests, args.concurrency)
+        finally:
+            process.terminate()
+            process.wait()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Cost of authenticating a request: local token verification vs asking
+Supabase, against a local Supabase stand-in.
+
+Checks the same access token with TokenVerifier.verify (signature and
+claims, no network) and with the Supabase client's get_user call (one
+round trip to /auth/v1/user), as a protected route would otherwise
+have to.
+
+Usage:
+    python -m benchmarks.auth_latency [--requests 500] [--latency 0.03]
+"""
+import argparse
+import statistics
+import time
+
+from backend.utils import supabase as supabase_utils
+from backend.utils.auth import TokenVerifier
+from backend.utils.config import Config
+from benchmarks.fake_supabase import FAKE_JWT_SECRET, FAKE_KEY, start_fake_supabase
+
+def _run(label, check, requests):
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        check()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:<18} p50 {statistics.median(latencies):8.3f} ms   p95 {p95:8.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.03,
+                        help='simulated Supabase latency in seconds')
+    args = parser.parse_args()
+
+    server = start_fake_supabase(latency=args.latency)
+    Config.SUPABASE_URL = server.url
+    Config.SUPABASE_KEY = FAKE_KEY
+    supabase_utils.reset_supabase_client()
+    client = supabase_utils.get_supabase_client()
+    token = supabase_utils.login_user("farmer@example.com", "secret").session.access_token
+
+    verifier = TokenVerifier(secret=FAKE_JWT_SECRET, issuer=server.url + '/auth/v1')
+    _run('local verify', lambda: verifier.verify(token), args.requests)
+    _run('supabase get_user', lambda: client.auth.get_user(token), args.requests)
+
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
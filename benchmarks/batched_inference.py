@@ -0,0 +1,73 @@
+"""
+Load test comparing micro-batched and per-request inference.
+
+Uses a small synthetic CPU classifier (pooling plus two dense layers)
+in place of a real model, driven by concurrent client threads the way
+threaded gunicorn workers would call predict_disease.
+
+Usage:
+    python -m benchmarks.batched_inference [--requests 2000] [--threads 16]
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from backend.models.batching import MicroBatcher
+from backend.utils.helpers import image_tensor_shape
+
+class SyntheticClassifier:
+    """Pool 224x224 inputs to 56x56, then two dense layers and softmax"""
+
+    def __init__(self, num_classes=5, hidden=512, seed=0):
+        rng = np.random.default_rng(seed)
+        self.w1 = rng.standard_normal((56 * 56 * 3, hidden), dtype=np.float32) * 0.01
+        self.w2 = rng.standard_normal((hidden, num_classes), dtype=np.float32) * 0.1
+
+    def __call__(self, batch):
+        n = len(batch)
+        pooled = batch.reshape(n, 56, 4, 56, 4, 3).mean(axis=(2, 4)).reshape(n, -1)
+        hidden = np.maximum(pooled @ self.w1, 0)
+        logits = hidden @ self.w2
+        logits -= logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+def run(label, infer, requests, threads):
+    image = np.random.default_rng(1).standard_normal(image_tensor_shape(), dtype=np.float32)
+
+    def timed(_):
+        start = time.perf_counter()
+        infer(image)
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = sorted(pool.map(timed, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{label:<10} {requests / elapsed:8.1f} images/s   p50 {p50:6.2f} ms   p99 {p99:6.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--max-batch-size', type=int, default=8)
+    parser.add_argument('--max-wait-ms', type=float, default=10)
+    args = parser.parse_args()
+
+    model = SyntheticClassifier()
+    batcher = MicroBatcher(model, max_batch_size=args.max_batch_size,
+                           max_wait=args.max_wait_ms / 1000)
+
+    run('unbatched', lambda image: model(image)[0], args.requests, args.threads)
+    run('batched', batcher.predict, args.requests, args.threads)
+
+    sizes = batcher.stats()['batch_size']
+    print(f"mean batch size {sizes['sum'] / sizes['count']:.2f} over {sizes['count']} batches")
+
+if __name__ == '__main__':
+    main()
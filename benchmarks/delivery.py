@@ -0,0 +1,145 @@
+"""
+Bytes on the wire and time to first byte for the HTML pages, with and without compression.
+
+Starts the app under gunicorn twice (COMPRESSION=False, then True) and
+fetches the dashboard (as a logged-in user, plus its stylesheet), the
+login page and the language page with Accept-Encoding: gzip, br, as a
+first visit and as a repeat visit that sends the validators it got.
+The compressed run also has the static files precompressed, as the
+build step does.
+Transfer times on slow mobile links are estimated from the byte counts
+as RTT + bytes / bandwidth.
+
+Usage:
+    python -m benchmarks.delivery [--repeat 50]
+"""
+import argparse
+import gzip
+import http.client
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from backend.utils.static_assets import brotli, precompress
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SECRET_KEY = 'delivery-benchmark'
+
+# (name, round-trip time in seconds, bandwidth in bytes per second)
+LINKS = (('2G', 0.65, 35 * 1024 // 8), ('3G', 0.2, 750 * 1024 // 8))
+
+def _session_cookie():
+    from app import app
+    app.secret_key = SECRET_KEY
+    serializer = app.session_interface.get_signing_serializer(app)
+    return 'session=' + serializer.dumps({'user_id': 'bench', 'username': 'farmer', 'language': 'hi'})
+
+def _start_gunicorn(port, compression):
+    env = dict(os.environ, SECRET_KEY=SECRET_KEY, COMPRESSION=str(compression))
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--workers', '1', '--bind', f'127.0.0.1:{port}',
+         '--log-level', 'warning', 'app:app'],
+        cwd=ROOT, env=env
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            _fetch(port, '/api/health', {})
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("gunicorn did not start")
+
+def _fetch(port, path, headers):
+    """Return (status, headers, body, wire bytes, ttfb ms)"""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    start = time.perf_counter()
+    connection.request('GET', path, headers=headers)
+    response = connection.getresponse()
+    ttfb = (time.perf_counter() - start) * 1000
+    body = response.read()
+    header_bytes = sum(len(name) + len(value) + 4 for name, value in response.getheaders())
+    connection.close()
+    return response.status, dict(response.getheaders()), body, header_bytes + len(body) + 17, ttfb
+
+def _measure(port, path, headers, repeat):
+    status, response_headers, body, wire, _ = _fetch(port, path, headers)
+    ttfbs = [_fetch(port, path, headers)[4] for _ in range(repeat)]
+
+    validators = {}
+    if 'ETag' in response_headers:
+        validators['If-None-Match'] = response_headers['ETag']
+    if 'Last-Modified' in response_headers:
+        validators['If-Modified-Since'] = response_headers['Last-Modified']
+    repeat_status, _, _, repeat_wire, _ = _fetch(port, path, dict(headers, **validators))
+
+    encoding = response_headers.get('Content-Encoding', 'identity')
+    if encoding == 'gzip':
+        body = gzip.decompress(body)
+    elif encoding == 'br':
+        body = brotli.decompress(body)
+    return {
+        "status": status,
+        "encoding": encoding,
+        "wire": wire,
+        "ttfb": statistics.median(ttfbs),
+        "repeat_status": repeat_status,
+        "repeat_wire": repeat_wire,
+        "cacheable": 'immutable' in response_headers.get('Cache-Control', ''),
+        "body": body
+    }
+
+def _run(label, port, cookie, repeat):
+    accept = {'Accept-Encoding': 'gzip, br'}
+    dashboard = _measure(port, '/dashboard', dict(accept, Cookie=cookie), repeat)
+    pages = [('/dashboard', dashboard)]
+    stylesheet = re.search(rb'href="([^"]+\.css)"', dashboard['body'])
+    if stylesheet:
+        path = stylesheet.group(1).decode()
+        pages.append((path.rsplit('/', 1)[-1], _measure(port, path, accept, repeat)))
+    pages.append(('/login', _measure(port, '/login', accept, repeat)))
+    pages.append(('/language', _measure(port, '/language', accept, repeat)))
+
+    print(label)
+    for name, result in pages:
+        # A repeat visit to an immutable asset is answered by the browser cache
+        repeat_wire = 0 if result['cacheable'] else result['repeat_wire']
+        estimates = '   '.join(
+            f"{link} {(rtt + result['wire'] / bandwidth) * 1000:6.0f} ms"
+            for link, rtt, bandwidth in LINKS
+        )
+        print(f"  {name:<16} {result['encoding']:<8} {result['wire']:6d} B   "
+              f"ttfb p50 {result['ttfb']:5.2f} ms   repeat {result['repeat_status']} "
+              f"{repeat_wire:5d} B   {estimates}")
+    first = sum(result['wire'] for name, result in pages if name not in ('/login', '/language'))
+    print(f"  dashboard first visit, page + assets: {first} B")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    cookie = _session_cookie()
+    written = []
+    try:
+        for port, compression in ((5611, False), (5612, True)):
+            if compression:
+                # As the build step does
+                written = precompress(os.path.join(ROOT, 'backend', 'static'),
+                                      exclude=[os.path.join(ROOT, 'backend', 'static', 'uploads')])
+            process = _start_gunicorn(port, compression)
+            try:
+                _run(f"COMPRESSION={compression}", port, cookie, args.repeat)
+            finally:
+                process.terminate()
+                process.wait()
+    finally:
+        for path in written:
+            os.remove(path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Local stand-in for the OpenWeatherMap current-weather endpoint, with
+injectable latency and error rates.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+class FakeWeatherHandler(BaseHTTPRequestHandler):
+    """Answers GET /data/2.5/weather?lat=..&lon=.."""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.calls += 1
+        
+        if server.latency:
+            time.sleep(server.latency)
+        
+        roll = random.random()
+        if roll < server.error_rate:
+            self._send(503, {"cod": 503, "message": "injected failure"})
+            return
+        if roll < server.error_rate + server.throttle_rate:
+            self._send(429, {"cod": 429, "message": "injected throttling"}, {'Retry-After': '0'})
+            return
+        
+        query = parse_qs(urlsplit(self.path).query)
+        lat = float(query.get('lat', ['0'])[0])
+        lon = float(query.get('lon', ['0'])[0])
+        self._send(200, {
+            "coord": {"lat": lat, "lon": lon},
+            "weather": [{"main": "Clear", "description": "clear sky"}],
+            "main": {"temp": 31.5, "humidity": 42},
+            "wind": {"speed": 3.1},
+            "name": "Fake Town"
+        })
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    """Threading server that ignores clients hanging up after a timeout"""
+    daemon_threads = True
+    
+    def handle_error(self, request, client_address):
+        pass
+
+def start_fake_weather(latency=0.0, error_rate=0.0, throttle_rate=0.0):
+    """
+    Start the fake weather server on a free local port in a daemon thread.
+    
+    Args:
+        latency (float): Seconds to sleep before each response
+        error_rate (float): Fraction of requests answered with 503
+        throttle_rate (float): Fraction of requests answered with 429
+        
+    Returns:
+        ThreadingHTTPServer: The running server; the endpoint URL is in
+        server.url, and settings can be changed on the object while it runs
+    """
+    server = QuietHTTPServer(('127.0.0.1', 0), FakeWeatherHandler)
+    server.latency = latency
+    server.error_rate = error_rate
+    server.throttle_rate = throttle_rate
+    server.calls = 0
+    server.lock = threading.Lock()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/data/2.5/weather"
+    
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,390 @@
+"""
+Load test of the whole app under gunicorn, with a JSON report.
+
+Starts app.py under gunicorn with the given worker class, worker and
+thread counts, against local Supabase and OpenWeatherMap stand-ins, and
+runs concurrent virtual users for a fixed time. Each user logs in once
+with its own session, then picks routes at random according to the mix:
+the page routes, the weather API over a fixed set of farm locations, and
+disease and soil analyses of phone-camera-sized JPEGs drawn from a small
+corpus (so repeated uploads hit the result cache, as re-uploads do).
+
+The report has throughput, p50/p95/p99 latency and status codes per
+route and overall, and the peak and final RSS of every gunicorn worker.
+With --baseline, throughput, p95 and peak RSS are compared against an
+earlier report and the exit status is 1 if any regressed by more than
+--tolerance.
+
+Usage:
+    python -m benchmarks.load_test [--workers 2] [--threads 4] [--concurrency 16]
+        [--duration 30] [--mix weather=3,detect_disease=1] [--output report.json]
+        [--baseline previous.json]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.fake_supabase import FAKE_JWT_SECRET, FAKE_KEY, start_fake_supabase
+from benchmarks.fake_weather import start_fake_weather
+from benchmarks.preprocess_images import make_corpus
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Relative weight of each route in the default mix
+DEFAULT_MIX = {
+    'language': 5,
+    'login_page': 5,
+    'login': 2,
+    'dashboard': 20,
+    'weather': 30,
+    'detect_disease': 20,
+    'analyze_soil': 18
+}
+
+# Seconds between RSS readings of the workers
+RSS_INTERVAL = 0.5
+
+def _language(session, context):
+    response = session.get(context['url'] + '/language', timeout=60)
+    return response.status_code, response.status_code == 200
+
+def _login_page(session, context):
+    response = session.get(context['url'] + '/login', timeout=60)
+    return response.status_code, response.status_code == 200
+
+def _login(session, context):
+    response = session.post(context['url'] + '/login', data={
+        "email": f"farmer{context['user']}@example.com", "password": "secret"
+    }, allow_redirects=False, timeout=60)
+    ok = response.status_code == 302 and 'dashboard' in response.headers.get('Location', '')
+    return response.status_code, ok
+
+def _dashboard(session, context):
+    response = session.get(context['url'] + '/dashboard', allow_redirects=False, timeout=60)
+    return response.status_code, response.status_code == 200
+
+def _weather(session, context):
+    lat, lon = context['rng'].choice(context['locations'])
+    response = session.get(context['url'] + '/api/weather', params={"lat": lat, "lon": lon}, timeout=60)
+    return response.status_code, response.status_code == 200
+
+def _upload(path):
+    def upload(session, context):
+        image = context['rng'].choice(context['corpus'])
+        response = session.post(context['url'] + path, files={
+            "image": ("photo.jpg", image, "image/jpeg")
+        }, timeout=120)
+        return response.status_code, response.status_code == 200
+    return upload
+
+SCENARIOS = {
+    'language': _language,
+    'login_page': _login_page,
+    'login': _login,
+    'dashboard': _dashboard,
+    'weather': _weather,
+    'detect_disease': _upload('/api/detect-disease'),
+    'analyze_soil': _upload('/api/analyze-soil')
+}
+
+def parse_mix(text):
+    """Parse 'name=weight,...' into a dict, e.g. 'weather=3,detect_disease=1'"""
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown route {name!r}; choose from {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(int(round(fraction * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+def _rss_mb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def _worker_pids(master_pid):
+    # Linux only; elsewhere the report has no RSS figures
+    pids = []
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return pids
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces; the parent pid follows it
+                parent = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if parent == master_pid:
+            pids.append(int(entry))
+    return sorted(pids)
+
+class RSSMonitor:
+    """Records the RSS of every gunicorn worker from a background thread"""
+
+    def __init__(self, master_pid, interval=RSS_INTERVAL):
+        self.master_pid = master_pid
+        self.interval = interval
+        self.peak = {}
+        self.last = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.sample()
+            self._stop.wait(self.interval)
+
+    def sample(self):
+        for pid in _worker_pids(self.master_pid):
+            rss = _rss_mb(pid)
+            if rss is not None:
+                self.last[pid] = rss
+                self.peak[pid] = max(self.peak.get(pid, 0), rss)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+    def report(self):
+        return {str(pid): {"peak_mb": round(self.peak[pid], 1), "end_mb": round(self.last[pid], 1)}
+                for pid in sorted(self.peak)}
+
+def _start_gunicorn(args, env):
+    env = dict(env, GUNICORN_WORKER_CLASS=args.worker_class, GUNICORN_THREADS=str(args.threads))
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--workers', str(args.workers),
+         '--bind', f'127.0.0.1:{args.port}', '--log-level', 'warning', 'app:app'],
+        cwd=ROOT, env=env
+    )
+    url = f'http://127.0.0.1:{args.port}'
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline and process.poll() is None:
+        try:
+            # Workers still importing the app may accept but not answer yet
+            requests.get(url + '/api/health/live', timeout=5)
+            return process, url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.kill()
+    process.wait()
+    raise RuntimeError(f"gunicorn did not start (exit status {process.returncode})")
+
+def _virtual_user(user, url, mix, corpus, locations, measure_from, deadline, seed):
+    """Log in, then request routes from the mix until the deadline"""
+    rng = random.Random(seed + user)
+    context = {'url': url, 'user': user, 'rng': rng, 'corpus': corpus, 'locations': locations}
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    results = []
+    with requests.Session() as session:
+        _login(session, context)
+        while True:
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            if start >= deadline:
+                break
+            try:
+                status, ok = SCENARIOS[name](session, context)
+            except requests.RequestException as e:
+                status, ok = type(e).__name__, False
+            end = time.perf_counter()
+            if start >= measure_from:
+                results.append((name, (end - start) * 1000, str(status), ok))
+    return results
+
+def _summarize(results, elapsed):
+    latencies = sorted(latency for _, latency, _, _ in results)
+    statuses = {}
+    for _, _, status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    ok = sum(1 for *_, success in results if success)
+    return {
+        "requests": len(results),
+        "ok": ok,
+        "errors": len(results) - ok,
+        "throughput_rps": round(len(results) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50), 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95), 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99), 2) if latencies else None,
+        "max_ms": round(latencies[-1], 2) if latencies else None,
+        "statuses": dict(sorted(statuses.items()))
+    }
+
+def run_load_test(args):
+    """Run one load test and return the report as a dict"""
+    supabase = start_fake_supabase(latency=args.upstream_latency)
+    weather = start_fake_weather(latency=args.upstream_latency)
+    connections = max(args.concurrency, 10)
+    env = dict(
+        os.environ,
+        SECRET_KEY='load-test',
+        SUPABASE_URL=supabase.url,
+        SUPABASE_KEY=FAKE_KEY,
+        SUPABASE_JWT_SECRET=FAKE_JWT_SECRET,
+        WEATHER_API_URL=weather.url,
+        WEATHER_API_KEY='fake',
+        SUPABASE_POOL_MAXSIZE=str(connections),
+        SUPABASE_POOL_KEEPALIVE=str(connections),
+        HTTP_POOL_SIZE=str(connections),
+        GUNICORN_WORKER_CONNECTIONS=str(connections),
+        GUNICORN_TIMEOUT='120',
+        # Every virtual user shares one IP; set RATE_LIMITING=true to measure the limiter
+        RATE_LIMITING=os.environ.get('RATE_LIMITING', 'false')
+    )
+
+    rng = random.Random(args.seed)
+    locations = [(round(rng.uniform(8, 35), 2), round(rng.uniform(68, 97), 2))
+                 for _ in range(args.locations)]
+    corpus = make_corpus(args.images, seed=args.seed)
+
+    process, url = _start_gunicorn(args, env)
+    monitor = RSSMonitor(process.pid)
+    try:
+        monitor.start()
+        started = time.perf_counter()
+        measure_from = started + args.warmup
+        deadline = measure_from + args.duration
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            futures = [pool.submit(_virtual_user, user, url, args.mix, corpus, locations,
+                                   measure_from, deadline, args.seed)
+                       for user in range(args.concurrency)]
+            results = [result for future in futures for result in future.result()]
+        elapsed = time.perf_counter() - measure_from
+    finally:
+        monitor.stop()
+        process.terminate()
+        process.wait()
+        supabase.shutdown()
+        weather.shutdown()
+
+    routes = {}
+    for name in args.mix:
+        routes[name] = _summarize([result for result in results if result[0] == name], elapsed)
+    return {
+        "config": {
+            "worker_class": args.worker_class,
+            "workers": args.workers,
+            "threads": args.threads,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "upstream_latency_s": args.upstream_latency,
+            "images": args.images,
+            "locations": args.locations,
+            "mix": args.mix,
+            "seed": args.seed
+        },
+        "overall": _summarize(results, elapsed),
+        "routes": routes,
+        "workers_rss": monitor.report()
+    }
+
+def compare(report, baseline, tolerance):
+    """
+    Compare a report with a baseline report.
+
+    Returns:
+        list: One message per metric that got worse by more than tolerance
+    """
+    regressions = []
+    pairs = [('overall', report['overall'], baseline.get('overall', {}))]
+    pairs += [(name, route, baseline.get('routes', {}).get(name, {}))
+              for name, route in report['routes'].items()]
+    for name, current, previous in pairs:
+        if current.get('throughput_rps') and previous.get('throughput_rps'):
+            if current['throughput_rps'] < previous['throughput_rps'] * (1 - tolerance):
+                regressions.append(f"{name}: throughput {previous['throughput_rps']} -> "
+                                   f"{current['throughput_rps']} req/s")
+        if current.get('p95_ms') and previous.get('p95_ms'):
+            if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+                regressions.append(f"{name}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+
+    peak = max((worker['peak_mb'] for worker in report['workers_rss'].values()), default=None)
+    previous_peak = max((worker['peak_mb'] for worker in baseline.get('workers_rss', {}).values()),
+                        default=None)
+    if peak and previous_peak and peak > previous_peak * (1 + tolerance):
+        regressions.append(f"worker RSS: peak {previous_peak} -> {peak} MB")
+    return regressions
+
+def _print_table(report):
+    print(f"{'route':<16} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}   ok")
+    rows = list(report['routes'].items()) + [('overall', report['overall'])]
+    for name, summary in rows:
+        if not summary['requests']:
+            print(f"{name:<16} {'-':>8}")
+            continue
+        print(f"{name:<16} {summary['throughput_rps']:8.1f} {summary['p50_ms']:9.1f} "
+              f"{summary['p95_ms']:9.1f} {summary['p99_ms']:9.1f}   {summary['ok']}/{summary['requests']}")
+    for pid, rss in report['workers_rss'].items():
+        print(f"worker {pid}: peak {rss['peak_mb']:.1f} MB, end {rss['end_mb']:.1f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--worker-class', default='sync', choices=('sync', 'gthread', 'gevent'))
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=16, help='virtual users')
+    parser.add_argument('--duration', type=float, default=30, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=5, help='unmeasured seconds first')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help='route weights, e.g. weather=3,detect_disease=1')
+    parser.add_argument('--images', type=int, default=10, help='distinct photos uploaded')
+    parser.add_argument('--locations', type=int, default=50, help='distinct weather locations')
+    parser.add_argument('--upstream-latency', type=float, default=0.05,
+                        help='simulated Supabase and weather latency in seconds')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--port', type=int, default=8780)
+    parser.add_argument('--output', help="write the JSON report to this file ('-' for stdout)")
+    parser.add_argument('--baseline', help='JSON report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='allowed relative regression against the baseline')
+    args = parser.parse_args()
+
+    report = run_load_test(args)
+    if args.output == '-':
+        print(json.dumps(report, indent=2))
+    else:
+        _print_table(report)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
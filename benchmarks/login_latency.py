@@ -0,0 +1,75 @@
+"""
+Login latency benchmark against a local Supabase stand-in.
+
+Runs the same calls as the /login route (login_user followed by
+get_user_profile) with the pooled per-worker client and with a fresh
+client per call, as the code did before.
+
+Usage:
+    python -m benchmarks.login_latency [--requests 200] [--threads 8]
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from supabase import create_client
+from supabase.lib.client_options import ClientOptions
+
+from backend.utils import supabase as supabase_utils
+from backend.utils.config import Config
+from benchmarks.fake_supabase import FAKE_KEY, start_fake_supabase
+
+def _fresh_client():
+    # Refresh timers are disabled so the benchmark process can exit
+    options = ClientOptions(auto_refresh_token=False, persist_session=False)
+    return create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY, options)
+
+def _login_with_fresh_clients(email):
+    """The previous behaviour: one new client per Supabase call"""
+    client = _fresh_client()
+    response = client.auth.sign_in_with_password({"email": email, "password": "secret"})
+    client = _fresh_client()
+    client.table("profiles").select("*").eq("id", response.user.id).execute()
+
+def _login_with_pooled_client(email):
+    response = supabase_utils.login_user(email, "secret")
+    supabase_utils.get_user_profile(response.user.id)
+
+def _run(label, login, requests, threads):
+    def timed(i):
+        start = time.perf_counter()
+        login(f"farmer{i}@example.com")
+        return (time.perf_counter() - start) * 1000
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = sorted(pool.map(timed, range(requests)))
+    elapsed = time.perf_counter() - start
+    
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:<14} {requests / elapsed:8.1f} logins/s   "
+          f"p50 {statistics.median(latencies):6.2f} ms   p95 {p95:6.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='simulated server latency in seconds')
+    args = parser.parse_args()
+    
+    server = start_fake_supabase(latency=args.latency)
+    Config.SUPABASE_URL = server.url
+    Config.SUPABASE_KEY = FAKE_KEY
+    supabase_utils.reset_supabase_client()
+    
+    _run('fresh client', _login_with_fresh_clients, args.requests, args.threads)
+    server.connections.clear()
+    _run('pooled client', _login_with_pooled_client, args.requests, args.threads)
+    print(f"pooled client used {len(server.connections)} TCP connections")
+    
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
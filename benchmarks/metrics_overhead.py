@@ -0,0 +1,65 @@
+"""
+Per-request cost of the request metrics, and the cost of a /metrics scrape.
+
+Serves a trivial route from two otherwise identical Flask apps, one with
+init_metrics() and one without, through the WSGI test client, and
+reports the difference in time per request. The scrape is timed on the
+real app after some traffic, so every metric family has samples.
+
+Usage:
+    python -m benchmarks.metrics_overhead [--requests 5000]
+"""
+import argparse
+import time
+
+from flask import Flask
+
+from backend.utils.metrics import init_metrics
+
+def _trivial_app(instrumented):
+    app = Flask(__name__)
+
+    @app.route('/ping/<int:n>')
+    def ping(n):
+        return 'pong'
+
+    if instrumented:
+        init_metrics(app)
+    return app
+
+def _per_request_us(apps, count, repeat=7):
+    """Best time per request for each app, alternating between them to even out noise"""
+    clients = [app.test_client() for app in apps]
+    best = [float('inf')] * len(clients)
+    for _ in range(repeat):
+        for index, client in enumerate(clients):
+            start = time.perf_counter()
+            for i in range(count):
+                client.get(f'/ping/{i}').close()
+            best[index] = min(best[index], time.perf_counter() - start)
+    return [seconds / count * 1e6 for seconds in best]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+
+    plain, instrumented = _per_request_us([_trivial_app(False), _trivial_app(True)], args.requests)
+    print(f"request without metrics {plain:7.1f} us")
+    print(f"request with metrics    {instrumented:7.1f} us   overhead {instrumented - plain:5.1f} us")
+
+    from app import app
+    client = app.test_client()
+    for path in ('/language', '/api/health', '/missing'):
+        for _ in range(50):
+            client.get(path).close()
+    response = client.get('/metrics')
+    size = len(response.data)
+    response.close()
+    start = time.perf_counter()
+    for _ in range(200):
+        client.get('/metrics').close()
+    print(f"/metrics scrape         {(time.perf_counter() - start) / 200 * 1000:7.2f} ms   {size} B")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Image preprocessing benchmark over phone-camera-sized JPEGs.
+
+Compares preprocess_image (draft-mode decode, in-place normalisation)
+with a straightforward full decode, resize and astype pipeline. Each
+mode runs in its own process so peak RSS is measured separately.
+
+Usage:
+    python -m benchmarks.preprocess_images [--images 40]
+"""
+import argparse
+import io
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from backend.utils.helpers import image_tensor_shape, preprocess_image
+
+# Common phone camera resolutions (width, height)
+PHONE_SIZES = [(4032, 3024), (4000, 3000), (3264, 2448), (1920, 1080), (1600, 1200)]
+
+def make_corpus(count, seed=0):
+    """Return a list of JPEG-encoded photos of various phone sizes"""
+    rng = np.random.default_rng(seed)
+    corpus = []
+    for i in range(count):
+        width, height = PHONE_SIZES[i % len(PHONE_SIZES)]
+        # Smooth gradients plus noise, so the files are photo-sized
+        y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+        x = np.linspace(0, 255, width, dtype=np.float32)[None, :]
+        base = np.stack([(x + y) / 2, np.broadcast_to(y, (height, width)),
+                         np.broadcast_to(x, (height, width))], axis=-1)
+        noise = rng.normal(0, 12, size=(height, width, 1)).astype(np.float32)
+        pixels = np.clip(base + noise, 0, 255).astype(np.uint8)
+
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, format='JPEG', quality=90)
+        corpus.append(buffer.getvalue())
+    return corpus
+
+def naive_preprocess(data, target_size=(224, 224)):
+    """Full-resolution decode followed by float conversion"""
+    img = Image.open(io.BytesIO(data)).convert('RGB').resize(target_size)
+    array = np.array(img).astype(np.float32) / 255.0
+    mean = np.array([0.485, 0.456, 0.406])
+    std = np.array([0.229, 0.224, 0.225])
+    return ((array - mean) / std)[None, ...].astype(np.float32)
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KB"""
+    # ru_maxrss survives fork+exec on Linux, VmHWM does not
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def run_mode(mode, corpus_dir):
+    corpus = []
+    for name in sorted(os.listdir(corpus_dir)):
+        with open(os.path.join(corpus_dir, name), 'rb') as f:
+            corpus.append(f.read())
+    count = len(corpus)
+    baseline_rss = peak_rss_kb()
+    out = np.empty(image_tensor_shape(), dtype=np.float32)
+
+    start = time.perf_counter()
+    for data in corpus:
+        if mode == 'naive':
+            naive_preprocess(data)
+        elif mode == 'reuse':
+            preprocess_image(data, out=out)
+        else:
+            preprocess_image(data)
+    elapsed = time.perf_counter() - start
+
+    peak_rss = peak_rss_kb()
+    print(f"{mode:<10} {elapsed / count * 1000:8.2f} ms/image   "
+          f"peak RSS {peak_rss / 1024:7.1f} MB "
+          f"(+{(peak_rss - baseline_rss) / 1024:.1f} MB while processing)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--images', type=int, default=40)
+    parser.add_argument('--mode', choices=['naive', 'pipeline', 'reuse'])
+    parser.add_argument('--corpus', help='directory of JPEGs to use instead of generated ones')
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.corpus)
+        return
+
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        if args.corpus:
+            corpus_dir = args.corpus
+        else:
+            for i, data in enumerate(make_corpus(args.images)):
+                with open(os.path.join(corpus_dir, f"{i:04d}.jpg"), 'wb') as f:
+                    f.write(data)
+
+        for mode in ('naive', 'pipeline', 'reuse'):
+            subprocess.run([sys.executable, '-m', 'benchmarks.preprocess_images',
+                            '--mode', mode, '--corpus', corpus_dir], check=True)
+
+if __name__ == '__main__':
+    main()
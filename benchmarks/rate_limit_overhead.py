@@ -0,0 +1,60 @@
+"""
+Cost of a rate limit check with each bucket store.
+
+Times MemoryBucketStore.take and SQLiteBucketStore.take for one busy
+client and for many clients, then runs the SQLite store from several
+processes at once, as gunicorn workers sharing the file would.
+
+Usage:
+    python -m benchmarks.rate_limit_overhead [--checks 20000] [--processes 4]
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from backend.utils.rate_limit import MemoryBucketStore, SQLiteBucketStore
+
+# A budget no check here runs out of
+CAPACITY, RATE = 1e9, 1e9
+
+def _per_check_us(store, checks, clients):
+    start = time.perf_counter()
+    for i in range(checks):
+        store.take(f"weather:ip:10.0.{i % clients // 256}.{i % 256}", CAPACITY, RATE)
+    return (time.perf_counter() - start) / checks * 1e6
+
+def _worker(path, checks, results):
+    results.put(_per_check_us(SQLiteBucketStore(path), checks, 1000))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--checks', type=int, default=20000)
+    parser.add_argument('--processes', type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        stores = {
+            'memory': MemoryBucketStore(),
+            'sqlite': SQLiteBucketStore(os.path.join(folder, 'single.sqlite3'))
+        }
+        for clients in (1, 1000):
+            for backend, store in stores.items():
+                us = _per_check_us(store, args.checks, clients)
+                print(f"{backend:<8} {clients:5d} clients  {us:7.1f} us/check")
+
+        path = os.path.join(folder, 'shared.sqlite3')
+        SQLiteBucketStore(path)
+        results = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=_worker, args=(path, args.checks // args.processes, results))
+                   for _ in range(args.processes)]
+        for worker in workers:
+            worker.start()
+        per_check = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        print(f"sqlite   {args.processes:5d} processes {max(per_check):6.1f} us/check (slowest)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Micro-benchmark of recommendation lookups, per-call tables vs knowledge base.
+
+The "before" functions are generated from the knowledge base file as
+source code with the whole table written as a dict literal inside the
+function body, which is how the recommendation functions used to look,
+so every call rebuilds the nested dicts and lists. The "after" numbers
+are the current get_treatment_recommendations, get_soil_recommendations
+and generate_weather_recommendations.
+
+Usage:
+    python -m benchmarks.recommendations [--calls 100000]
+"""
+import argparse
+import json
+import timeit
+import tracemalloc
+
+from backend.models.disease_detection import get_treatment_recommendations
+from backend.models.recommendations import DEFAULT_PATH
+from backend.models.soil_analysis import get_soil_recommendations
+from backend.utils.helpers import generate_weather_recommendations
+
+LANGUAGES = ('en', 'hi')
+
+def _by_language(texts):
+    return {language: [text[language] for text in texts] for language in LANGUAGES}
+
+def build_legacy_functions(data):
+    """Compile the old per-call-literal implementations from the knowledge base data"""
+    disease = {language: {int(class_id): _by_language(texts)[language]
+                          for class_id, texts in data['classes']['disease'].items()}
+               for language in LANGUAGES}
+    soil = {language: {int(class_id): _by_language(texts)[language]
+                       for class_id, texts in data['classes']['soil'].items()}
+            for language in LANGUAGES}
+    ph = {language: [rule['text'][language] for rule in data['rules']['soil']['rules']]
+          for language in LANGUAGES}
+    weather = data['rules']['weather']
+    weather_texts = {rule['text']['en']: rule['text'] for rule in weather['rules']}
+    weather_texts[weather['default']['en']] = weather['default']
+
+    source = f'''
+def treatment(disease_class, language='en'):
+    recommendations = {disease!r}
+    if language not in recommendations:
+        language = 'en'
+    return recommendations[language].get(disease_class, [])
+
+def soil(soil_type, properties, language='en'):
+    recommendations = {soil!r}
+    ph_recommendations = {ph!r}
+    if language not in recommendations:
+        language = 'en'
+    result = list(recommendations[language].get(soil_type, []))
+    ph = properties['ph']
+    if ph < 6.0:
+        result.append(ph_recommendations[language][0])
+    elif ph > 7.2:
+        result.append(ph_recommendations[language][1])
+    else:
+        result.append(ph_recommendations[language][2])
+    return result
+
+def weather(weather_data, language='en'):
+    rules = {[rule['text']['en'] for rule in weather['rules']]!r}
+    temp = weather_data.get('main', {{}}).get('temp')
+    humidity = weather_data.get('main', {{}}).get('humidity')
+    weather_desc = weather_data.get('weather', [{{}}])[0].get('main')
+    recommendations_en = []
+    if temp is not None:
+        if temp > 35:
+            recommendations_en.append(rules[0])
+        elif temp < 10:
+            recommendations_en.append(rules[1])
+    if humidity is not None:
+        if humidity > 80:
+            recommendations_en.append(rules[2])
+        elif humidity < 30:
+            recommendations_en.append(rules[3])
+    if weather_desc:
+        if weather_desc.lower() in ['rain', 'thunderstorm', 'drizzle']:
+            recommendations_en.append(rules[4])
+        elif weather_desc.lower() == 'clear':
+            recommendations_en.append(rules[5])
+    if not recommendations_en:
+        recommendations_en.append({weather['default']['en']!r})
+    weather_translations = {weather_texts!r}
+    recommendations = []
+    for rec in recommendations_en:
+        if rec in weather_translations and language in weather_translations[rec]:
+            recommendations.append(weather_translations[rec][language])
+        else:
+            recommendations.append(rec)
+    return recommendations
+'''
+    namespace = {}
+    exec(compile(source, '<legacy recommendations>', 'exec'), namespace)
+    return namespace['treatment'], namespace['soil'], namespace['weather']
+
+def peak_allocation(call):
+    """Peak bytes allocated while one call runs, including temporaries"""
+    call()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    call()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak - baseline
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--calls', type=int, default=100000)
+    args = parser.parse_args()
+
+    with open(DEFAULT_PATH, encoding='utf-8') as f:
+        legacy_treatment, legacy_soil, legacy_weather = build_legacy_functions(json.load(f))
+
+    weather_data = {"main": {"temp": 37, "humidity": 85}, "weather": [{"main": "Rain"}]}
+    properties = {"ph": 5.4}
+    cases = [
+        ('disease', lambda: legacy_treatment(2, 'hi'), lambda: get_treatment_recommendations(2, 'hi')),
+        ('soil', lambda: legacy_soil(1, properties, 'hi'), lambda: get_soil_recommendations(1, properties, 'hi')),
+        ('weather', lambda: legacy_weather(weather_data, 'hi'),
+         lambda: generate_weather_recommendations(weather_data, 'hi')),
+    ]
+
+    for name, before, after in cases:
+        assert list(before()) == list(after()), name
+        line = [f"{name:<8}"]
+        for label, call in (('before', before), ('after', after)):
+            seconds = min(timeit.repeat(call, number=args.calls, repeat=3))
+            peak = peak_allocation(call)
+            line.append(f"{label} {seconds / args.calls * 1e6:6.2f} us/call, peak {peak:6d} B")
+        print('   '.join(line))
+
+if __name__ == '__main__':
+    main()
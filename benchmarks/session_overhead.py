@@ -0,0 +1,99 @@
+"""
+Per-request cost of the session backends, and the cookie bytes they send.
+
+Serves three routes from otherwise identical Flask apps, one per backend
+('cookie', 'memory', 'sqlite'), through the WSGI test client, for a
+client whose session holds what a logged-in farmer's does: a user ID,
+a username and a language. The routes ignore the session, read it, or
+change it. Also reports the size of the cookie the browser sends on
+every request and how often a Set-Cookie comes back.
+
+Usage:
+    python -m benchmarks.session_overhead [--requests 3000]
+"""
+import argparse
+import os
+import tempfile
+import time
+import uuid
+
+from flask import Flask, session
+
+from backend.utils.sessions import MemorySessionStore, SQLiteSessionStore, ServerSessionInterface
+
+def _app(backend, folder):
+    app = Flask(__name__)
+    app.secret_key = 'session-benchmark'
+    if backend == 'memory':
+        app.session_interface = ServerSessionInterface(MemorySessionStore())
+    elif backend == 'sqlite':
+        app.session_interface = ServerSessionInterface(
+            SQLiteSessionStore(os.path.join(folder, 'sessions.sqlite3')))
+
+    @app.route('/login', methods=['POST'])
+    def login():
+        session['user_id'] = str(uuid.uuid4())
+        session['username'] = 'ramesh.patil'
+        session['language'] = 'mr'
+        return 'ok'
+
+    @app.route('/ignore')
+    def ignore():
+        return 'ok'
+
+    @app.route('/read')
+    def read():
+        return session.get('language', 'en')
+
+    @app.route('/write/<int:n>')
+    def write(n):
+        session['language'] = ('en', 'hi', 'mr')[n % 3]
+        return 'ok'
+
+    return app
+
+def _per_request_us(client, path, count):
+    set_cookies = 0
+    start = time.perf_counter()
+    for i in range(count):
+        response = client.get(path.format(i=i))
+        if 'Set-Cookie' in response.headers:
+            set_cookies += 1
+        response.close()
+    return (time.perf_counter() - start) / count * 1e6, set_cookies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        clients = {}
+        for backend in ('cookie', 'memory', 'sqlite'):
+            client = _app(backend, folder).test_client()
+            client.post('/login').close()
+            clients[backend] = client
+
+        paths = (('ignore', '/ignore'), ('read', '/read'), ('write', '/write/{i}'))
+        best = {}
+        # Alternate between the backends to even out noise
+        for _ in range(args.repeat):
+            for name, path in paths:
+                for backend, client in clients.items():
+                    us, set_cookies = _per_request_us(client, path, args.requests)
+                    key = (backend, name)
+                    if key not in best or us < best[key][0]:
+                        best[key] = (us, set_cookies)
+
+        print(f"{'backend':<8} {'cookie B':>8}  " + "  ".join(f"{name:>22}" for name, _ in paths))
+        for backend, client in clients.items():
+            cookie = client.get_cookie('session')
+            cells = []
+            for name, _ in paths:
+                us, set_cookies = best[(backend, name)]
+                cells.append(f"{us:7.1f} us {set_cookies / args.requests:5.0%} set")
+            print(f"{backend:<8} {len(cookie.value):8d}  " + "  ".join(f"{cell:>22}" for cell in cells))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Cost of validating uploads while they arrive, and what a rejection saves.
+
+Posts multipart uploads to a minimal Flask app through the WSGI test
+client, once with a plain spooled request class and once with
+SpooledUploadRequest, which checks each file as it is parsed. Reports the
+time per accepted photo, and for an oversized photo and a non-image
+payload how long the request took and how much of the body was read
+before it was answered.
+
+Usage:
+    python -m benchmarks.upload_validation [--requests 200] [--megabytes 3]
+"""
+import argparse
+import io
+import os
+import time
+from tempfile import SpooledTemporaryFile
+
+from flask import Flask, request
+from PIL import Image
+from werkzeug.exceptions import HTTPException
+from werkzeug.test import EnvironBuilder, run_wsgi_app
+
+from backend.utils.config import Config
+from backend.utils.uploads import SpooledUploadRequest
+
+class PlainUploadRequest(SpooledUploadRequest):
+    """The request class before validation: spool and nothing else"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None,
+                         content_length=None):
+        return SpooledTemporaryFile(max_size=Config.UPLOAD_SPOOL_THRESHOLD, mode='rb+')
+
+def _app(request_class):
+    app = Flask(__name__)
+    app.request_class = request_class
+
+    @app.route('/upload', methods=['POST'])
+    def upload():
+        try:
+            data = request.files['image'].read()
+        except HTTPException as e:
+            return e.description, e.code
+        return str(len(data))
+
+    return app
+
+def _photo(megabytes):
+    # Noise doesn't compress, so the JPEG comes out about the size asked for
+    side = int((megabytes * 1024 * 1024 / 1.5) ** 0.5)
+    image = Image.frombytes('RGB', (side, side), os.urandom(side * side * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=95)
+    return buffer.getvalue()
+
+def _post(app, payload):
+    environ = EnvironBuilder(path='/upload', method='POST',
+                             data={'image': (io.BytesIO(payload), 'photo.jpg')}).get_environ()
+    stream = environ['wsgi.input']
+    start = time.perf_counter()
+    body, status, _ = run_wsgi_app(app.wsgi_app, environ)
+    b''.join(body)
+    elapsed = time.perf_counter() - start
+    read = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    return elapsed, status, read / stream.tell()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--megabytes', type=float, default=3)
+    args = parser.parse_args()
+
+    photo = _photo(args.megabytes)
+    payloads = (
+        ('photo', photo),
+        ('oversized', photo + os.urandom(Config.UPLOAD_MAX_IMAGE_BYTES)),
+        ('not an image', os.urandom(len(photo)))
+    )
+    apps = (('plain', _app(PlainUploadRequest)), ('validated', _app(SpooledUploadRequest)))
+
+    print(f"{'payload':<14} {'request class':<14} {'ms/request':>10}  {'status':<28} {'body read':>9}")
+    for label, payload in payloads:
+        for name, app in apps:
+            best = None
+            for _ in range(args.requests):
+                elapsed, status, read = _post(app, payload)
+                best = elapsed if best is None else min(best, elapsed)
+            print(f"{label:<14} {name:<14} {best * 1000:10.2f}  {status:<28} {read:9.0%}")
+
+if __name__ == '__main__':
+    main()
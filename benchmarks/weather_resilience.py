@@ -0,0 +1,67 @@
+"""
+Exercise get_weather_data against a fake weather server that injects
+latency and errors.
+
+Runs a series of scenarios (healthy, flaky, throttled, slow, down,
+recovered) and reports success rate, latency and upstream calls for
+each, showing retries, timeouts and the circuit breaker at work.
+
+Usage:
+    python -m benchmarks.weather_resilience [--calls 50]
+"""
+import argparse
+import time
+
+from backend.utils import helpers
+from backend.utils.config import Config
+from benchmarks.fake_weather import start_fake_weather
+
+SCENARIOS = [
+    # name, latency, error rate, throttle rate
+    ('healthy', 0.0, 0.0, 0.0),
+    ('flaky 30% 503', 0.0, 0.3, 0.0),
+    ('throttled 30% 429', 0.0, 0.0, 0.3),
+    ('slow 2s', 2.0, 0.0, 0.0),
+    ('down', 0.0, 1.0, 0.0),
+    ('recovered', 0.0, 0.0, 0.0),
+]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--calls', type=int, default=50)
+    args = parser.parse_args()
+    
+    server = start_fake_weather()
+    Config.WEATHER_API_URL = server.url
+    Config.WEATHER_TIMEOUT = 0.5
+    Config.HTTP_BACKOFF = 0.05
+    helpers.weather_breaker.reset_timeout = 1.0
+    
+    for name, latency, error_rate, throttle_rate in SCENARIOS:
+        server.latency = latency
+        server.error_rate = error_rate
+        server.throttle_rate = throttle_rate
+        if name == 'recovered':
+            # Let the breaker move to half-open
+            time.sleep(helpers.weather_breaker.reset_timeout)
+        
+        calls_before = server.calls
+        ok = 0
+        latencies = []
+        for _ in range(args.calls):
+            start = time.perf_counter()
+            if helpers.get_weather_data(18.52, 73.85) is not None:
+                ok += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+        
+        latencies.sort()
+        print(f"{name:<18} success {ok / args.calls:6.1%}   "
+              f"p50 {latencies[len(latencies) // 2]:7.1f} ms   "
+              f"max {latencies[-1]:7.1f} ms   "
+              f"upstream calls {server.calls - calls_before:4d}   "
+              f"breaker {helpers.weather_breaker.state}")
+    
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
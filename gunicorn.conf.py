@@ -0,0 +1,28 @@
+"""
+Gunicorn settings for ShetkarAI, picked up automatically by
+`gunicorn app:app`. Everything can be overridden with environment
+variables; by default gunicorn behaves as before (sync workers).
+
+Set GUNICORN_WORKER_CLASS=gevent to serve the I/O-bound routes
+(/login, /register, /api/weather) cooperatively: while one request waits
+on Supabase or OpenWeatherMap, the worker keeps serving others over the
+same pooled connections. Raise SUPABASE_POOL_MAXSIZE and HTTP_POOL_SIZE
+to match GUNICORN_WORKER_CONNECTIONS. Do not combine gevent workers with
+--preload, since the app would be imported before gevent patches the
+standard library.
+"""
+import os
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Concurrent requests per gevent worker
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+
+def post_worker_init(worker):
+    # The worker has just reset its signals to the defaults, which would
+    # make PROFILE_SIGNAL kill it; install the profiling toggle again
+    from backend.utils.profiling import install_profile_signal
+    install_profile_signal()
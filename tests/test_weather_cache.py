@@ -0,0 +1,34 @@
+"""
+Snapping coordinates to weather grid cells.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import pytest
+
+from backend.utils.weather_cache import grid_cell
+
+def test_nearby_points_share_a_cell():
+    assert grid_cell(18.52, 73.851) == grid_cell(18.54, 73.899) == (18.525, 73.875)
+
+@pytest.mark.parametrize('lat, lon', [(90, 180), (-90, -180), (90, -180), (-90, 180), (89.99, 179.99)])
+def test_edges_snap_inside_the_valid_range(lat, lon):
+    cell_lat, cell_lon = grid_cell(lat, lon)
+    assert -90 <= cell_lat <= 90
+    assert -180 <= cell_lon < 180
+
+def test_antimeridian_is_one_cell():
+    assert grid_cell(0, 180) == grid_cell(0, -180)
+
+@pytest.mark.parametrize('step', [0.05, 0.07, 0.7, 0.8, 1])
+def test_edges_stay_in_range_for_any_step(step):
+    for lat in (-90, 90):
+        for lon in (-180, 179.99, 180):
+            cell_lat, cell_lon = grid_cell(lat, lon, step)
+            assert -90 <= cell_lat <= 90
+            assert -180 <= cell_lon < 180
+
+@pytest.mark.parametrize('lat, lon', [(90.01, 0), (0, -180.5), ('nan', 0), ('x', 0)])
+def test_invalid_coordinates_are_rejected(lat, lon):
+    with pytest.raises(ValueError):
+        grid_cell(lat, lon)
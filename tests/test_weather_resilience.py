@@ -0,0 +1,123 @@
+"""
+Retries, timeouts and the circuit breaker of the weather lookup, against
+the local fake weather server.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import time
+
+import pytest
+import requests
+
+from backend.utils import helpers
+from backend.utils.config import Config
+from backend.utils.http import CircuitBreaker, CircuitOpenError, get_with_retries
+from benchmarks.fake_weather import start_fake_weather
+
+@pytest.fixture(scope='module')
+def server():
+    server = start_fake_weather()
+    yield server
+    server.shutdown()
+
+@pytest.fixture(autouse=True)
+def fast_retries(server, monkeypatch):
+    server.latency = 0.0
+    server.error_rate = 0.0
+    server.throttle_rate = 0.0
+    monkeypatch.setattr(Config, 'HTTP_BACKOFF', 0.01)
+    monkeypatch.setattr(Config, 'HTTP_MAX_BACKOFF', 0.05)
+    monkeypatch.setattr(Config, 'WEATHER_API_URL', server.url)
+
+@pytest.fixture
+def breaker(monkeypatch):
+    # A fresh weather breaker, so tests don't see each other's failures
+    breaker = CircuitBreaker('weather', failure_threshold=Config.WEATHER_BREAKER_THRESHOLD,
+                             reset_timeout=Config.WEATHER_BREAKER_RESET)
+    monkeypatch.setattr(helpers, 'weather_breaker', breaker)
+    return breaker
+
+def _calls(server, call):
+    before = server.calls
+    result = call()
+    return result, server.calls - before
+
+def test_success_is_not_retried(server):
+    response, calls = _calls(server, lambda: get_with_retries(server.url, retries=2))
+    assert response.status_code == 200
+    assert calls == 1
+
+def test_5xx_is_retried(server):
+    server.error_rate = 1.0
+    response, calls = _calls(server, lambda: get_with_retries(server.url, retries=2))
+    assert response.status_code == 503
+    assert calls == 3
+
+def test_429_is_retried(server):
+    server.throttle_rate = 1.0
+    response, calls = _calls(server, lambda: get_with_retries(server.url, retries=1))
+    assert response.status_code == 429
+    assert calls == 2
+
+def test_read_timeout_is_bounded(server):
+    server.latency = 1.0
+    started = time.monotonic()
+    with pytest.raises(requests.Timeout):
+        get_with_retries(server.url, retries=1, timeout=(1, 0.2))
+    assert time.monotonic() - started < 0.8
+
+def test_deadline_bounds_all_attempts(server):
+    server.latency = 1.0
+    started = time.monotonic()
+    with pytest.raises(requests.Timeout):
+        get_with_retries(server.url, retries=5, timeout=(1, 0.3), deadline=0.5)
+    assert time.monotonic() - started < 0.9
+
+def test_breaker_opens_after_threshold(server, breaker):
+    server.error_rate = 1.0
+    for _ in range(Config.WEATHER_BREAKER_THRESHOLD - 1):
+        assert helpers.get_weather_data(18.52, 73.85) is None
+        assert breaker.state == 'closed'
+    assert helpers.get_weather_data(18.52, 73.85) is None
+    assert breaker.state == 'open'
+
+def test_open_breaker_fails_fast(server, breaker):
+    server.error_rate = 1.0
+    for _ in range(Config.WEATHER_BREAKER_THRESHOLD):
+        helpers.get_weather_data(18.52, 73.85)
+    server.latency = 1.0
+
+    started = time.monotonic()
+    result, calls = _calls(server, lambda: helpers.get_weather_data(18.52, 73.85))
+    assert result is None
+    assert calls == 0
+    assert time.monotonic() - started < 0.1
+    with pytest.raises(CircuitOpenError):
+        get_with_retries(server.url, breaker=breaker)
+    assert breaker.rejected == 2
+
+def test_half_open_trial_closes_breaker(server, breaker):
+    breaker.reset_timeout = 0.2
+    server.error_rate = 1.0
+    for _ in range(Config.WEATHER_BREAKER_THRESHOLD):
+        helpers.get_weather_data(18.52, 73.85)
+    assert breaker.state == 'open'
+
+    time.sleep(breaker.reset_timeout)
+    assert breaker.state == 'half-open'
+    server.error_rate = 0.0
+    result, calls = _calls(server, lambda: helpers.get_weather_data(18.52, 73.85))
+    assert result["name"] == "Fake Town"
+    assert calls == 1
+    assert breaker.state == 'closed'
+
+def test_failed_half_open_trial_reopens_breaker(server, breaker):
+    breaker.reset_timeout = 0.2
+    server.error_rate = 1.0
+    for _ in range(Config.WEATHER_BREAKER_THRESHOLD):
+        helpers.get_weather_data(18.52, 73.85)
+
+    time.sleep(breaker.reset_timeout)
+    assert helpers.get_weather_data(18.52, 73.85) is None
+    assert breaker.state == 'open'